@@ -0,0 +1,375 @@
+import asyncio
+import hashlib
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import orjson
+from cache import r
+from settings import (
+    DISCORD_WEBHOOK, ALERT_WINDOW, ALERT_POLL, ALERT_BATCH_MAX, ALERT_DEDUP_TTL, ALERT_MAX_RETRIES,
+    ALERT_RISK_JUMP, ALERT_LINE_MOVE,
+)
+import metrics
+import upstream
+
+# Alerts. Rules run against each new snapshot (risk jump, line move, new arb) and
+# POST /alert only enqueues. A dispatcher coalesces whatever arrives within
+# ALERT_WINDOW into batched Discord messages, waits out 429 Retry-After per
+# rate-limit bucket and retries 5xx with backoff. An alert whose (player, prop, line)
+# fingerprint was queued in the last ALERT_DEDUP_TTL is dropped (the fingerprint is
+# released again if the alert is never delivered). With Redis the queue and
+# fingerprints live there: queued alerts, and ones a killed process was still sending,
+# survive a restart, and every process shares one dedup window.
+
+DISCORD_MAX_CHARS = 2000
+QUEUE_KEY = "pp:alerts:queue"
+PROCESSING_KEY = "pp:alerts:processing:{owner}"
+OWNER_KEY = "pp:alerts:owner:{owner}"  # heartbeat; the processing list is only recovered once this expires
+OWNERS_KEY = "pp:alerts:owners"
+OWNER_TTL = max(30, int(ALERT_POLL * 6))
+BACKOFF = 1.0
+
+def fingerprint(alert: Dict) -> str:
+    key = f"{alert.get('player')}|{alert.get('prop')}|{alert.get('line')}"
+    return hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+
+def format_alert(a: Dict) -> str:
+    kind = a.get("kind")
+    head = f"{a['player']} {a['prop']} @ {a['line']}"
+    if kind == "risk_jump":
+        return f"Risk jump: {head} (Risk: {a['prev_risk']:.1f}% -> {a['risk_score']:.1f}%)"
+    if kind == "line_move":
+        return f"Line move: {head} (was {a['prev_line']}, Risk: {a['risk_score']:.1f}%)"
+    if kind == "new_arb":
+        return (f"Arb: {head} over {a['over']['book']} {a['over']['price']} / under {a['under']['book']} "
+                f"{a['under']['price']} ({a['margin']:.2f}%)")
+    return f"Alert: {head} (Risk: {a['risk_score']:.1f}%)"
+
+def chunk(alerts: List[Dict]) -> List[Tuple[str, List[Dict]]]:
+    # One line per alert, as many lines per message as Discord's content limit allows
+    out: List[Tuple[str, List[Dict]]] = []
+    lines: List[str] = []
+    members: List[Dict] = []
+    for a in alerts:
+        line = format_alert(a)[:DISCORD_MAX_CHARS]
+        if lines and sum(len(l) + 1 for l in lines) + len(line) > DISCORD_MAX_CHARS:
+            out.append(("\n".join(lines), members))
+            lines, members = [], []
+        lines.append(line)
+        members.append(a)
+    if lines:
+        out.append(("\n".join(lines), members))
+    return out
+
+def evaluate(prev: Optional[Dict], pushed: Optional[Dict]) -> List[Dict]:
+    # prev: the snapshot before this ingest; pushed: stream.snapshot_delta(prev, snap).
+    # The first snapshot of a process has nothing to compare against and raises nothing.
+    if prev is None or pushed is None:
+        return []
+    old = {(p.get("event"), p["player"], p["prop"]): p for p in prev.get("props", [])}
+    out = []
+    for p in pushed["props"]:
+        before = old.get((p.get("event"), p["player"], p["prop"]))
+        if before is None:
+            continue
+        base = {"player": p["player"], "prop": p["prop"], "line": p["line"], "risk_score": p["risk_score"]}
+        if p["risk_score"] - before["risk_score"] >= ALERT_RISK_JUMP:
+            out.append({"kind": "risk_jump", **base, "prev_risk": before["risk_score"]})
+        if abs(p["line"] - before["line"]) >= ALERT_LINE_MOVE:
+            out.append({"kind": "line_move", **base, "prev_line": before["line"]})
+    for a in pushed["arbs"]:
+        out.append({"kind": "new_arb", "player": a["player"], "prop": a["market"], "line": a["line"],
+                    "over": a["over"], "under": a["under"], "margin": a["margin"]})
+    return out
+
+class AlertQueue:
+    # FIFO of alert dicts: a Redis list when there is one, a local deque otherwise. Popped alerts sit in this
+    # process's own processing list until acked; while its heartbeat lives nobody else touches that list, and
+    # once a killed process's heartbeat expires recover() hands its alerts back to the queue
+    def __init__(self, redis_client):
+        self.r = redis_client
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.processing = PROCESSING_KEY.format(owner=self.owner)
+        self._local: Deque[Dict] = deque()
+        self._seen: Dict[str, float] = {}
+
+    async def claim(self, fp: str, ttl: float) -> bool:
+        # True the first time a fingerprint is seen within ttl
+        if self.r is not None:
+            try:
+                return bool(await asyncio.to_thread(self.r.set, f"pp:alerts:fp:{fp}", 1, nx=True, ex=max(1, int(ttl))))
+            except Exception as e:
+                print(f"WARN: Alert dedup via Redis failed, local only: {e!r}")
+        now = time.monotonic()
+        if self._seen.get(fp, 0) > now:
+            return False
+        if len(self._seen) > 10000:
+            self._seen = {k: v for k, v in self._seen.items() if v > now}
+        self._seen[fp] = now + ttl
+        return True
+
+    async def release(self, fps: List[str]):
+        # Dropped without being delivered: the next alert with these fingerprints may go out
+        for fp in fps:
+            self._seen.pop(fp, None)
+        if self.r is None or not fps:
+            return
+        try:
+            await asyncio.to_thread(self.r.delete, *[f"pp:alerts:fp:{fp}" for fp in fps])
+        except Exception as e:
+            print(f"WARN: Alert dedup release in Redis failed: {e!r}")
+
+    async def push(self, alerts: List[Dict], front: bool = False):
+        if not alerts:
+            return
+        if self.r is not None:
+            blobs = [orjson.dumps(a) for a in alerts]
+            try:
+                if front:
+                    await asyncio.to_thread(self.r.lpush, QUEUE_KEY, *reversed(blobs))
+                else:
+                    await asyncio.to_thread(self.r.rpush, QUEUE_KEY, *blobs)
+                return
+            except Exception as e:
+                print(f"WARN: Alert queue via Redis failed, local only: {e!r}")
+        if front:
+            self._local.extendleft(reversed(alerts))
+        else:
+            self._local.extend(alerts)
+
+    async def pop(self, n: int) -> List[Dict]:
+        out = [self._local.popleft() for _ in range(min(n, len(self._local)))]
+        if self.r is not None and len(out) < n:
+            def take():
+                pipe = self.r.pipeline(transaction=True)
+                for _ in range(n - len(out)):
+                    pipe.lmove(QUEUE_KEY, self.processing, "LEFT", "RIGHT")
+                return [b for b in pipe.execute() if b is not None]
+            try:
+                out.extend(orjson.loads(b) for b in await asyncio.to_thread(take))
+            except Exception as e:
+                print(f"WARN: Alert queue read from Redis failed: {e!r}")
+        return out
+
+    async def ack(self, alerts: List[Dict]):
+        # Done with these (sent or dropped). orjson re-encodes a decoded alert to the same bytes it was stored as
+        if self.r is None or not alerts:
+            return
+        def remove():
+            pipe = self.r.pipeline(transaction=False)
+            for a in alerts:
+                pipe.lrem(self.processing, 1, orjson.dumps(a))
+            pipe.execute()
+        try:
+            await asyncio.to_thread(remove)
+        except Exception as e:
+            print(f"WARN: Alert ack in Redis failed, they may be sent again: {e!r}")
+
+    async def requeue(self, alerts: List[Dict]):
+        # Not sent after all: back to the head of the queue
+        await self.push(alerts, front=True)
+        await self.ack(alerts)
+
+    async def heartbeat(self):
+        if self.r is None:
+            return
+        def beat():
+            pipe = self.r.pipeline(transaction=False)
+            pipe.set(OWNER_KEY.format(owner=self.owner), 1, ex=OWNER_TTL)
+            pipe.sadd(OWNERS_KEY, self.owner)
+            pipe.execute()
+        try:
+            await asyncio.to_thread(beat)
+        except Exception as e:
+            print(f"WARN: Alert dispatcher heartbeat failed: {e!r}")
+
+    async def recover(self) -> int:
+        # Alerts a dead dispatcher (heartbeat expired) popped but never acked go back to the head of the queue,
+        # in order. LMOVE is atomic, so two processes recovering the same owner never both take an alert
+        if self.r is None:
+            return 0
+        def move():
+            moved = 0
+            owners = [o.decode() for o in self.r.smembers(OWNERS_KEY)]
+            alive = self.r.mget([OWNER_KEY.format(owner=o) for o in owners]) if owners else []
+            for owner, beat in zip(owners, alive):
+                if beat is not None or owner == self.owner:
+                    continue
+                key = PROCESSING_KEY.format(owner=owner)
+                while self.r.lmove(key, QUEUE_KEY, "RIGHT", "LEFT") is not None:
+                    moved += 1
+                self.r.srem(OWNERS_KEY, owner)
+            return moved
+        try:
+            return await asyncio.to_thread(move)
+        except Exception as e:
+            print(f"WARN: Alert recovery from Redis failed: {e!r}")
+            return 0
+
+class AlertDispatcher:
+    def __init__(self, queue: AlertQueue, webhook: Optional[str] = DISCORD_WEBHOOK):
+        self.queue = queue
+        self.webhook = webhook
+        self._blocked: Dict[str, float] = {}  # rate-limit bucket -> monotonic time it reopens
+        self._bucket_of: Dict[str, str] = {}  # webhook URL -> Discord X-RateLimit-Bucket
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.webhook)
+
+    async def submit(self, alerts: List[Dict]) -> int:
+        # Enqueue alerts whose fingerprint is new; returns how many were queued
+        if not self.enabled or not alerts:
+            return 0
+        fresh = []
+        for a in alerts:
+            if await self.queue.claim(fingerprint(a), ALERT_DEDUP_TTL):
+                fresh.append(a)
+            else:
+                metrics.ALERTS.inc("duplicate")
+        await self.queue.push(fresh)
+        metrics.ALERTS.inc("queued", amount=len(fresh))
+        if fresh and self._wake is not None:
+            self._wake.set()
+        return len(fresh)
+
+    async def drain(self):
+        # Outside run() (one-shot ingest) nothing else keeps the lease on our processing list alive
+        beat = asyncio.create_task(self._heartbeat()) if self._task is None else None
+        try:
+            while True:
+                batch = await self.queue.pop(ALERT_BATCH_MAX)
+                if not batch:
+                    return
+                await self._send_batch(batch)
+        finally:
+            if beat is not None:
+                beat.cancel()
+
+    async def _send_batch(self, batch: List[Dict]):
+        parts = chunk(batch)
+        sent = 0
+        try:
+            for content, members in parts:
+                if not await self._deliver(content):
+                    metrics.ALERTS.inc("dropped", amount=len(members))
+                    await self.queue.release([fingerprint(a) for a in members])
+                else:
+                    metrics.ALERTS.inc("sent", amount=len(members))
+                sent += 1
+                await self.queue.ack(members)
+        except asyncio.CancelledError:
+            # Shutting down mid-batch: whatever wasn't sent goes back to the head of the queue
+            await self.queue.requeue([a for _, members in parts[sent:] for a in members])
+            raise
+
+    async def _deliver(self, content: str) -> bool:
+        # True once Discord accepted it; False after ALERT_MAX_RETRIES failures (429s included) or another 4xx
+        url = self.webhook
+        failures = 0
+        while True:
+            bucket = self._bucket_of.get(url, url)
+            wait = max(self._blocked.get("global", 0), self._blocked.get(bucket, 0)) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                resp = await upstream.get_client("webhook").post(url, json={"content": content})
+            except Exception as e:
+                resp, error = None, e
+            if resp is not None:
+                self._observe(url, resp)
+                if resp.status_code < 300:
+                    return True
+                error = f"HTTP {resp.status_code}"
+                if resp.status_code == 429:
+                    metrics.ALERTS.inc("rate_limited")
+                elif resp.status_code < 500:
+                    print(f"ERROR: Alert webhook rejected message: {error}")
+                    return False
+            failures += 1
+            if failures > ALERT_MAX_RETRIES:
+                print(f"ERROR: Alert webhook failed {failures} times, dropping message: {error!r}")
+                return False
+            if resp is None or resp.status_code != 429:  # a 429 already set the Retry-After wait above
+                await asyncio.sleep(BACKOFF * 2 ** (failures - 1))
+
+    def _observe(self, url: str, resp):
+        # Discord rate-limit headers: the bucket this webhook is in, and when it reopens
+        h = resp.headers
+        bucket = h.get("x-ratelimit-bucket")
+        if bucket:
+            self._bucket_of[url] = bucket
+        bucket = self._bucket_of.get(url, url)
+        now = time.monotonic()
+        if resp.status_code == 429:
+            retry = _num(h.get("retry-after"))
+            is_global = h.get("x-ratelimit-global") == "true"
+            try:
+                body = resp.json()
+                retry = _num(body.get("retry_after")) or retry
+                is_global = is_global or bool(body.get("global"))
+            except Exception:
+                pass
+            self._blocked["global" if is_global else bucket] = now + (retry if retry is not None else BACKOFF)
+        elif h.get("x-ratelimit-remaining") == "0":
+            self._blocked[bucket] = now + (_num(h.get("x-ratelimit-reset-after")) or 0)
+
+    async def _heartbeat(self):
+        # Own task so a long 429 wait in _deliver doesn't let the lease on our processing list lapse
+        while True:
+            await self.queue.heartbeat()
+            await asyncio.sleep(OWNER_TTL / 3)
+
+    async def run(self):
+        self._wake = self._wake or asyncio.Event()
+        await self.queue.heartbeat()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            await self._loop()
+        finally:
+            heartbeat.cancel()
+
+    async def _loop(self):
+        while True:
+            try:
+                recovered = await self.queue.recover()
+                if recovered:
+                    print(f"DEBUG: Requeued {recovered} alerts left in flight by a dead dispatcher")
+                    self._wake.set()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), ALERT_POLL)
+                    await asyncio.sleep(ALERT_WINDOW)  # let the burst that woke us pile up
+                except asyncio.TimeoutError:
+                    pass  # other processes may have queued into Redis
+                self._wake.clear()
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"ERROR: Alert dispatcher: {e!r}")
+                await asyncio.sleep(ALERT_POLL)
+
+    def start(self):
+        if self.enabled and (self._task is None or self._task.done()):
+            self._wake = asyncio.Event()  # before the task runs, so alerts submitted right away still wake it
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._wake = None
+
+def _num(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+dispatcher = AlertDispatcher(AlertQueue(r))
@@ -8,6 +8,7 @@ import pandas as pd
 import time
 import os
 from dotenv import load_dotenv
+from stream_client import PropStream
 
 load_dotenv()
 
@@ -73,16 +74,21 @@ with st.sidebar:
 if 'page' not in st.session_state:
     st.session_state.page = 'nba'
 
-# Cached API fetch (5min TTL for live feel)
-@st.cache_data(ttl=300)
+# Live props: one shared stream per sport, kept current by backend pushes
+@st.cache_resource
+def prop_stream(sport):
+    return PropStream(BACKEND_URL, sport)
+
+INITIAL_SYNC_TIMEOUT = 5  # seconds a fresh stream gets to load the first snapshot before we render
+
 def fetch_props(endpoint):
-    try:
-        resp = requests.get(f"{BACKEND_URL}/{endpoint}", timeout=10)
-        resp.raise_for_status()
-        return resp.json()
-    except Exception as e:
-        st.error(f"Failed to fetch {endpoint}: {e}. Check BACKEND_URL.")
+    stream = prop_stream(endpoint.split('/')[0])
+    with st.spinner('Fetching live props...'):
+        stream.wait(INITIAL_SYNC_TIMEOUT)
+    if stream.error and not stream.version:
+        st.error(f"Failed to fetch {endpoint}: {stream.error}. Check BACKEND_URL.")
         return []
+    return stream.props()
 
 # Main Content: Responsive 3-col grid (stacks on mobile)
 def render_grid(props, title, chart_type='bar'):
@@ -94,4 +100,55 @@ def render_grid(props, title, chart_type='bar'):
     with cols[0] if len(cols) > 1 else cols[0]:
         st.markdown(f'<div class="card"><h2 style="color:#F87171;">{title} Overview</h2></div>', unsafe_allow_html=True)
         if chart_type == 'bar':
-            fig = px.bar(df.head(8),
+            fig = px.bar(df.head(8), x='player', y='adjusted_prob', color='risk_score',
+                         color_continuous_scale=['#0D9488', '#F87171'], title=f"{title} Adjusted Probabilities",
+                         hover_data=['prop', 'line', 'fair_prob'], labels={'adjusted_prob': 'Prob %', 'risk_score': 'Risk %'})
+            fig.update_layout(showlegend=False, xaxis_tickangle=45)
+        else:
+            fig = go.Figure(go.Scatter(x=df['risk_score'], y=df['adjusted_prob'], mode='markers', text=df['player']))
+            fig.update_layout(title=f"{title} Risk vs Probability", xaxis_title='Risk %', yaxis_title='Prob %')
+        st.plotly_chart(fig, use_container_width=True)
+    # Props as metric cards (2-col, stacks on mobile)
+    cards = st.columns(2)
+    for i, prop in enumerate(props[:6]):
+        with cards[i % 2]:
+            icon = "🔴" if prop.get('risk_score', 0) > 10 else "🟢"
+            st.metric(label=f"{icon} {prop['player']} {prop['prop'].title()}", value=f"{prop['line']}",
+                      delta=f"{prop['adjusted_prob']:.1f}% Adj.")
+            with st.expander(f"Tweets for {prop['player']}", expanded=prop.get('risk_score', 0) > 10):
+                for t in prop.get('tweets', [])[:2]:
+                    st.caption(f"• {t['text']} (Score: {t['score']:.2f})")
+
+def render_arbs():
+    st.markdown('<div class="card"><h2 style="color:#F87171;">⚡ Arbs & Middles</h2></div>', unsafe_allow_html=True)
+    found = {"arbs": [], "middles": []}
+    for sport in ('nba', 'ncaab'):
+        stream = prop_stream(sport)
+        stream.wait(INITIAL_SYNC_TIMEOUT)
+        for kind, opps in stream.arbs().items():
+            found[kind].extend(opps)
+    if not found["arbs"] and not found["middles"]:
+        st.info("No cross-book opportunities right now.")
+        return
+    if found["arbs"]:
+        arbs_df = pd.DataFrame([{'Player': f"{a['player']} {a['market']} {a['line']}", 'Margin': a['margin'],
+                                 'Over': f"{a['over']['book']} {a['over']['price']}",
+                                 'Under': f"{a['under']['book']} {a['under']['price']}"} for a in found["arbs"]])
+        chart = alt.Chart(arbs_df.head(10)).mark_bar(color='#F87171').encode(x='Player', y='Margin', tooltip=['Over', 'Under', 'Margin'])
+        st.altair_chart(chart, use_container_width=True)
+        st.dataframe(arbs_df, use_container_width=True)
+        confetti()
+    if found["middles"]:
+        st.subheader("Middles")
+        st.dataframe(pd.DataFrame(found["middles"]), use_container_width=True)
+
+page = st.session_state.page
+if page == 'nba':
+    render_grid(fetch_props('nba/props'), 'NBA')
+elif page == 'ncaab':
+    render_grid(fetch_props('ncaab/props'), 'NCAAB', chart_type='scatter')
+else:
+    render_arbs()
+
+st.markdown('</div>', unsafe_allow_html=True)
+
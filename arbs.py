@@ -0,0 +1,96 @@
+from typing import Dict, Optional
+import numpy as np
+from odds_table import OutcomeTable, OVER, UNDER
+
+# Cross-book arbitrage and middles over every book's outcome on the slate.
+# Arb:    best over + best under at the same (event, player, market, line) with 1/o + 1/u < 1.
+# Middle: over at a lower line and under at a higher line of the same prop; both
+#         tickets cash if the result lands between the lines.
+
+ARB_MIN_MARGIN = 0.0
+MIDDLE_MAX_HOLD = 1.05  # combined implied prob; a little juice is worth a shot at the middle
+_SEGMENT = 1e4  # > any decimal price; offsets groups for the segmented running max
+
+def scan(table: OutcomeTable, top_k: int = 20, min_margin: float = ARB_MIN_MARGIN, max_middle_hold: float = MIDDLE_MAX_HOLD,
+         per_prop: Optional[int] = None) -> Dict:
+    # per_prop: keep at most that many arbs (and middles) per (event, player, market) before the global top_k
+    if len(table) == 0:
+        return {"arbs": [], "middles": [], "outcomes": 0}
+    gkey = table.group_key()
+    # Sort by (prop, line, side, price desc): the first row of each (prop, line, side) run is its best price
+    order = np.lexsort((-table.price, table.side, table.line, gkey))
+    g, line, side, price, book = gkey[order], table.line[order], table.side[order], table.price[order], table.book[order]
+    new_pair = np.empty(len(order), bool)
+    new_pair[0] = True
+    new_pair[1:] = (g[1:] != g[:-1]) | (line[1:] != line[:-1])
+    best = new_pair.copy()
+    best[1:] |= side[1:] != side[:-1]
+    pair_id = np.cumsum(new_pair) - 1
+    n_pairs = int(pair_id[-1]) + 1
+
+    # One row per (prop, line): best over/under price and the book offering it
+    over_px, under_px = np.zeros(n_pairs), np.zeros(n_pairs)
+    over_bk, under_bk = np.full(n_pairs, -1, np.int32), np.full(n_pairs, -1, np.int32)
+    for s, px, bk in ((OVER, over_px, over_bk), (UNDER, under_px, under_bk)):
+        m = best & (side == s)
+        px[pair_id[m]] = price[m]
+        bk[pair_id[m]] = book[m]
+    first_row = order[new_pair]  # a representative outcome row per pair, for names
+    pair_g, pair_line = g[new_pair], line[new_pair]
+
+    with np.errstate(divide="ignore"):
+        inv_over = np.where(over_px > 0, 1.0 / over_px, np.inf)
+        inv_under = np.where(under_px > 0, 1.0 / under_px, np.inf)
+
+    # Arbs
+    hold = inv_over + inv_under
+    arb_idx = _top(_per_group(np.flatnonzero(hold < 1.0 - min_margin), hold, pair_g, per_prop), hold, top_k)
+    arbs = [dict(
+        table.describe(first_row[i]), line=float(pair_line[i]),
+        over={"book": table.books[over_bk[i]], "price": float(over_px[i])},
+        under={"book": table.books[under_bk[i]], "price": float(under_px[i])},
+        margin=round(float(1 - hold[i]) * 100, 2), hold=round(float(hold[i]) * 100, 2),
+    ) for i in arb_idx]
+
+    # Middles: best over from any strictly lower line of the same prop vs. this line's under
+    new_group = np.empty(n_pairs, bool)
+    new_group[0] = True
+    new_group[1:] = pair_g[1:] != pair_g[:-1]
+    offset = (np.cumsum(new_group) - 1) * _SEGMENT
+    running = np.maximum.accumulate(offset + over_px) - offset
+    lower_over = np.empty(n_pairs)
+    lower_over[0] = 0.0
+    lower_over[1:] = running[:-1]
+    lower_over[new_group] = 0.0
+    with np.errstate(divide="ignore"):
+        mid_hold = np.where(lower_over > 0, 1.0 / lower_over, np.inf) + inv_under
+    mid_idx = _top(_per_group(np.flatnonzero(mid_hold < max_middle_hold), mid_hold, pair_g, per_prop), mid_hold, top_k)
+    group_start = np.maximum.accumulate(np.where(new_group, np.arange(n_pairs), 0))
+    middles = []
+    for j in mid_idx:
+        # Resolve which lower line carried that price (only for the K results we return)
+        start = group_start[j]
+        i = start + int(np.argmax(over_px[start:j]))
+        middles.append(dict(
+            table.describe(first_row[j]),
+            over={"book": table.books[over_bk[i]], "price": float(over_px[i]), "line": float(pair_line[i])},
+            under={"book": table.books[under_bk[j]], "price": float(under_px[j]), "line": float(pair_line[j])},
+            gap=round(float(pair_line[j] - pair_line[i]), 1), hold=round(float(mid_hold[j]) * 100, 2),
+        ))
+    return {"arbs": arbs, "middles": middles, "outcomes": len(table)}
+
+def _top(candidates: np.ndarray, score: np.ndarray, k: int) -> np.ndarray:
+    # Lowest-score k candidates, sorted
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(score[candidates], k)[:k]]
+    return candidates[np.argsort(score[candidates], kind="stable")]
+
+def _per_group(candidates: np.ndarray, score: np.ndarray, groups: np.ndarray, k: Optional[int]) -> np.ndarray:
+    # The k lowest-score candidates of each group
+    if k is None or len(candidates) <= k:
+        return candidates
+    candidates = candidates[np.lexsort((score[candidates], groups[candidates]))]
+    g = groups[candidates]
+    idx = np.arange(len(candidates))
+    first = np.maximum.accumulate(np.where(np.r_[True, g[1:] != g[:-1]], idx, 0))
+    return candidates[idx - first < k]
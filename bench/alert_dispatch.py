@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench.stub_upstream import StubUpstream
+
+# Alert delivery against the stub Discord webhook (rate limited like the real one,
+# 5 posts / 2 s by default): the old one-POST-per-alert loop vs alerts.dispatcher
+# (dedup, coalesced batches, Retry-After). Alerts arrive in bursts, some repeated.
+#   python bench/alert_dispatch.py --alerts 200 --dup 0.3 --limit 5
+
+def make_alerts(n: int, dup: float, seed: int):
+    rng = random.Random(seed)
+    alerts = []
+    for i in range(n):
+        if alerts and rng.random() < dup:
+            alerts.append(dict(rng.choice(alerts)))
+        else:
+            alerts.append({"kind": "risk_jump", "player": f"Player {i}", "prop": "player_points", "line": 20.5,
+                           "risk_score": 40.0, "prev_risk": 10.0})
+    return alerts
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--alerts", type=int, default=200)
+    ap.add_argument("--dup", type=float, default=0.3, help="share of alerts repeating an earlier one")
+    ap.add_argument("--limit", type=int, default=5, help="webhook posts per --period before 429")
+    ap.add_argument("--period", type=float, default=2.0)
+    ap.add_argument("--latency", type=float, default=0.05)
+    args = ap.parse_args()
+    alerts = make_alerts(args.alerts, args.dup, seed=7)
+
+    with StubUpstream(latency=args.latency, webhook_limit=args.limit, webhook_period=args.period) as stub:
+        webhook = f"{stub.url}/discord/webhook"
+        os.environ.update(DISCORD_WEBHOOK=webhook, ALERT_WINDOW="0.2", REDIS_URL=os.getenv("BENCH_REDIS_URL", "redis://127.0.0.1:1"))
+        import httpx
+        import alerts as alerting
+        import upstream
+
+        t0 = time.perf_counter()
+        ok = 0
+        with httpx.Client() as client:
+            for a in alerts:
+                ok += client.post(webhook, json={"content": alerting.format_alert(a)}).status_code < 300
+        naive = time.perf_counter() - t0
+        naive_429 = stub.webhook_429s
+        stub.webhooks.clear()
+        time.sleep(args.period)  # let the window reset
+
+        async def dispatched():
+            d = alerting.dispatcher
+            d.start()
+            t0 = time.perf_counter()
+            queued = 0
+            for i in range(0, len(alerts), 20):  # bursts, as rules fire per snapshot
+                queued += await d.submit(alerts[i:i + 20])
+            while sum(w["content"].count("\n") + 1 for w in stub.webhooks) < queued:
+                await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - t0
+            await d.stop()
+            await upstream.aclose_clients()
+            return queued, elapsed
+
+        queued, batched = asyncio.run(dispatched())
+        delivered = sum(w["content"].count("\n") + 1 for w in stub.webhooks)
+
+    print(f"{args.alerts} alerts ({args.dup:.0%} repeats), webhook limit {args.limit}/{args.period}s, latency {args.latency}s")
+    print(f"{'mode':<11} {'time':>8} {'posts':>6} {'429s':>5} {'delivered':>10}")
+    print(f"{'per-alert':<11} {naive:7.2f}s {args.alerts:6d} {naive_429:5d} {ok:10d}")
+    print(f"{'dispatcher':<11} {batched:7.2f}s {len(stub.webhooks):6d} {stub.webhook_429s - naive_429:5d} {delivered:10d}"
+          f"  ({args.alerts - queued} duplicates suppressed)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Cold start of the API: `python -X importtime` breakdown of `import main`, then
+# a fresh process per sentiment config timing import + first /nba/props request
+# against the stub upstream. Configs are BACKEND/COLD ("hf/" loads the model inline).
+#   python bench/cold_start.py --configs lexicon/,hf/lexicon,hf/ --max-import-ms 1500
+
+HEAVY = ["transformers", "torch", "onnxruntime", "tokenizers", "requests", "pandas", "numpy"]
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def bench_env(extra=None):
+    env = dict(os.environ, ODDS_API_KEY="bench", X_BEARER_TOKEN="bench", INGEST_ENABLED="0",
+               REDIS_URL=os.getenv("BENCH_REDIS_URL", "redis://127.0.0.1:1"))
+    env.update(extra or {})
+    return env
+
+def importtime(module: str, top: int):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                          env=bench_env(), capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            rows.append((int(m.group(2)), len(m.group(3)) // 2, m.group(4)))
+    total = next((us for us, _, name in rows if name == module), 0)
+    loaded = {name.split(".")[0] for _, _, name in rows}
+    print(f"import {module}: {total / 1000:.0f} ms cumulative")
+    for us, depth, name in sorted((r for r in rows if r[1] == 1), reverse=True)[:top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    print("  heavy modules at import: " + (", ".join(m for m in HEAVY if m in loaded) or "none"))
+    return total / 1000
+
+def child(backend: str, cold: str):
+    # Runs in a fresh interpreter so nothing is warm
+    from bench.stub_upstream import StubUpstream
+    with StubUpstream(latency=0.05) as stub:
+        os.environ.update(ODDS_API_URL=f"{stub.url}/v4", X_API_URL=f"{stub.url}/2",
+                          SENTIMENT_BACKEND=backend, SENTIMENT_COLD_BACKEND=cold)
+        t0 = time.perf_counter()
+        import main
+        imported = time.perf_counter() - t0
+        from fastapi.testclient import TestClient
+        import sentiment
+        with TestClient(main.app) as client:
+            t1 = time.perf_counter()
+            status = client.get("/nba/props").status_code
+            first = time.perf_counter() - t1
+            t2 = time.perf_counter()
+            client.get("/nba/props")
+            second = time.perf_counter() - t2
+        deadline = time.time() + 120
+        while not sentiment.get_backend(backend).loaded and not sentiment.failed(backend) and time.time() < deadline:
+            time.sleep(0.05)
+        warm = time.perf_counter() - t0
+    print(json.dumps({"import_ms": imported * 1000, "first_ms": first * 1000, "second_ms": second * 1000,
+                      "warm_s": warm, "status": status, "failed": sentiment.failed(backend)}))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--configs", default="lexicon/,hf/lexicon,hf/")
+    ap.add_argument("--module", default="main")
+    ap.add_argument("--top", type=int, default=12)
+    ap.add_argument("--max-import-ms", type=float, default=0, help="exit 1 when `import main` is slower")
+    ap.add_argument("--child")
+    args = ap.parse_args()
+    if args.child:
+        child(*args.child.split("/", 1))
+        return
+
+    total = importtime(args.module, args.top)
+    print(f"\n{'config':<14} {'import':>9} {'1st req':>9} {'2nd req':>9} {'model warm':>11}")
+    for config in args.configs.split(","):
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", config], cwd=ROOT,
+                              env=bench_env(), capture_output=True, text=True)
+        try:
+            res = json.loads(proc.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            print(f"{config:<14} failed: {proc.stderr.strip().splitlines()[-1:]}")
+            continue
+        note = "  (load failed, fell back to lexicon)" if res["failed"] else ""
+        print(f"{config:<14} {res['import_ms']:7.0f}ms {res['first_ms']:7.0f}ms {res['second_ms']:7.0f}ms {res['warm_s']:9.1f}s{note}")
+    if args.max_import_ms and total > args.max_import_ms:
+        print(f"FAIL: import {args.module} took {total:.0f} ms > {args.max_import_ms:.0f} ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
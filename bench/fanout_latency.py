@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench.stub_upstream import StubUpstream
+
+# Sequential (old per-player requests.get loop) vs pooled concurrent fan-out
+# vs packed multi-player queries for the X lookups on a /nba/props refresh.
+#   python bench/fanout_latency.py --players 12 --latency 0.2
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=12)
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--concurrency", type=int, default=8)
+    args = ap.parse_args()
+
+    with StubUpstream(latency=args.latency) as stub:
+        os.environ["X_API_URL"] = f"{stub.url}/2"
+        os.environ.setdefault("X_BEARER_TOKEN", "bench")
+        import requests
+        import upstream
+        import xsearch
+
+        players = [f"Player {i}" for i in range(args.players)]
+        query = lambda p: f'({p} {upstream.INJURY_TERMS}) {upstream.BEAT_WRITERS} -is:retweet'
+
+        t0 = time.perf_counter()
+        for p in players:
+            requests.get(f"{stub.url}/2/tweets/search/recent", params={"query": query(p), "max_results": 5}, timeout=10).json()
+        sequential = time.perf_counter() - t0
+
+        async def concurrent():
+            fetch = lambda p: upstream.search_recent(query(p), max_results=5)
+            await upstream.fan_out(players, fetch, default=lambda p: {}, limit=args.concurrency)  # warm pool
+            t0 = time.perf_counter()
+            _, missed = await upstream.fan_out(players, fetch, default=lambda p: {}, limit=args.concurrency)
+            elapsed = time.perf_counter() - t0
+            calls = stub.calls.get("/2/tweets/search/recent", 0)
+            matcher = xsearch.PlayerMatcher(players)
+            batches = xsearch.plan_batches(players)
+            t0 = time.perf_counter()
+            found, _ = await upstream.fan_out(range(len(batches)), lambda i: xsearch.search_batch(batches[i], matcher),
+                                              default=lambda i: {}, limit=args.concurrency)
+            packed = time.perf_counter() - t0
+            attributed = sum(1 for b in found.values() for tweets in b.values() if tweets)
+            packed_calls = stub.calls.get("/2/tweets/search/recent", 0) - calls
+            await upstream.aclose_clients()
+            return elapsed, missed, packed, packed_calls, attributed
+
+        parallel, missed, packed, packed_calls, attributed = asyncio.run(concurrent())
+
+    print(f"players={args.players} latency={args.latency}s concurrency={args.concurrency}")
+    print(f"sequential: {sequential * 1000:8.1f} ms")
+    print(f"concurrent: {parallel * 1000:8.1f} ms  (missed={len(missed)})")
+    print(f"packed:     {packed * 1000:8.1f} ms  (x_calls={packed_calls}, players_with_tweets={attributed})")
+    print(f"speedup:    {sequential / parallel:8.1f}x concurrent, {sequential / packed:.1f}x packed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:1")
+import inference
+import sentiment
+
+# Shared inference worker throughput vs max batch size, with concurrent clients
+# sending unique tweets over the worker socket. "synthetic" stands in for a model:
+# fixed cost per forward pass plus a smaller cost per text, which is what batching amortizes.
+#   python bench/inference_batching.py --backend synthetic --clients 16 --batches 1,8,32,64
+#   python bench/inference_batching.py --backend hf      # real model; also reports its RSS
+
+class SyntheticBackend(sentiment.Backend):
+    name = "synthetic"
+
+    def __init__(self, per_batch: float, per_text: float):
+        super().__init__()
+        self.per_batch, self.per_text = per_batch, per_text
+        self.loaded = True
+
+    def score(self, texts):
+        time.sleep(self.per_batch + self.per_text * len(texts))
+        return [0.5] * len(texts)
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def start_worker(backend, max_batch: int, max_wait_ms: float, address: str):
+    ready = threading.Event()
+    batcher = inference.MicroBatcher(backend, max_batch, max_wait_ms)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=lambda: loop.run_until_complete(inference.serve(batcher, address, ready)), daemon=True).start()
+    ready.wait(10)
+    return batcher, loop
+
+async def drive(address: str, clients: int, requests: int, per_request: int, tag: str) -> float:
+    client = inference.WorkerClient(address)
+    async def one(c):
+        for i in range(requests):
+            await client.score([f"{tag} client {c} req {i} tweet {j} questionable ankle" for j in range(per_request)])
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(c) for c in range(clients)))
+    return time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--backend", default="synthetic")
+    ap.add_argument("--batches", default="1,4,16,32,64")
+    ap.add_argument("--max-wait-ms", type=float, default=10)
+    ap.add_argument("--clients", type=int, default=16)
+    ap.add_argument("--requests", type=int, default=10, help="per client")
+    ap.add_argument("--per-request", type=int, default=5, help="tweets per request (one player's worth)")
+    ap.add_argument("--per-batch-ms", type=float, default=15)
+    ap.add_argument("--per-text-ms", type=float, default=1)
+    args = ap.parse_args()
+
+    before = rss_mb()
+    if args.backend == "synthetic":
+        backend = SyntheticBackend(args.per_batch_ms / 1000, args.per_text_ms / 1000)
+    else:
+        backend = sentiment.get_backend(args.backend)
+        backend.load()
+    model_mb = rss_mb() - before
+    print(f"backend={backend.name} model RSS +{model_mb:.0f} MB (paid once by the worker instead of per API process)")
+    total = args.clients * args.requests * args.per_request
+    print(f"{args.clients} clients x {args.requests} requests x {args.per_request} tweets = {total} unique tweets")
+    print(f"{'max_batch':>9} {'tweets/s':>10} {'batches':>8} {'avg batch':>10}")
+    for max_batch in [int(b) for b in args.batches.split(",")]:
+        address = f"unix:/tmp/pp-bench-inference-{os.getpid()}-{max_batch}.sock"
+        batcher, _ = start_worker(backend, max_batch, args.max_wait_ms, address)
+        elapsed = asyncio.run(drive(address, args.clients, args.requests, args.per_request, f"b{max_batch}"))
+        s = batcher.stats
+        print(f"{max_batch:>9} {total / elapsed:>10.0f} {s['batches']:>8} {s['batched'] / max(1, s['batches']):>10.1f}")
+    # Repeats are answered from the worker's LRU without touching the model
+    batches = batcher.stats["batches"]
+    elapsed = asyncio.run(drive(address, args.clients, args.requests, args.per_request, f"b{max_batch}"))
+    print(f"repeat pass: {total / elapsed:.0f} tweets/s, {batcher.stats['batches'] - batches} new batches")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.update(ODDS_API_KEY=os.getenv("ODDS_API_KEY", "bench"), X_BEARER_TOKEN=os.getenv("X_BEARER_TOKEN", "bench"),
+                  INGEST_ENABLED="0", REDIS_URL=os.getenv("BENCH_REDIS_URL", "redis://127.0.0.1:1"))
+import metrics
+
+# Cost of the instrumentation itself: one span() around an empty block, and a full
+# GET / through the middleware, with metrics off, on, and on with X-Profile.
+#   python bench/metrics_overhead.py --n 200000
+
+def per_span_ns(n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with metrics.span("bench"):
+            pass
+    return (time.perf_counter() - t0) / n * 1e9
+
+def per_request_us(client, n: int, headers=None) -> float:
+    client.get("/", headers=headers)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        client.get("/", headers=headers)
+    return (time.perf_counter() - t0) / n * 1e6
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200000, help="spans per mode")
+    ap.add_argument("--requests", type=int, default=500)
+    args = ap.parse_args()
+    import main as api
+    from fastapi.testclient import TestClient
+
+    profile = {"X-Profile": metrics.PROFILE_TOKEN or "1"}
+    print(f"{'mode':<10} {'span':>9} {'GET /':>10}")
+    with TestClient(api.app) as client:
+        for mode, enabled, headers in (("off", False, None), ("on", True, None), ("profiled", True, profile)):
+            metrics.METRICS_ENABLED = enabled
+            token = metrics._profile.set({}) if headers else None
+            span = per_span_ns(args.n)
+            if token is not None:
+                metrics._profile.reset(token)
+            print(f"{mode:<10} {span:7.0f}ns {per_request_us(client, args.requests, headers):8.0f}us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench.stub_upstream import make_slate
+from odds_table import parse_outcome
+from odds_store import OddsStore
+from props_pipeline import normalize
+import numpy as np
+import pricing
+
+# No-vig pricing on synthetic slates: the per-quote kernel for each de-vig method, a
+# plain Python loop for reference (multiplicative), and OddsStore.reprice for the whole
+# board (plus building the entries for the lines props render) and after only a share
+# of the prices moved.
+#   python bench/pricing_engine.py --events 200 --players 10 --books 6 --moved 0.05
+
+def python_fair(odds_data):
+    quotes = {}
+    for event in odds_data:
+        for b in event['bookmakers']:
+            for m in b['markets']:
+                for o in m['outcomes']:
+                    player, side = parse_outcome(o)
+                    quotes.setdefault((event['id'], player, m['key'], o['point']), {}).setdefault(b['title'], {})[side] = o['price']
+    fair = {}
+    for key, books in quotes.items():
+        probs = [(1 / s[0]) / (1 / s[0] + 1 / s[1]) for s in books.values() if 0 in s and 1 in s]
+        if probs:
+            fair[key] = sum(probs) / len(probs)
+    return fair
+
+def move(slate, share: float, seed: int):
+    rng = random.Random(seed)
+    for event in slate:
+        for b in event['bookmakers']:
+            for m in b['markets']:
+                for o in m['outcomes']:
+                    if rng.random() < share:
+                        o['price'] = round(o['price'] + rng.choice([-0.05, 0.05]), 2)
+    return slate
+
+def timed(fn, repeat: int):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return (time.perf_counter() - t0) / repeat * 1000, out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=200)
+    ap.add_argument("--players", type=int, default=10)
+    ap.add_argument("--books", type=int, default=6)
+    ap.add_argument("--moved", type=float, default=0.05, help="share of prices that move between refreshes")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+    slate = make_slate(args.events, args.players, args.books)
+
+    store = OddsStore("bench")
+    update_ms, delta = timed(lambda: store.update(slate), 1)
+    q = store.quotes
+    live = np.flatnonzero(q.prop[:q.size] >= 0)
+    print(f"outcomes={sum(1 for _ in store.rows(store.books_by_prop))} quotes={len(live)} props={len(store.books_by_prop)}")
+    print(f"store update:       {update_ms:8.2f} ms  (diff + apply, first payload)")
+    for method in pricing.METHODS:
+        ms, priced = timed(lambda: pricing.price(q.prop[live], q.line[live], q.over[live], q.under[live], method), args.repeat)
+        print(f"price {method:<14} {ms:6.2f} ms  ({len(priced['prop'])} props x lines)")
+    full_ms, _ = timed(lambda: store.reprice(delta.props()), 1)
+    print(f"store reprice all:  {full_ms:8.2f} ms  (kernel, arrays for every prop)")
+    rendered = normalize(slate)
+    lookup_ms, _ = timed(lambda: [store.fair_entry(row[:3], row[3]) for row in rendered], 1)
+    print(f"  + rendered lines: {lookup_ms:8.2f} ms  (dicts for the {len(rendered)} lines props show)")
+    loop_ms, reference = timed(lambda: python_fair(slate), 1)
+    print(f"python loop:        {loop_ms:8.2f} ms")
+    worst = max(abs(store.fair_entry(k[:3], k[3])["fair_prob"] - round(p * 100, 1)) for k, p in reference.items())
+    assert worst <= 0.1 + 1e-9, "engine and reference disagree"
+
+    delta = store.update(move(slate, args.moved, seed=3))
+    inc_ms, _ = timed(lambda: store.reprice(delta.props()), 1)
+    print(f"store reprice {args.moved:.0%}:  {inc_ms:8.2f} ms  ({len(delta.props())} of {len(store.books_by_prop)} props touched)")
+
+if __name__ == "__main__":
+    main()
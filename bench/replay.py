@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from bench.stub_upstream import StubUpstream
+
+# Offline load test: the API runs under uvicorn in a child process against the stub
+# Odds API / X / Discord, and a client drives a weighted route mix at fixed concurrency.
+# Reports per-route p50/p95/p99, throughput, server peak RSS and upstream calls, and
+# writes everything to JSON so runs can be diffed over time (--compare an older file).
+#   python bench/replay.py --concurrency 32 --duration 30 --latency 0.1 --error-rate 0.02
+#   python bench/replay.py --recording slate.json --compare bench/results/replay-<stamp>.json
+
+ROUTES = {
+    "nba": ("GET", "/nba/props"),
+    "ncaab": ("GET", "/ncaab/props"),
+    "alert": ("POST", "/alert"),
+    "health": ("GET", "/health"),
+}
+ALERT = {"player": "Player 0-0", "prop": "player_points", "line": 24.5, "risk_score": 12.5}
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ROUTES:
+            raise SystemExit(f"unknown route {name!r}, pick from {sorted(ROUTES)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+def percentile(samples: List[float], q: float) -> float:
+    # Nearest rank on a sorted list
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, max(0, int(round(q / 100 * len(samples))) - 1))]
+
+def summarize(samples: List[float], errors: int) -> Dict:
+    samples = sorted(samples)
+    return {"count": len(samples), "errors": errors, "mean_ms": sum(samples) / max(1, len(samples)),
+            "p50_ms": percentile(samples, 50), "p95_ms": percentile(samples, 95), "p99_ms": percentile(samples, 99),
+            "max_ms": samples[-1] if samples else 0.0}
+
+def git_rev() -> str:
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return proc.stdout.strip()
+
+def start_server(stub: StubUpstream, port: int, args) -> subprocess.Popen:
+    env = dict(os.environ, ODDS_API_KEY="bench", X_BEARER_TOKEN="bench", ODDS_API_URL=f"{stub.url}/v4",
+               X_API_URL=f"{stub.url}/2", DISCORD_WEBHOOK=f"{stub.url}/discord/webhook",
+               INGEST_ENABLED="1" if args.ingest else "0", SENTIMENT_BACKEND=args.sentiment,
+               REDIS_URL=os.getenv("BENCH_REDIS_URL", "redis://127.0.0.1:1"))
+    log = open(args.server_log, "w") if args.server_log else subprocess.DEVNULL
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+async def wait_ready(client, proc: subprocess.Popen, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"server exited with {proc.returncode} (rerun with --server-log to see why)")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise SystemExit("server did not become ready")
+
+async def call(client, route: str):
+    method, path = ROUTES[route]
+    if method == "POST":
+        return await client.post(path, json=ALERT)
+    return await client.get(path)
+
+async def drive(client, mix: Dict[str, int], args) -> Dict:
+    names, weights = list(mix), list(mix.values())
+    rng = random.Random(args.seed)
+    samples: Dict[str, List[float]] = {r: [] for r in mix}
+    errors: Dict[str, int] = {r: 0 for r in mix}
+    statuses: Dict[str, int] = {}
+    deadline = time.monotonic() + args.duration
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while time.monotonic() < deadline and (not args.requests or issued < args.requests):
+            issued += 1
+            route = rng.choices(names, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                status = (await call(client, route)).status_code
+            except Exception as e:
+                status = type(e).__name__
+            samples[route].append((time.perf_counter() - t0) * 1000)
+            statuses[f"{route}:{status}"] = statuses.get(f"{route}:{status}", 0) + 1
+            if not (isinstance(status, int) and 200 <= status < 300):  # /alert answers 202
+                errors[route] += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - t0
+    every = [s for v in samples.values() for s in v]
+    return {"elapsed_s": elapsed, "rps": len(every) / elapsed if elapsed else 0.0,
+            "overall": summarize(every, sum(errors.values())),
+            "routes": {r: summarize(samples[r], errors[r]) for r in mix}, "statuses": statuses}
+
+async def run(stub: StubUpstream, port: int, proc: subprocess.Popen, mix: Dict[str, int], args) -> Dict:
+    import httpx
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=args.timeout) as client:
+        await wait_ready(client, proc)
+        # First hit per route builds the snapshot; timed separately from the steady state
+        first = {}
+        for route in mix:
+            t0 = time.perf_counter()
+            await call(client, route)
+            first[route] = (time.perf_counter() - t0) * 1000
+        warm_calls = stub.call_counts()
+        result = await drive(client, mix, args)
+    calls = stub.call_counts()
+    result["first_ms"] = first
+    result["upstream_calls"] = calls
+    result["upstream_calls_steady"] = {k: v - warm_calls.get(k, 0) for k, v in calls.items()}
+    return result
+
+def peak_rss_mb(proc: subprocess.Popen) -> float:
+    # VmHWM while the server is alive; otherwise the children high-water mark (KB on Linux, bytes on macOS)
+    try:
+        with open(f"/proc/{proc.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    proc.wait()
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def compare(result: Dict, path: str):
+    with open(path) as f:
+        old = json.load(f)
+    def pct(new, prev):
+        return f"{(new - prev) / prev * 100:+6.1f}%" if prev else "    n/a"
+    print(f"\nvs {path} ({old.get('git', '?')}, {old.get('started_at', '?')})")
+    print(f"{'route':<8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for route, stats in result["routes"].items():
+        prev = old.get("routes", {}).get(route)
+        if prev:
+            print(f"{route:<8} {pct(stats['p50_ms'], prev['p50_ms'])} {pct(stats['p95_ms'], prev['p95_ms'])} {pct(stats['p99_ms'], prev['p99_ms'])}")
+    print(f"rps {pct(result['rps'], old.get('rps', 0))}  peak rss {pct(result['peak_rss_mb'], old.get('peak_rss_mb', 0))}")
+
+def report(result: Dict):
+    print(f"{result['config']['concurrency']} clients, {result['elapsed_s']:.1f}s, {result['rps']:.1f} req/s, "
+          f"peak rss {result['peak_rss_mb']:.0f} MB")
+    print(f"{'route':<8} {'n':>7} {'err':>5} {'first':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for route, s in result["routes"].items():
+        print(f"{route:<8} {s['count']:7d} {s['errors']:5d} {result['first_ms'][route]:7.1f}ms "
+              f"{s['p50_ms']:7.1f}ms {s['p95_ms']:7.1f}ms {s['p99_ms']:7.1f}ms")
+    print("upstream calls: " + ", ".join(f"{k}={v}" for k, v in sorted(result["upstream_calls"].items())))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=20, help="seconds of steady-state load")
+    ap.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = duration only)")
+    ap.add_argument("--mix", default="nba=6,ncaab=2,alert=1,health=1")
+    ap.add_argument("--latency", type=float, default=0.1, help="stub upstream latency per call (s)")
+    ap.add_argument("--jitter", type=float, default=0.02)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--events", type=int, default=5)
+    ap.add_argument("--players", type=int, default=4, help="players per event")
+    ap.add_argument("--books", type=int, default=3)
+    ap.add_argument("--recording", help="JSON of sport key -> Odds API /odds payload instead of synthetic slates")
+    ap.add_argument("--sentiment", default="lexicon", help="SENTIMENT_BACKEND for the server")
+    ap.add_argument("--ingest", action="store_true", help="run the background ingestor in the server")
+    ap.add_argument("--timeout", type=float, default=30)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--server-log")
+    ap.add_argument("--out", help="result JSON (default bench/results/replay-<utc stamp>.json)")
+    ap.add_argument("--compare", help="earlier result JSON to diff against")
+    args = ap.parse_args()
+    mix = parse_mix(args.mix)
+
+    started = datetime.now(timezone.utc)
+    stub = StubUpstream(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, n_events=args.events,
+                        players_per_event=args.players, books=args.books, recording=args.recording, seed=args.seed,
+                        sports=("basketball_nba", "basketball_ncaab"))
+    port = free_port()
+    with stub:
+        proc = start_server(stub, port, args)
+        try:
+            result = asyncio.run(run(stub, port, proc, mix, args))
+            result["peak_rss_mb"] = peak_rss_mb(proc)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    result = {"started_at": started.isoformat(), "git": git_rev(), "config": vars(args), **result}
+    report(result)
+    out = args.out or os.path.join(ROOT, "bench", "results", f"replay-{started:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"saved {out}")
+    if args.compare:
+        compare(result, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.update(ODDS_API_KEY=os.getenv("ODDS_API_KEY", "bench"), X_BEARER_TOKEN=os.getenv("X_BEARER_TOKEN", "bench"),
+                  INGEST_ENABLED="0", REDIS_URL=os.getenv("BENCH_REDIS_URL", "redis://127.0.0.1:1"))
+
+# Per-invocation overhead of the serverless entry points on a trivial route (GET /),
+# so the numbers are adapter cost, not app work:
+#   shim     the old api/index.py: new TestClient(app) per call, request replayed through it
+#   mangum   Mangum(app, lifespan="off"), the old main.handler
+#   adapter  serverless.ServerlessAdapter (main.lambda_handler)
+#   python bench/serverless_overhead.py --n 500
+
+def event(path: str):
+    return {
+        "version": "2.0", "rawPath": path, "rawQueryString": "", "headers": {"host": "bench", "accept": "application/json"},
+        "requestContext": {"http": {"method": "GET", "path": path, "sourceIp": "127.0.0.1"}, "stage": "$default"},
+        "isBase64Encoded": False,
+    }
+
+def time_calls(fn, n: int):
+    fn()  # warm
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    samples.sort()
+    return statistics.mean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=300)
+    ap.add_argument("--path", default="/")
+    args = ap.parse_args()
+    import main as api
+    from fastapi.testclient import TestClient
+
+    def shim():
+        client = TestClient(api.app)
+        resp = client.request("GET", args.path, headers={"accept": "application/json"})
+        assert resp.status_code == 200
+
+    ev = event(args.path)
+    def adapter():
+        assert api.lambda_handler(ev)["statusCode"] == 200
+
+    runs = [("shim", shim), ("adapter", adapter)]
+    try:
+        from mangum import Mangum
+        mangum = Mangum(api.app, lifespan="off")
+        runs.insert(1, ("mangum", lambda: mangum(ev, {})))
+    except ImportError:
+        print("mangum not installed, skipping")
+
+    print(f"GET {args.path} x {args.n}")
+    print(f"{'entry':<8} {'mean':>9} {'p50':>9} {'p99':>9}")
+    for name, fn in runs:
+        mean, p50, p99 = time_calls(fn, args.n)
+        print(f"{name:<8} {mean:7.0f}us {p50:7.0f}us {p99:7.0f}us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import urlparse, parse_qs
+
+# Local stand-in for The Odds API (/v4/...), X recent search (/2/...) and a Discord
+# webhook (POST /discord/webhook). Point ODDS_API_URL / X_API_URL / DISCORD_WEBHOOK at
+# it before importing settings. Slates are synthetic unless a recording is given:
+# a JSON object of sport key -> Odds API /odds response (e.g. saved with curl).
+
+BOOKS = ["DraftKings", "FanDuel", "BetMGM", "Caesars", "PointsBet", "BetRivers"]
+MARKETS = ["player_points", "player_rebounds", "player_assists"]
+
+def make_slate(n_events: int = 5, players_per_event: int = 4, books: int = 3, seed: int = 7,
+               sport_key: str = "basketball_nba") -> List[Dict]:
+    rng = random.Random(seed)
+    tip = datetime.now(timezone.utc) + timedelta(minutes=20)
+    # NBA keeps the plain ids/names other benches rely on; other sports get a prefix so slates don't collide
+    tag = "" if sport_key == "basketball_nba" else sport_key.split("_")[-1].upper() + " "
+    events = []
+    for e in range(n_events):
+        players = [f"Player {tag}{e}-{p}" for p in range(players_per_event)]
+        bookmakers = []
+        for b in BOOKS[:books]:
+            markets = []
+            for key in MARKETS:
+                outcomes = []
+                for name in players:
+                    line = rng.choice([4.5, 6.5, 8.5, 19.5, 24.5, 27.5])
+                    over = round(rng.uniform(1.75, 2.1), 2)
+                    under = round(1 / max(0.05, 1.05 - 1 / over), 2)
+                    outcomes.append({"name": "Over", "description": name, "price": over, "point": line})
+                    outcomes.append({"name": "Under", "description": name, "price": under, "point": line})
+                markets.append({"key": key, "outcomes": outcomes})
+            bookmakers.append({"key": b.lower(), "title": b, "markets": markets})
+        commence = (tip + timedelta(minutes=30 * e)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        events.append({"id": f"{tag.strip().lower()}evt{e}", "sport_key": sport_key, "commence_time": commence,
+                       "home_team": f"Home {e}", "away_team": f"Away {e}", "bookmakers": bookmakers})
+    return events
+
+def load_recording(path: str) -> Dict[str, List[Dict]]:
+    with open(path) as f:
+        slates = json.load(f)
+    for sport_key, events in slates.items():
+        for e in events:
+            e.setdefault("sport_key", sport_key)
+    return slates
+
+class StubUpstream:
+    def __init__(self, latency: float = 0.1, n_events: int = 5, players_per_event: int = 4, books: int = 3, credits: int = 20000,
+                 jitter: float = 0.0, error_rate: float = 0.0, sports=("basketball_nba",), recording: str = None, seed: int = 7,
+                 webhook_limit: int = 0, webhook_period: float = 2.0):
+        # latency +- jitter seconds per call; error_rate of calls answer 503 (odds) / 429 (X) / 500 (webhook).
+        # webhook_limit > 0 rate-limits the webhook like Discord: that many posts per webhook_period, then 429.
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.slates = load_recording(recording) if recording else {
+            s: make_slate(n_events, players_per_event, books, seed=seed + i, sport_key=s) for i, s in enumerate(sports)}
+        self.slate = next(iter(self.slates.values()), [])
+        self.rng = random.Random(seed)
+        self.webhook_limit = webhook_limit
+        self.webhook_period = webhook_period
+        self.webhooks: List[Dict] = []  # accepted webhook bodies
+        self.webhook_429s = 0
+        self._window: List[float] = []
+        self.credits_used = 0
+        self.credits = credits
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                stub.count(url.path)
+                stub.wait()
+                if url.path != "/discord/webhook":
+                    return self._send(404, {})
+                if stub.fail():
+                    return self._send(500, {"message": "stub error"})
+                status, body, headers = stub.webhook(json.loads(raw or b"{}"))
+                self._send(status, body, headers)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                stub.count(url.path)
+                stub.wait()
+                query = parse_qs(url.query)
+                parts = url.path.strip("/").split("/")
+                headers = {}
+                if stub.fail():
+                    status = 429 if parts[0] == "2" else 503
+                    return self._send(status, {"message": "stub error"}, {"retry-after": "1"})
+                if parts[:2] == ["v4", "sports"] and len(parts) == 4 and parts[3] == "events":
+                    body = [{k: v for k, v in e.items() if k != "bookmakers"} for e in stub.slates.get(parts[2], [])]
+                elif parts[:2] == ["v4", "sports"] and len(parts) == 6 and parts[3] == "events":
+                    markets = query.get("markets", [""])[0].split(",")
+                    body = stub.event_odds(parts[2], parts[4], markets)
+                    if body is None:
+                        return self._send(404, {"message": "Event not found"})
+                    headers = stub.charge(len({m["key"] for b in body["bookmakers"] for m in b["markets"]}))
+                elif parts[:2] == ["v4", "sports"]:
+                    body = stub.slates.get(parts[2], [])
+                    headers = stub.charge(len(MARKETS))
+                elif url.path == "/2/tweets/search/recent":
+                    body = stub.tweets(query.get("query", [""])[0])
+                else:
+                    return self._send(404, {})
+                self._send(200, body, headers)
+
+            def _send(self, status: int, body, headers: Dict[str, str] = None):
+                payload = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def event_odds(self, sport_key: str, event_id: str, markets: List[str]):
+        for e in self.slates.get(sport_key, []):
+            if e["id"] == event_id:
+                books = [{**b, "markets": [m for m in b["markets"] if m["key"] in markets]} for b in e["bookmakers"]]
+                return {**e, "bookmakers": books}
+        return None
+
+    def charge(self, cost: int) -> Dict[str, str]:
+        # Odds API usage headers: credits used/remaining this month and the cost of this call
+        with self._lock:
+            self.credits_used += cost
+            return {"x-requests-used": str(self.credits_used), "x-requests-remaining": str(self.credits - self.credits_used),
+                    "x-requests-last": str(cost)}
+
+    def tweets(self, query: str) -> Dict:
+        # One beat-writer tweet per player named in the (possibly packed) query
+        names = re.findall(r'"([^"]+)"', query) or [query.split(" (")[0].strip("(")]
+        data = [{"id": str(abs(hash(n)) % 10**9), "text": f"{n} is questionable tonight (ankle)"} for n in names]
+        return {"data": data, "meta": {"result_count": len(data)}}
+
+    def webhook(self, body: Dict):
+        # Sliding-window limit with Discord's headers; the 429 carries Retry-After
+        with self._lock:
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < self.webhook_period]
+            headers = {"x-ratelimit-bucket": "stub-webhook", "x-ratelimit-limit": str(self.webhook_limit)}
+            if self.webhook_limit and len(self._window) >= self.webhook_limit:
+                retry = round(self.webhook_period - (now - self._window[0]), 3)
+                self.webhook_429s += 1
+                return 429, {"message": "You are being rate limited.", "retry_after": retry, "global": False}, \
+                    {**headers, "retry-after": str(retry), "x-ratelimit-remaining": "0"}
+            self._window.append(now)
+            self.webhooks.append(body)
+            if self.webhook_limit:
+                headers["x-ratelimit-remaining"] = str(self.webhook_limit - len(self._window))
+                headers["x-ratelimit-reset-after"] = str(round(self.webhook_period - (now - self._window[0]), 3))
+            return 204, None, headers
+
+    def wait(self):
+        with self._lock:
+            delay = self.latency + self.rng.uniform(-self.jitter, self.jitter) if self.jitter else self.latency
+        time.sleep(max(0.0, delay))
+
+    def fail(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+    def count(self, path: str):
+        with self._lock:
+            self.calls[path] = self.calls.get(path, 0) + 1
+
+    def call_counts(self) -> Dict[str, int]:
+        # Per-path counts folded into one bucket per upstream endpoint
+        out: Dict[str, int] = {}
+        for path, n in list(self.calls.items()):
+            parts = path.strip("/").split("/")
+            if parts[:2] == ["v4", "sports"]:
+                name = "odds_events" if parts[-1] == "events" else "odds_event_odds" if "events" in parts else "odds_sport"
+            elif parts[:1] == ["2"]:
+                name = "x_search"
+            elif parts[:1] == ["discord"]:
+                name = "discord_webhook"
+            else:
+                name = "other"
+            out[name] = out.get(name, 0) + n
+        return out
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,336 @@
+import asyncio
+import calendar
+import hashlib
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import orjson
+from cache import r, encode, decode
+from settings import ODDS_REGIONS, ODDS_MARKETS, ODDS_MONTHLY_CREDITS, ODDS_CREDIT_RESERVE, ODDS_TIMEOUT
+import upstream
+
+# Odds API credit budgeting. Player props are fetched per event, and only for
+# (event, market) pairs that are due: games close to tip-off are refreshed often,
+# markets that keep coming back unchanged back off, and the whole thing is paced
+# so the monthly credit budget lasts until the month rolls over.
+
+# (seconds until tip-off, refresh interval)
+CADENCE = [
+    (30 * 60, 30),
+    (2 * 3600, 60),
+    (6 * 3600, 180),
+    (24 * 3600, 600),
+]
+IDLE_INTERVAL = 1800
+LIVE_WINDOW = 3 * 3600  # a game that tipped this long ago may still be live
+MAX_BACKOFF = 3  # unchanged markets wait up to 2**3 x their interval
+MAX_SLOWDOWN = 16.0
+BURST_WINDOW = 3600  # token bucket holds up to an hour of paced spend
+EVENT_CONCURRENCY = 4
+PLAN_TTL = IDLE_INTERVAL * 2 ** MAX_BACKOFF + 3600  # outlives the longest backoff wait
+
+def event_start(event: Dict) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(event['commence_time'].replace('Z', '+00:00')).timestamp()
+    except (KeyError, ValueError, AttributeError):
+        return None
+
+def event_interval(event: Dict, now: float) -> Optional[float]:
+    # None: the game is over, stop spending on it
+    start = event_start(event)
+    if start is None:
+        return IDLE_INTERVAL
+    if start + LIVE_WINDOW < now:
+        return None
+    until = max(0.0, start - now)
+    for horizon, interval in CADENCE:
+        if until <= horizon:
+            return interval
+    return IDLE_INTERVAL
+
+def poll_interval(odds_data: Optional[List[Dict]], now: Optional[float] = None) -> float:
+    now = now or time.time()
+    intervals = [i for i in (event_interval(e, now) for e in odds_data or []) if i is not None]
+    return min(intervals) if intervals else IDLE_INTERVAL
+
+def _month_key(now: float) -> str:
+    return datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m")
+
+def _seconds_left_in_month(now: float) -> float:
+    d = datetime.fromtimestamp(now, timezone.utc)
+    last_day = calendar.monthrange(d.year, d.month)[1]
+    end = datetime(d.year, d.month, last_day, 23, 59, 59, tzinfo=timezone.utc).timestamp()
+    return max(3600.0, end - now)
+
+class CreditLedger:
+    # Per-sport/per-market spend for the current month, plus the last
+    # x-requests-remaining/used seen. Redis hash pp:odds:ledger:<YYYY-MM>, memory if no Redis.
+    def __init__(self, redis_client):
+        self.r = redis_client
+        self.month = _month_key(time.time())
+        self.spent: Dict[str, float] = {}
+        self.remaining: Optional[float] = None
+        self.used: Optional[float] = None
+        self._loaded = False
+
+    @property
+    def key(self) -> str:
+        return f"pp:odds:ledger:{self.month}"
+
+    async def load(self):
+        month = _month_key(time.time())
+        if self._loaded and month == self.month:
+            return
+        if month != self.month:
+            self.month, self.spent, self.remaining, self.used = month, {}, None, None
+        self._loaded = True
+        if self.r is None:
+            return
+        try:
+            raw = await asyncio.to_thread(self.r.hgetall, self.key)
+        except Exception as e:
+            print(f"WARN: Odds ledger load failed: {e!r}")
+            return
+        for field, value in raw.items():
+            field = field.decode()
+            if field == "_remaining":
+                self.remaining = float(value)
+            elif field == "_used":
+                self.used = float(value)
+            else:
+                self.spent[field] = float(value)
+
+    async def record(self, sport_key: str, markets: List[str], cost: float, remaining: Optional[float], used: Optional[float]):
+        share = cost / max(1, len(markets))
+        fields = {f"{sport_key}:{m}": share for m in markets}
+        for field, amount in fields.items():
+            self.spent[field] = self.spent.get(field, 0.0) + amount
+        if remaining is not None:
+            self.remaining = remaining
+        elif self.remaining is not None:
+            self.remaining -= cost
+        if used is not None:
+            self.used = used
+        if self.r is None:
+            return
+        def write():
+            pipe = self.r.pipeline(transaction=False)
+            for field, amount in fields.items():
+                pipe.hincrbyfloat(self.key, field, amount)
+            if self.remaining is not None:
+                pipe.hset(self.key, "_remaining", self.remaining)
+            if self.used is not None:
+                pipe.hset(self.key, "_used", self.used)
+            pipe.expire(self.key, 40 * 86400)
+            pipe.execute()
+        try:
+            await asyncio.to_thread(write)
+        except Exception as e:
+            print(f"WARN: Odds ledger write failed: {e!r}")
+
+    def credits_left(self) -> float:
+        if self.remaining is not None:
+            return self.remaining
+        return ODDS_MONTHLY_CREDITS - sum(self.spent.values())
+
+class _MarketState:
+    __slots__ = ("fetched_at", "digest", "unchanged")
+
+    def __init__(self, fetched_at: float = 0.0, digest: Optional[str] = None, unchanged: int = 0):
+        self.fetched_at = fetched_at
+        self.digest = digest
+        self.unchanged = unchanged
+
+class OddsBudget:
+    # Planning state (token bucket, per-market backoff, demand, last merged payload) lives here and,
+    # with Redis, under pp:odds:plan:<sport> / pp:odds:bucket, so a cold start, serverless instance or
+    # new lease holder picks up where the last planner stopped instead of treating every market as due
+    def __init__(self, ledger: CreditLedger, markets: List[str] = ODDS_MARKETS, regions: str = ODDS_REGIONS):
+        self.ledger = ledger
+        self.r = ledger.r
+        self.markets = markets
+        self.regions = len([x for x in regions.split(",") if x])
+        self.tokens: Optional[float] = None
+        self._refilled_at: Optional[float] = None
+        self._demand: Dict[str, float] = {}  # per sport: EWMA of credits/sec we would spend if nothing were throttled
+        self._planned_at: Dict[str, float] = {}
+        self._state: Dict[str, Dict[Tuple[str, str], _MarketState]] = {}  # per sport: (event, market) -> state
+        self._last: Dict[str, List[Dict]] = {}  # per sport: last merged payload, the base for markets not due
+
+    def rate(self, now: float) -> float:
+        # Credits per second we can spend and still reach the end of the month
+        spendable = max(0.0, self.ledger.credits_left() - ODDS_CREDIT_RESERVE)
+        return spendable / _seconds_left_in_month(now)
+
+    def _refill(self, now: float):
+        rate = self.rate(now)
+        capacity = max(rate * BURST_WINDOW, len(self.markets) * self.regions)
+        if self.ledger.credits_left() <= ODDS_CREDIT_RESERVE:
+            capacity = 0.0
+        if self.tokens is None or self._refilled_at is None:
+            self.tokens = capacity
+        else:
+            self.tokens = min(capacity, self.tokens + rate * max(0.0, now - self._refilled_at))
+        self._refilled_at = now
+
+    def interval_multiplier(self) -> float:
+        # >1 when demand outruns the paced budget; the scheduler stretches its poll interval by this
+        now = time.time()
+        if self.ledger.credits_left() <= ODDS_CREDIT_RESERVE:
+            return MAX_SLOWDOWN
+        rate = self.rate(now)
+        if rate <= 0:
+            return MAX_SLOWDOWN
+        return min(MAX_SLOWDOWN, max(1.0, sum(self._demand.values()) / rate))
+
+    def plan(self, sport_key: str, events: List[Dict], now: float) -> List[Tuple[Dict, List[str]]]:
+        # Due (event, markets), soonest tip-off first, trimmed to the credits in the bucket
+        self._refill(now)
+        state = self._state.setdefault(sport_key, {})
+        due = []
+        for event in events:
+            interval = event_interval(event, now)
+            if interval is None:
+                continue
+            markets = []
+            for m in self.markets:
+                st = state.get((event['id'], m))
+                wait = interval * (2 ** min(st.unchanged, MAX_BACKOFF)) if st else 0
+                if st is None or now - st.fetched_at >= wait:
+                    markets.append(m)
+            if markets:
+                due.append((event_start(event) or now, event, markets, interval))
+        due.sort(key=lambda d: d[0])
+        self._observe_demand(sport_key, due, now)
+        plan = []
+        for _, event, markets, _ in due:
+            cost = len(markets) * self.regions
+            if cost > self.tokens:
+                continue
+            self.tokens -= cost
+            plan.append((event, markets))
+        if len(plan) < len(due):
+            print(f"WARN: Odds budget: fetching {len(plan)}/{len(due)} due events for {sport_key} ({self.ledger.credits_left():.0f} credits left)")
+        return plan
+
+    def _observe_demand(self, sport_key: str, due: List[Tuple], now: float):
+        last = self._planned_at.get(sport_key)
+        self._planned_at[sport_key] = now
+        if last is None or sport_key not in self._demand:
+            # First plan for the sport: everything is due, so its rate is each event's cost over its own cadence
+            self._demand[sport_key] = sum(len(m) * self.regions / interval for _, _, m, interval in due)
+            return
+        demanded = sum(len(m) * self.regions for _, _, m, _ in due)
+        self._demand[sport_key] = 0.8 * self._demand[sport_key] + 0.2 * (demanded / max(1.0, now - last))
+
+    def _observe(self, sport_key: str, event_id: str, fetched: Dict, markets: List[str], now: float):
+        state = self._state.setdefault(sport_key, {})
+        for m in markets:
+            parts = [(b.get('key'), mk.get('outcomes')) for b in fetched.get('bookmakers', []) for mk in b.get('markets', []) if mk.get('key') == m]
+            digest = hashlib.blake2b(orjson.dumps(parts), digest_size=12).hexdigest()  # stable across processes
+            st = state.setdefault((event_id, m), _MarketState())
+            st.unchanged = st.unchanged + 1 if digest == st.digest else 0
+            st.digest, st.fetched_at = digest, now
+
+    async def _restore(self, sport_key: str):
+        # Shared planning state from whoever planned last; local state stays as-is without Redis or on errors
+        if self.r is None:
+            return
+        def read():
+            pipe = self.r.pipeline(transaction=False)
+            pipe.get(f"pp:odds:plan:{sport_key}")
+            pipe.hgetall("pp:odds:bucket")
+            return pipe.execute()
+        try:
+            blob, bucket = await asyncio.to_thread(read)
+        except Exception as e:
+            print(f"WARN: Odds plan state load failed: {e!r}")
+            return
+        # Only state newer than ours: another sport of this process may have spent since it was saved
+        if blob:
+            saved = decode(blob)[0]
+            if saved["planned_at"] > self._planned_at.get(sport_key, 0.0):
+                self._last[sport_key] = saved["payload"]
+                self._state[sport_key] = {(e, m): _MarketState(t, d, u) for e, m, t, d, u in saved["markets"]}
+                self._demand[sport_key], self._planned_at[sport_key] = saved["demand"], saved["planned_at"]
+        if bucket and float(bucket[b"refilled_at"]) > (self._refilled_at or 0.0):
+            self.tokens, self._refilled_at = float(bucket[b"tokens"]), float(bucket[b"refilled_at"])
+
+    async def _persist(self, sport_key: str):
+        if self.r is None:
+            return
+        saved = {
+            "payload": self._last.get(sport_key, []),
+            "markets": [[e, m, st.fetched_at, st.digest, st.unchanged] for (e, m), st in self._state.get(sport_key, {}).items()],
+            "demand": self._demand.get(sport_key), "planned_at": self._planned_at.get(sport_key),
+        }
+        def write():
+            pipe = self.r.pipeline(transaction=False)
+            pipe.set(f"pp:odds:plan:{sport_key}", encode(saved, time.time(), 0, 0), ex=PLAN_TTL)
+            pipe.hset("pp:odds:bucket", mapping={"tokens": self.tokens or 0.0, "refilled_at": self._refilled_at or time.time()})
+            pipe.expire("pp:odds:bucket", PLAN_TTL)
+            pipe.execute()
+        try:
+            await asyncio.to_thread(write)
+        except Exception as e:
+            print(f"WARN: Odds plan state save failed: {e!r}")
+
+    async def fetch_sport(self, sport_key: str) -> List[Dict]:
+        await self.ledger.load()
+        await self._restore(sport_key)
+        events = await upstream.fetch_events(sport_key)
+        now = time.time()
+        events = [e for e in events if event_interval(e, now) is not None]
+        plan = self.plan(sport_key, events, now)
+        markets_for = {e['id']: m for e, m in plan}
+        results, _ = await upstream.fan_out(
+            list(markets_for), lambda eid: upstream.fetch_event_odds(sport_key, eid, markets_for[eid]),
+            default=lambda eid: None, limit=EVENT_CONCURRENCY, call_timeout=ODDS_TIMEOUT, budget=ODDS_TIMEOUT * 2, api="odds",
+        )
+        prev_by_id = {e.get('id'): e for e in self._last.get(sport_key) or []}
+        merged = []
+        for event in events:
+            base = prev_by_id.get(event['id']) or {**event, "bookmakers": []}
+            result = results.get(event['id'])
+            if result is None:
+                merged.append(base)
+                continue
+            fetched, headers = result
+            markets = markets_for[event['id']]
+            cost = _num(headers.get('x-requests-last'))
+            await self.ledger.record(sport_key, markets, cost if cost is not None else len(markets) * self.regions,
+                                     _num(headers.get('x-requests-remaining')), _num(headers.get('x-requests-used')))
+            self._observe(sport_key, event['id'], fetched, markets, now)
+            merged.append(merge_event(base, fetched, markets))
+        # Forget state for events that dropped off the board
+        live = {e['id'] for e in events}
+        state = self._state.get(sport_key, {})
+        for key in [k for k in state if k[0] not in live]:
+            del state[key]
+        self._last[sport_key] = merged
+        await self._persist(sport_key)
+        return merged
+
+def _num(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def merge_event(base: Dict, fetched: Dict, markets: List[str]) -> Dict:
+    # Fetched markets replace the same markets on every book; other markets keep their last prices
+    refreshed = set(markets)
+    books: Dict[str, Dict] = {}
+    for b in base.get('bookmakers', []):
+        kept = [m for m in b.get('markets', []) if m.get('key') not in refreshed]
+        books[b['key']] = {**b, 'markets': kept}
+    for b in fetched.get('bookmakers', []):
+        entry = books.setdefault(b['key'], {**b, 'markets': []})
+        entry['title'] = b.get('title', entry.get('title'))
+        entry['markets'] = entry['markets'] + [m for m in b.get('markets', []) if m.get('key') in refreshed]
+    event = {k: v for k, v in fetched.items() if k != 'bookmakers'} or {k: v for k, v in base.items() if k != 'bookmakers'}
+    event['bookmakers'] = [b for b in books.values() if b['markets']]
+    return event
+
+ledger = CreditLedger(r)
+odds_budget = OddsBudget(ledger)
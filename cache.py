@@ -0,0 +1,206 @@
+import asyncio
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+import orjson
+import redis
+import metrics
+from settings import REDIS_URL, CACHE_MAX_ITEMS
+
+# Two-tier cache: bounded in-process LRU (L1) in front of a pooled Redis (L2).
+# Entries carry their write time so a value past its TTL can still be served
+# for `stale_ttl` seconds while one background refresh replaces it.
+
+def connect_redis() -> Optional[redis.Redis]:
+    try:
+        client = redis.from_url(REDIS_URL, max_connections=32, socket_timeout=2, socket_connect_timeout=2, health_check_interval=30)
+        client.ping()
+        print("DEBUG: Redis OK")
+        return client
+    except Exception as e:
+        print(f"WARN: Redis fallback (memory-only cache): {e}")
+        return None
+
+_HEADER = struct.Struct("<dddB")  # stored_at, ttl, stale_ttl, flags
+_COMPRESSED = 1
+COMPRESS_MIN = 512
+
+def encode(value: Any, stored_at: float, ttl: float, stale_ttl: float) -> bytes:
+    body = orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+    flags = 0
+    if len(body) >= COMPRESS_MIN:
+        body = zlib.compress(body, 1)
+        flags |= _COMPRESSED
+    return _HEADER.pack(stored_at, ttl, stale_ttl, flags) + body
+
+def decode(blob: bytes) -> Tuple[Any, float, float, float]:
+    stored_at, ttl, stale_ttl, flags = _HEADER.unpack_from(blob)
+    body = blob[_HEADER.size:]
+    if flags & _COMPRESSED:
+        body = zlib.decompress(body)
+    return orjson.loads(body), stored_at, ttl, stale_ttl
+
+class _Entry:
+    __slots__ = ("value", "stored_at", "ttl", "stale_ttl")
+
+    def __init__(self, value, stored_at, ttl, stale_ttl):
+        self.value, self.stored_at, self.ttl, self.stale_ttl = value, stored_at, ttl, stale_ttl
+
+    def age(self, now: float) -> float:
+        return now - self.stored_at
+
+    def fresh(self, now: float) -> bool:
+        return self.age(now) < self.ttl
+
+    def usable(self, now: float) -> bool:
+        return self.age(now) < self.ttl + self.stale_ttl
+
+class TwoTierCache:
+    def __init__(self, redis_client: Optional[redis.Redis], max_items: int = CACHE_MAX_ITEMS, prefix: str = "pp:"):
+        self.r = redis_client
+        self.max_items = max_items
+        self.prefix = prefix
+        self._lru: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"l1_hit": 0, "l2_hit": 0, "stale": 0, "miss": 0, "load": 0, "coalesced": 0}
+
+    # -- L1 --
+    def _l1_get(self, key: str, now: float) -> Optional[_Entry]:
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        if not entry.usable(now):
+            del self._lru[key]
+            return None
+        self._lru.move_to_end(key)
+        return entry
+
+    def _l1_put(self, key: str, entry: _Entry):
+        self._lru[key] = entry
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    # -- L2 (sync redis-py on a worker thread so a slow Redis never blocks the loop) --
+    async def _l2_get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if self.r is None or not keys:
+            return [None] * len(keys)
+        try:
+            with metrics.span("redis"):
+                return await asyncio.to_thread(self.r.mget, [self.prefix + k for k in keys])
+        except Exception as e:
+            print(f"WARN: Redis get failed, memory-only: {e!r}")
+            return [None] * len(keys)
+
+    async def _l2_set_many(self, items: Dict[str, _Entry]):
+        if self.r is None or not items:
+            return
+        def write():
+            pipe = self.r.pipeline(transaction=False)
+            for key, e in items.items():
+                pipe.setex(self.prefix + key, max(1, int(e.ttl + e.stale_ttl)), encode(e.value, e.stored_at, e.ttl, e.stale_ttl))
+            pipe.execute()
+        try:
+            with metrics.span("redis"):
+                await asyncio.to_thread(write)
+        except Exception as e:
+            print(f"WARN: Redis set failed, memory-only: {e!r}")
+
+    # -- public API --
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        # Fresh-or-stale values only; misses are simply absent from the result
+        now = time.time()
+        found, remote = {}, []
+        for key in keys:
+            entry = self._l1_get(key, now)
+            if entry is not None:
+                self.stats["l1_hit"] += 1
+                found[key] = entry.value
+            else:
+                remote.append(key)
+        for key, blob in zip(remote, await self._l2_get_many(remote)):
+            entry = self._decode(blob)
+            if entry is not None and entry.usable(now):
+                self.stats["l2_hit"] += 1
+                self._l1_put(key, entry)
+                found[key] = entry.value
+            else:
+                self.stats["miss"] += 1
+        return found
+
+    async def set_many(self, items: Dict[str, Any], ttl: float, stale_ttl: float = 0):
+        now = time.time()
+        entries = {k: _Entry(v, now, ttl, stale_ttl) for k, v in items.items()}
+        for key, entry in entries.items():
+            self._l1_put(key, entry)
+        await self._l2_set_many(entries)
+
+    async def set(self, key: str, value: Any, ttl: float, stale_ttl: float = 0):
+        await self.set_many({key: value}, ttl, stale_ttl)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Union[float, Callable[[Any], float]],
+        stale_ttl: float = 0,
+    ) -> Any:
+        # Fresh hit -> value. Stale hit -> value now, one background refresh.
+        # Miss -> one loader per key in this process; concurrent callers await it.
+        now = time.time()
+        entry = self._l1_get(key, now)
+        if entry is not None:
+            self.stats["l1_hit"] += 1
+        else:
+            entry = self._decode((await self._l2_get_many([key]))[0])
+            if entry is not None and entry.usable(now):
+                self.stats["l2_hit"] += 1
+                self._l1_put(key, entry)
+            else:
+                entry = None
+        if entry is not None:
+            if not entry.fresh(now):
+                self.stats["stale"] += 1
+                self._load(key, loader, ttl, stale_ttl)
+            return entry.value
+        self.stats["miss"] += 1
+        return await asyncio.shield(self._load(key, loader, ttl, stale_ttl))
+
+    def _load(self, key, loader, ttl, stale_ttl) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            self.stats["coalesced"] += 1
+            return task
+        task = asyncio.create_task(self._run_loader(key, loader, ttl, stale_ttl))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            print(f"ERROR: Cache load {key}: {task.exception()!r}")
+
+    async def _run_loader(self, key, loader, ttl, stale_ttl):
+        self.stats["load"] += 1
+        value = await loader()
+        if value is not None:  # None means "upstream failed", never cache it
+            await self.set(key, value, ttl(value) if callable(ttl) else ttl, stale_ttl)
+        return value
+
+    @staticmethod
+    def _decode(blob: Optional[bytes]) -> Optional[_Entry]:
+        if not blob:
+            return None
+        try:
+            value, stored_at, ttl, stale_ttl = decode(blob)
+            return _Entry(value, stored_at, ttl, stale_ttl)
+        except Exception as e:
+            print(f"WARN: Dropping undecodable cache entry: {e!r}")
+            return None
+
+r = connect_redis()
+cache = TwoTierCache(r)
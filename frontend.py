@@ -30,9 +30,11 @@ import plotly.express as px
 import altair as alt
 import requests
 import os
+import time
 import pandas as pd
 from streamlit_confetti import confetti
 from dotenv import load_dotenv
+from stream_client import PropStream
 
 load_dotenv()
 st.set_page_config(page_title="PropPulse", layout="wide", initial_sidebar_state="expanded")
@@ -40,6 +42,10 @@ st.set_page_config(page_title="PropPulse", layout="wide", initial_sidebar_state=
 # Config
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:5000")
 
+@st.cache_resource
+def prop_stream(sport):
+    return PropStream(BACKEND_URL, sport)
+
 # Enhanced CSS: Ultra-modern (teal/orange, Inter font, shadows, transitions, responsive)
 st.markdown("""
 <style>
@@ -72,7 +78,7 @@ with st.sidebar:
     st.markdown('<h3 style="color:#7FDBFF;">Controls</h3>', unsafe_allow_html=True)
     sport = st.selectbox("Sport", ["nba", "ncaab"], index=0)
     if st.button('🔄 Refresh Props', key='refresh', help='Reload data'):
-        st.cache_data.clear()
+        prop_stream(sport).resync()
         st.rerun()
         confetti()  # Delight on refresh
     # Dark/Light Toggle
@@ -80,18 +86,18 @@ with st.sidebar:
     if not mode:
         st.markdown('<style>.main {background: linear-gradient(135deg, #F0F8FF 0%, #FFB6C1 100%); color: #001F3F;} .hero {background: radial-gradient(circle, #FFFFFF 0%, #FFB6C1 100%); color: #001F3F;}</style>', unsafe_allow_html=True)
 
-# Fetch props
-@st.cache_data(ttl=300)
+# Fetch props: one shared stream per sport, kept current by backend pushes
 def load_props(sport):
+    stream = prop_stream(sport)
     with st.spinner('Fetching live props...'):
-        try:
-            resp = requests.get(f"{BACKEND_URL}/{sport}/props", timeout=10)
-            resp.raise_for_status()
-            return resp.json()
-        except Exception as e:
-            st.error(f"Backend error: {e}")
-            st.markdown('<div class="toast" style="background:#FF4500;">⚠️ Connection issue—using demo data</div>', unsafe_allow_html=True)
-            return [{"player": "Demo Player", "prop": "points", "line": 25.5, "adjusted_prob": 55.0, "risk_score": 5.0, "tweets": [{"text": "Demo tweet - low risk", "score": 0.05}]} for _ in range(6)]
+        deadline = time.time() + 10
+        while not stream.version and not stream.error and time.time() < deadline:
+            time.sleep(0.1)
+    if stream.version:
+        return stream.props()
+    st.error(f"Backend error: {stream.error}")
+    st.markdown('<div class="toast" style="background:#FF4500;">⚠️ Connection issue—using demo data</div>', unsafe_allow_html=True)
+    return [{"player": "Demo Player", "prop": "points", "line": 25.5, "adjusted_prob": 55.0, "risk_score": 5.0, "tweets": [{"text": "Demo tweet - low risk", "score": 0.05}]} for _ in range(6)]
 
 props = load_props(sport)
 
@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import orjson
+from budget import event_start
+from settings import HISTORY_ENABLED, HISTORY_DIR, HISTORY_FLUSH_INTERVAL, HISTORY_FLUSH_ROWS
+
+# Append-only odds history on local disk. Rows are buffered in memory and flushed
+# off the event loop as immutable segments: one .npy per column (strings interned to
+# int32 codes per segment, like odds_table) under <dir>/<table>/<sport>/<YYYY-MM-DD>/.
+# Reads memory-map the segments, so a season can be range-queried without loading it.
+#   prices  every price move from the ingest diff (removed prices have NaN over/under)
+#   props   adjusted_prob / risk_score each time a published prop changes
+#   python history.py compact           # merge finished days into one segment each
+
+TABLES: Dict[str, Tuple[Dict[str, str], Tuple[str, ...]]] = {
+    "prices": ({"ts": "f8", "version": "i4", "commence": "f8", "line": "f4", "over": "f8", "under": "f8"},
+               ("event", "player", "market", "book")),
+    "props": ({"ts": "f8", "version": "i4", "line": "f4", "adjusted_prob": "f8", "risk_score": "f8"},
+              ("player", "market")),
+}
+MERGED = "all"  # compacted segment name; segments it lists in meta.json are superseded by it
+
+def _day(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
+
+def write_segment(path: str, table: str, rows: List[Tuple], extra: Optional[Dict] = None) -> None:
+    # rows are tuples in TABLES column order: numeric columns, then string columns
+    num, strs = TABLES[table]
+    tmp = os.path.join(os.path.dirname(path), "." + os.path.basename(path))
+    os.makedirs(tmp, exist_ok=True)
+    cols = list(zip(*rows))
+    for i, (name, dtype) in enumerate(num.items()):
+        np.save(os.path.join(tmp, name + ".npy"), np.asarray(cols[i], dtype=dtype))
+    strings = {}
+    for j, name in enumerate(strs):
+        codes: Dict[str, int] = {}
+        np.save(os.path.join(tmp, name + ".npy"),
+                np.fromiter((codes.setdefault(v, len(codes)) for v in cols[len(num) + j]), np.int32, len(rows)))
+        strings[name] = list(codes)
+    with open(os.path.join(tmp, "meta.json"), "wb") as f:
+        f.write(orjson.dumps({"rows": len(rows), "strings": strings, **(extra or {})}))
+    os.replace(tmp, path)
+
+class Segment:
+    __slots__ = ("path", "meta", "_cols")
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "rb") as f:
+            self.meta = orjson.loads(f.read())
+        self._cols: Dict[str, np.ndarray] = {}
+
+    def col(self, name: str) -> np.ndarray:
+        arr = self._cols.get(name)
+        if arr is None:
+            arr = self._cols[name] = np.load(os.path.join(self.path, name + ".npy"), mmap_mode="r")
+        return arr
+
+    def select(self, table: str, start: float, end: float, filters: Dict[str, str],
+               limit: Optional[int] = None) -> Tuple[Optional[Dict[str, np.ndarray]], int]:
+        # The first `limit` matching rows (all if None, no columns read if 0) and how many matched.
+        # ts is sorted within a segment, so the time window is two binary searches
+        ts = self.col("ts")
+        lo, hi = int(np.searchsorted(ts, start, "left")), int(np.searchsorted(ts, end, "right"))
+        if lo >= hi:
+            return None, 0
+        mask = None
+        for name, value in filters.items():
+            try:
+                code = self.meta["strings"][name].index(value)
+            except ValueError:
+                return None, 0
+            match = self.col(name)[lo:hi] == code
+            mask = match if mask is None else mask & match
+        matched = hi - lo if mask is None else int(np.count_nonzero(mask))
+        if not matched or limit == 0:
+            return None, matched
+        if mask is None:
+            rows = slice(lo, hi if limit is None else min(hi, lo + limit))
+        else:
+            rows = lo + np.flatnonzero(mask)[:limit]
+        num, strs = TABLES[table]
+        out = {name: np.asarray(self.col(name)[rows]) for name in num}
+        for name in strs:
+            out[name] = np.asarray(self.meta["strings"][name], dtype=object)[self.col(name)[rows]]
+        return out, matched
+
+class History:
+    def __init__(self, root: str = HISTORY_DIR, enabled: bool = HISTORY_ENABLED):
+        self.root = root
+        self.enabled = enabled
+        self._buffers: Dict[Tuple[str, str], List[Tuple]] = {}
+        self._flushed_at = time.monotonic()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._seq = 0
+
+    def record_prices(self, sport: str, delta, version: int, ts: float, odds_data: Optional[List[Dict]]):
+        # delta: odds_store.Delta from this ingest; the first ingest after a restart logs every price as new
+        if not self.enabled or not delta:
+            return
+        nan = float("nan")
+        commence = {e.get('id'): event_start(e) or nan for e in odds_data or []}
+        rows = self._buffers.setdefault(("prices", sport), [])
+        for (event, player, market, book), (old, new) in delta.items():
+            rec = new or old
+            over, under = (new.over, new.under) if new else (nan, nan)
+            rows.append((ts, version, commence.get(event, nan), rec.line,
+                         nan if over is None else over, nan if under is None else under, event, player, market, book))
+        self._maybe_flush()
+
+    def record_props(self, sport: str, props: Iterable[Dict], version: int, ts: float):
+        if not self.enabled:
+            return
+        rows = self._buffers.setdefault(("props", sport), [])
+        rows.extend((ts, version, p["line"], p["adjusted_prob"], p["risk_score"], p["player"], p["prop"]) for p in props)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        pending = sum(len(rows) for rows in self._buffers.values())
+        due = pending >= HISTORY_FLUSH_ROWS or (pending and time.monotonic() - self._flushed_at >= HISTORY_FLUSH_INTERVAL)
+        if due and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        buffers, self._buffers = self._buffers, {}
+        self._flushed_at = time.monotonic()
+        if buffers:
+            try:
+                await asyncio.to_thread(self._write, buffers)
+            except Exception as e:
+                print(f"WARN: History flush failed, {sum(map(len, buffers.values()))} rows dropped: {e!r}")
+
+    def _write(self, buffers: Dict[Tuple[str, str], List[Tuple]]):
+        for (table, sport), rows in buffers.items():
+            by_day: Dict[str, List[Tuple]] = {}
+            for row in rows:
+                by_day.setdefault(_day(row[0]), []).append(row)
+            for day, day_rows in by_day.items():
+                self._seq += 1
+                name = f"{int(day_rows[0][0] * 1000):013d}-{os.getpid()}-{self._seq}"
+                write_segment(os.path.join(self.root, table, sport, day, name), table, day_rows)
+
+    def _days(self, table: str, sport: str, start: float, end: float) -> List[str]:
+        base = os.path.join(self.root, table, sport)
+        try:
+            days = sorted(os.listdir(base))
+        except FileNotFoundError:
+            return []
+        first, last = _day(start), _day(end)
+        return [os.path.join(base, d) for d in days if first <= d <= last]
+
+    @staticmethod
+    def _segments(day_dir: str) -> List[str]:
+        names = sorted(n for n in os.listdir(day_dir) if not n.startswith("."))
+        if MERGED in names:
+            with open(os.path.join(day_dir, MERGED, "meta.json"), "rb") as f:
+                merged = set(orjson.loads(f.read()).get("merged", []))
+            names = [MERGED] + [n for n in names if n != MERGED and n not in merged]
+        return [os.path.join(day_dir, n) for n in names]
+
+    def query(self, sport: str, table: str = "prices", start: Optional[float] = None, end: Optional[float] = None,
+              limit: Optional[int] = None, **filters: Optional[str]) -> Dict[str, np.ndarray]:
+        # Columns for rows in [start, end] matching every given string filter (player=, market=, book=, event=),
+        # the first `limit` of them if given
+        return self.query_page(sport, table, start, end, limit, **filters)[0]
+
+    def query_page(self, sport: str, table: str = "prices", start: Optional[float] = None, end: Optional[float] = None,
+                   limit: Optional[int] = None, **filters: Optional[str]) -> Tuple[Dict[str, np.ndarray], int]:
+        # query() plus how many rows matched in all. Once `limit` rows are in hand the remaining
+        # segments are only counted, so a wide window doesn't materialize the whole range
+        if table not in TABLES:
+            raise ValueError(f"Unknown history table: {table}")
+        end = time.time() if end is None else end
+        start = end - 86400 if start is None else start
+        filters = {k: v for k, v in filters.items() if v is not None}
+        unknown = set(filters) - set(TABLES[table][1])
+        if unknown:
+            raise ValueError(f"Can't filter {table} on {', '.join(sorted(unknown))}")
+        parts, total = [], 0
+        for day_dir in self._days(table, sport, start, end):
+            left = None if limit is None else limit - sum(len(p["ts"]) for p in parts)
+            for attempt in range(2):
+                try:
+                    found, matched = self._select_day(day_dir, table, start, end, filters, left)
+                    break
+                except FileNotFoundError:
+                    found, matched = [], 0  # compacted underneath us; list the day again
+            parts.extend(found)
+            total += matched
+        num, strs = TABLES[table]
+        if not parts:
+            return {**{n: np.empty(0, d) for n, d in num.items()}, **{n: np.empty(0, object) for n in strs}}, total
+        return {name: np.concatenate([p[name] for p in parts]) for name in (*num, *strs)}, total
+
+    def _select_day(self, day_dir: str, table: str, start: float, end: float, filters: Dict[str, str],
+                    left: Optional[int]) -> Tuple[List[Dict[str, np.ndarray]], int]:
+        parts, matched = [], 0
+        for path in self._segments(day_dir):
+            cols, n = Segment(path).select(table, start, end, filters, left)
+            matched += n
+            if cols is not None:
+                parts.append(cols)
+                if left is not None:
+                    left -= len(cols["ts"])
+        return parts, matched
+
+    def closing(self, sport: str, start: Optional[float] = None, end: Optional[float] = None,
+                **filters: Optional[str]) -> Dict[str, np.ndarray]:
+        # Closing (last before tip-off) price per (event, player, market, book), plus the first price seen
+        # in the same window as first_*. That is the true opener only if the window reaches back to it.
+        cols = self.query(sport, "prices", start, end, **filters)
+        keep = np.flatnonzero(~(cols["ts"] > cols["commence"]))  # NaN commence counts as pre-game
+        first: Dict[Tuple, int] = {}
+        last: Dict[Tuple, int] = {}
+        for i, key in zip(keep, zip(cols["event"][keep], cols["player"][keep], cols["market"][keep], cols["book"][keep])):
+            first.setdefault(key, i)
+            last[key] = i
+        close = np.fromiter(last.values(), np.int64, len(last))
+        first_ = np.fromiter((first[k] for k in last), np.int64, len(last))
+        out = {name: col[close] for name, col in cols.items()}
+        for name in ("ts", "line", "over", "under"):
+            out["first_" + name] = cols[name][first_]
+        return out
+
+    def compact(self, before: Optional[str] = None) -> int:
+        # Merge each finished day's segments (and any earlier merge) into one; returns days compacted
+        before = before or _day(time.time())
+        done = 0
+        for table in TABLES:
+            base = os.path.join(self.root, table)
+            for sport in sorted(os.listdir(base)) if os.path.isdir(base) else []:
+                for day in sorted(os.listdir(os.path.join(base, sport))):
+                    day_dir = os.path.join(base, sport, day)
+                    if day < before and self._compact_day(table, day_dir):
+                        done += 1
+        return done
+
+    def _compact_day(self, table: str, day_dir: str) -> bool:
+        paths = self._segments(day_dir)
+        if len(paths) < 2:
+            return False
+        num, strs = TABLES[table]
+        cols = {}
+        segs = [Segment(p) for p in paths]
+        for name in num:
+            cols[name] = np.concatenate([s.col(name) for s in segs])
+        for name in strs:
+            cols[name] = np.concatenate([np.asarray(s.meta["strings"][name], dtype=object)[s.col(name)] for s in segs])
+        order = np.argsort(cols["ts"], kind="stable")
+        rows = list(zip(*(cols[n][order].tolist() for n in (*num, *strs))))
+        merged = sorted({os.path.basename(p) for p in paths if os.path.basename(p) != MERGED} |
+                        set(segs[0].meta.get("merged", []) if os.path.basename(paths[0]) == MERGED else []))
+        tmp = os.path.join(day_dir, f".{MERGED}-{os.getpid()}")
+        write_segment(tmp, table, rows, {"merged": merged})
+        # Swap in the new merge, then drop what it supersedes
+        old = os.path.join(day_dir, "." + MERGED + "-old")
+        if os.path.isdir(os.path.join(day_dir, MERGED)):
+            os.replace(os.path.join(day_dir, MERGED), old)
+        os.replace(tmp, os.path.join(day_dir, MERGED))
+        shutil.rmtree(old, ignore_errors=True)
+        for name in merged:
+            shutil.rmtree(os.path.join(day_dir, name), ignore_errors=True)
+        return True
+
+def to_rows(cols: Dict[str, np.ndarray], limit: int) -> List[Dict]:
+    names = list(cols)
+    n = min(limit, len(cols[names[0]])) if names else 0
+    values = [cols[name][:n].tolist() for name in names]
+    return [{name: (None if isinstance(v, float) and v != v else v) for name, v in zip(names, row)} for row in zip(*values)]
+
+history = History()
+
+def main():
+    ap = argparse.ArgumentParser(description="PropPulse odds history")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("compact", help="merge each finished day into one segment")
+    c.add_argument("--before", help="YYYY-MM-DD, default today (UTC)")
+    args = ap.parse_args()
+    if args.cmd == "compact":
+        print(f"compacted {history.compact(args.before)} day partitions under {history.root}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import orjson
+from settings import (
+    SENTIMENT_WORKER, SENTIMENT_WORKER_BACKEND, SENTIMENT_MAX_BATCH, SENTIMENT_MAX_WAIT_MS,
+    SENTIMENT_TIMEOUT, SENTIMENT_SCORE_LRU,
+)
+
+# Shared sentiment worker. One process holds the model; API processes/ingest
+# workers send texts over a local socket (SENTIMENT_BACKEND=remote). Texts from
+# concurrent requests queue up and run as one padded batch once max_batch texts
+# are waiting or the oldest has waited max_wait_ms. Scored texts stay in an LRU.
+#   python inference.py serve                      # SENTIMENT_WORKER_BACKEND model on SENTIMENT_WORKER
+#   python inference.py serve --listen 127.0.0.1:8601 --max-batch 64
+
+_HEADER = struct.Struct(">I")
+
+async def read_frame(reader: asyncio.StreamReader) -> Dict:
+    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return orjson.loads(await reader.readexactly(size))
+
+def frame(msg: Dict) -> bytes:
+    body = orjson.dumps(msg)
+    return _HEADER.pack(len(body)) + body
+
+def parse_address(address: str) -> Tuple[str, object]:
+    if address.startswith("unix:"):
+        return "unix", address[5:]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+def _text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode(), digest_size=12).digest()
+
+class MicroBatcher:
+    def __init__(self, backend, max_batch: int = SENTIMENT_MAX_BATCH, max_wait_ms: float = SENTIMENT_MAX_WAIT_MS, lru_size: int = SENTIMENT_SCORE_LRU):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.lru_size = lru_size
+        self._lru: "OrderedDict[bytes, float]" = OrderedDict()
+        self._pending: Dict[bytes, asyncio.Future] = {}  # queued or running; identical texts share one slot
+        self._queue: "asyncio.Queue[Tuple[bytes, str]]" = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="inference")  # one model, one batch at a time
+        self.stats = {"texts": 0, "cached": 0, "batches": 0, "batched": 0, "busy_s": 0.0}
+
+    async def score(self, texts: List[str]) -> List[float]:
+        loop = asyncio.get_running_loop()
+        futs = []
+        for text in texts:
+            key = _text_key(text)
+            self.stats["texts"] += 1
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.stats["cached"] += 1
+                futs.append(self._lru[key])
+                continue
+            fut = self._pending.get(key)
+            if fut is None:
+                fut = self._pending[key] = loop.create_future()
+                self._queue.put_nowait((key, text))
+            futs.append(fut)
+        # Shielded: futures are shared across connections, and a client that hangs up only cancels its own wait
+        return [f if isinstance(f, float) else await asyncio.shield(f) for f in futs]
+
+    async def _next_batch(self) -> List[Tuple[bytes, str]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), left))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            t0 = time.perf_counter()
+            try:
+                probs = await loop.run_in_executor(self._executor, self.backend.score, [text for _, text in batch])
+            except Exception as e:
+                print(f"ERROR: Inference batch of {len(batch)} failed: {e!r}")
+                for key, _ in batch:
+                    fut = self._pending.pop(key)
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.stats["busy_s"] += time.perf_counter() - t0
+            self.stats["batches"] += 1
+            self.stats["batched"] += len(batch)
+            for (key, _), p in zip(batch, probs):
+                p = float(p)
+                self._lru[key] = p
+                fut = self._pending.pop(key)
+                if not fut.done():
+                    fut.set_result(p)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+async def serve(batcher: MicroBatcher, address: str = SENTIMENT_WORKER, ready: Optional[threading.Event] = None):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        lock = asyncio.Lock()
+        async def answer(msg: Dict):
+            try:
+                if msg.get("ping"):
+                    reply = {"id": msg["id"], "backend": batcher.backend.name, "stats": batcher.stats}
+                else:
+                    reply = {"id": msg["id"], "scores": await batcher.score(msg["texts"])}
+            except Exception as e:
+                reply = {"id": msg["id"], "error": repr(e)}
+            async with lock:
+                writer.write(frame(reply))
+                await writer.drain()
+        tasks = set()
+        try:
+            while True:
+                # Requests on one connection are answered as they finish, so they batch with everyone else's
+                task = asyncio.create_task(answer(await read_frame(reader)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    kind, where = parse_address(address)
+    if kind == "unix":
+        if os.path.exists(where):
+            os.unlink(where)
+        server = await asyncio.start_unix_server(handle, path=where)
+    else:
+        server = await asyncio.start_server(handle, *where)
+    runner = asyncio.create_task(batcher.run())
+    print(f"DEBUG: Inference worker ({batcher.backend.name}) on {address}, max_batch={batcher.max_batch} max_wait={batcher.max_wait * 1000:.0f}ms")
+    if ready is not None:
+        ready.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        runner.cancel()
+
+class _Connection:
+    # One multiplexed connection per event loop; replies are matched to requests by id
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader, self.writer = reader, writer
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.next_id = 0
+        self.closed = False
+        self._task = asyncio.create_task(self._read())
+
+    async def _read(self):
+        try:
+            while True:
+                msg = await read_frame(self.reader)
+                fut = self.pending.pop(msg["id"], None)
+                if fut is not None and not fut.done():
+                    fut.set_result(msg)
+        except Exception as e:
+            self.closed = True
+            for fut in self.pending.values():
+                if not fut.done():
+                    fut.set_exception(ConnectionError(f"inference worker went away: {e!r}"))
+            self.pending.clear()
+
+    async def request(self, msg: Dict) -> Dict:
+        self.next_id += 1
+        msg["id"] = self.next_id
+        fut = self.pending[self.next_id] = asyncio.get_running_loop().create_future()
+        self.writer.write(frame(msg))
+        await self.writer.drain()
+        try:
+            return await asyncio.wait_for(fut, SENTIMENT_TIMEOUT)
+        finally:
+            self.pending.pop(msg["id"], None)
+
+class WorkerClient:
+    def __init__(self, address: str = SENTIMENT_WORKER):
+        self.address = address
+        self._conns: Dict[asyncio.AbstractEventLoop, _Connection] = {}
+
+    async def _conn(self) -> _Connection:
+        loop = asyncio.get_running_loop()
+        conn = self._conns.get(loop)
+        if conn is None or conn.closed:
+            kind, where = parse_address(self.address)
+            if kind == "unix":
+                reader, writer = await asyncio.open_unix_connection(where)
+            else:
+                reader, writer = await asyncio.open_connection(*where)
+            conn = self._conns[loop] = _Connection(reader, writer)
+        return conn
+
+    async def score(self, texts: List[str]) -> List[float]:
+        reply = await (await self._conn()).request({"texts": texts})
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply["scores"]
+
+    def _blocking(self, msg: Dict) -> Dict:
+        kind, where = parse_address(self.address)
+        sock = socket.socket(socket.AF_UNIX if kind == "unix" else socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(SENTIMENT_TIMEOUT)
+        with sock:
+            sock.connect(where)
+            sock.sendall(frame({**msg, "id": 0}))
+            buf = b""
+            while len(buf) < _HEADER.size or len(buf) < _HEADER.size + _HEADER.unpack(buf[:_HEADER.size])[0]:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    raise ConnectionError("inference worker closed the connection")
+                buf += chunk
+        return orjson.loads(buf[_HEADER.size:])
+
+    def ping(self) -> Dict:
+        return self._blocking({"ping": True})
+
+    def score_blocking(self, texts: List[str]) -> List[float]:
+        reply = self._blocking({"texts": texts})
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply["scores"]
+
+def main():
+    ap = argparse.ArgumentParser(description="PropPulse shared sentiment worker")
+    ap.add_argument("command", choices=["serve"])
+    ap.add_argument("--listen", default=SENTIMENT_WORKER)
+    ap.add_argument("--backend", default=SENTIMENT_WORKER_BACKEND)
+    ap.add_argument("--max-batch", type=int, default=SENTIMENT_MAX_BATCH)
+    ap.add_argument("--max-wait-ms", type=float, default=SENTIMENT_MAX_WAIT_MS)
+    args = ap.parse_args()
+    if args.backend == "remote":
+        ap.error("the worker needs a local backend (hf, onnx or lexicon)")
+    import sentiment
+    backend = sentiment.get_backend(args.backend)
+    backend.load()  # before listening, so clients never see a half-loaded worker
+    asyncio.run(serve(MicroBatcher(backend, args.max_batch, args.max_wait_ms), args.listen))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+from cache import r, encode, decode
+from props_pipeline import SPORTS, fetch_odds
+from budget import poll_interval, odds_budget
+from odds_store import get_store
+from stream import broadcaster, snapshot_delta, resync_marker
+from history import history
+from alerts import dispatcher, evaluate
+import metrics
+import sentiment
+from settings import INGEST_SPORTS, SNAPSHOT_CHECK_INTERVAL, PROPS_TTL, TWEETS_TTL
+import upstream
+
+# Background ingestion: poll each sport, build the Prop list once, publish a
+# versioned snapshot (memory + Redis). Routes only read the latest snapshot.
+#   python ingest.py            # run the scheduler loop (standalone worker)
+#   python ingest.py --once     # one pass for cron/serverless
+
+PARTIAL_INTERVAL = 15
+RETRY_INTERVAL = 30
+SNAPSHOT_RETENTION = 24 * 3600
+ARBS_TOP_K = 50
+
+class SnapshotStore:
+    def __init__(self, redis_client):
+        self.r = redis_client
+        self._local: Dict[str, Dict] = {}
+        self._checked: Dict[str, float] = {}
+
+    @staticmethod
+    def _key(sport: str) -> str:
+        return f"pp:snapshot:{sport}"
+
+    async def publish(self, sport: str, payload: Dict, next_poll: float) -> Dict:
+        version = (self._local.get(sport) or {}).get("version", 0) + 1
+        if self.r is not None:
+            try:
+                version = await asyncio.to_thread(self.r.incr, self._key(sport) + ":version")
+            except Exception as e:
+                print(f"WARN: Snapshot version from Redis failed: {e!r}")
+        snap = {"sport": sport, "version": int(version), "built_at": time.time(), "next_poll": next_poll, **payload}
+        self._local[sport] = snap
+        self._checked[sport] = time.monotonic()
+        if self.r is not None:
+            try:
+                await asyncio.to_thread(self.r.set, self._key(sport), encode(snap, snap["built_at"], 0, 0), ex=SNAPSHOT_RETENTION)
+            except Exception as e:
+                print(f"WARN: Snapshot publish to Redis failed: {e!r}")
+        return snap
+
+    def cached(self) -> Dict[str, Dict]:
+        # This process's latest snapshot per sport, without touching Redis
+        return dict(self._local)
+
+    async def latest(self, sport: str) -> Optional[Dict]:
+        # Local copy, re-validated against the Redis version at most every SNAPSHOT_CHECK_INTERVAL
+        snap = self._local.get(sport)
+        if self.r is None or (snap is not None and time.monotonic() - self._checked.get(sport, 0) < SNAPSHOT_CHECK_INTERVAL):
+            return snap
+        self._checked[sport] = time.monotonic()
+        try:
+            remote = await asyncio.to_thread(self.r.get, self._key(sport) + ":version")
+            if remote is not None and (snap is None or int(remote) > snap["version"]):
+                blob = await asyncio.to_thread(self.r.get, self._key(sport))
+                if blob:
+                    fetched = decode(blob)[0]
+                    if snap is None or fetched["version"] > snap["version"]:
+                        self._local[sport] = fetched
+        except Exception as e:
+            print(f"WARN: Snapshot read from Redis failed: {e!r}")
+        return self._local.get(sport)
+
+class Ingestor:
+    def __init__(self, store: SnapshotStore, sports: List[str] = INGEST_SPORTS):
+        self.store = store
+        self.sports = [s for s in sports if s in SPORTS]
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def ingest(self, sport: str) -> Optional[Dict]:
+        sport_key, build = SPORTS[sport]
+        odds_data = await fetch_odds(sport_key, refresh=True)
+        if odds_data is None:
+            return None
+        # Diff against the last payload; only props with moved prices get rechecked. Full-slate
+        # Python work, so it and the rescan below run off the event loop
+        odds_store = get_store(sport)
+        with metrics.span("diff"):
+            delta = await asyncio.to_thread(odds_store.update, odds_data)
+        prev = await self.store.latest(sport)  # the newest published snapshot, whichever process built it
+        now = time.time()
+        reuse = None
+        if prev is not None and now - prev.get("full_build_at", 0) < TWEETS_TTL and prev.get("warm", True):
+            reuse = {(p.get("event"), p["player"], p["prop"]): p for p in prev["props"]}
+        warm = sentiment.get_backend().loaded  # a build on the cold scorer is redone in full next time
+        with metrics.span("pricing"):
+            await asyncio.to_thread(odds_store.reprice, delta.props())
+        with metrics.span("build"):
+            payload = await build(odds_data, reuse=reuse, fair=odds_store.fair_entry)
+        if payload is None:
+            return None
+        payload["full_build_at"] = prev["full_build_at"] if reuse is not None else now
+        payload["warm"] = prev.get("warm", True) if reuse is not None else warm
+        with metrics.span("arbs"):
+            payload["arbs"] = await asyncio.to_thread(odds_store.rescan, delta.props(), ARBS_TOP_K)
+        payload["delta"] = delta.counts()
+        # Cadence follows tip-off times, stretched when the Odds API credit budget runs hot
+        next_poll = poll_interval(odds_data) * odds_budget.interval_multiplier()
+        if payload["missed"]:
+            next_poll = min(next_poll, PARTIAL_INTERVAL)
+        with metrics.span("publish"):
+            snap = await self.store.publish(sport, payload, next_poll)
+        await odds_store.log(delta, snap["version"])
+        if prev is not None and prev["version"] == snap["version"] - 1:
+            pushed = snapshot_delta(prev, snap)
+            await broadcaster.publish(pushed)
+            await dispatcher.submit(evaluate(prev, pushed))
+            changed = pushed["props"]
+        else:
+            # Another process published in between (or there was nothing before): no trustworthy diff
+            await broadcaster.publish(resync_marker(prev, snap))
+            changed = payload["props"]
+        history.record_prices(sport, delta, snap["version"], snap["built_at"], odds_data)
+        history.record_props(sport, changed, snap["version"], snap["built_at"])
+        print(f"DEBUG: Snapshot {sport} v{snap['version']}: {len(payload['props'])} props, {payload['delta']}, next poll {next_poll}s")
+        return snap
+
+    def refresh(self, sport: str) -> asyncio.Task:
+        # Single-flight on-demand ingest (cold start / dead worker)
+        task = self._inflight.get(sport)
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.create_task(self.ingest(sport))
+            self._inflight[sport] = task
+            task.add_done_callback(lambda t: self._done(sport, t))
+        return task
+
+    def _done(self, sport: str, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"ERROR: Ingest {sport}: {task.exception()!r}")
+
+    async def latest(self, sport: str) -> Optional[Dict]:
+        snap = await self.store.latest(sport)
+        if snap is None:
+            return await asyncio.shield(self.refresh(sport))
+        if time.time() - snap["built_at"] > snap["next_poll"] + PROPS_TTL:
+            self.refresh(sport)  # serve stale, rebuild in the background
+        return snap
+
+    async def _lease(self, sport: str, seconds: float) -> Optional[float]:
+        # Only one process polls a sport per interval; returns seconds to wait if someone else holds it
+        if self.store.r is None:
+            return None
+        key = f"pp:ingest:lock:{sport}"
+        try:
+            if await asyncio.to_thread(self.store.r.set, key, self.owner, nx=True, ex=max(1, int(seconds))):
+                return None
+            holder = await asyncio.to_thread(self.store.r.get, key)
+            if holder is not None and holder.decode() == self.owner:
+                return None
+            return max(1.0, float(await asyncio.to_thread(self.store.r.ttl, key)))
+        except Exception as e:
+            print(f"WARN: Ingest lease failed, polling anyway: {e!r}")
+            return None
+
+    async def _extend(self, sport: str, seconds: float):
+        if self.store.r is not None:
+            try:
+                await asyncio.to_thread(self.store.r.set, f"pp:ingest:lock:{sport}", self.owner, ex=max(1, int(seconds)))
+            except Exception as e:
+                print(f"WARN: Ingest lease extend failed: {e!r}")
+
+    async def run_sport(self, sport: str):
+        while True:
+            interval = RETRY_INTERVAL
+            try:
+                wait = await self._lease(sport, RETRY_INTERVAL)
+                if wait is not None:
+                    interval = wait
+                else:
+                    snap = await self.refresh(sport)
+                    if snap is not None:
+                        interval = snap["next_poll"]
+                        await self._extend(sport, interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"ERROR: Ingest loop {sport}: {e!r}")
+            await asyncio.sleep(interval)
+
+    def start(self):
+        sentiment.warm()  # model loads in the background; first builds use the cold scorer
+        self._tasks = [asyncio.create_task(self.run_sport(s)) for s in self.sports]
+        print(f"DEBUG: Ingestion worker started for {self.sports}")
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await history.flush()
+
+store = SnapshotStore(r)
+ingestor = Ingestor(store)
+
+async def run_once(sports: List[str]) -> bool:
+    await asyncio.to_thread(sentiment.preload)  # one pass: worth waiting for the real model
+    snaps = await asyncio.gather(*(ingestor.ingest(s) for s in sports), return_exceptions=True)
+    ok = True
+    for sport, snap in zip(sports, snaps):
+        if isinstance(snap, Exception) or snap is None:
+            print(f"ERROR: Ingest {sport} failed: {snap!r}")
+            ok = False
+    await history.flush()
+    await dispatcher.drain()
+    await upstream.aclose_clients()
+    return ok
+
+async def run_forever(sports: List[str]):
+    ingestor.sports = sports
+    ingestor.start()
+    dispatcher.start()
+    try:
+        await asyncio.gather(*ingestor._tasks)
+    finally:
+        await dispatcher.stop()
+        await upstream.aclose_clients()
+
+def main():
+    ap = argparse.ArgumentParser(description="PropPulse snapshot ingestion")
+    ap.add_argument("--once", action="store_true", help="ingest every sport once and exit (cron/serverless)")
+    ap.add_argument("--sports", default=",".join(INGEST_SPORTS))
+    args = ap.parse_args()
+    sports = [s for s in args.sports.split(",") if s in SPORTS]
+    missing = [v for v in ['ODDS_API_KEY', 'X_BEARER_TOKEN'] if not os.getenv(v)]
+    if missing:
+        print(f"ERROR: Missing env vars: {missing}")
+        sys.exit(2)
+    if args.once:
+        sys.exit(0 if asyncio.run(run_once(sports)) else 1)
+    asyncio.run(run_forever(sports))
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,29 @@
 import os
-import json
-import redis
-import requests
+import asyncio
 from typing import List, Dict, Optional
-from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Response, Request, WebSocket
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
 import logging
-from transformers import pipeline
-from dotenv import load_dotenv
 import traceback
-from mangum import Mangum  # Vercel handler
+import orjson
+from settings import INGEST_ENABLED, PROPS_PAGE_MAX
+from cache import r, cache
+from sentiment import score_cache
+from props_pipeline import Prop, SPORTS
+from props_view import StaleCursor, prop_pages, parse_fields, parse_cursor, not_modified
+from ingest import ingestor, ARBS_TOP_K
+from budget import ledger
+from odds_store import changes_since
+from stream import broadcaster, sse_events, ws_events
+from history import history, to_rows
+from alerts import dispatcher
+from serverless import ServerlessAdapter, make_http_handler
+import metrics
+import upstream
 
-load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 print("DEBUG: PropPulse API starting (Vercel cold start check)")
@@ -25,168 +35,175 @@ if missing:
     print(f"ERROR: Missing env vars: {missing} - Set in Vercel dashboard!")
     raise ValueError(f"Missing env vars: {missing}")
 
-app = FastAPI(title="PropPulse API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    broadcaster.start()
+    dispatcher.start()
+    if INGEST_ENABLED:
+        ingestor.start()
+    yield
+    await ingestor.stop()
+    await dispatcher.stop()
+    broadcaster.stop()
+    await upstream.aclose_clients()
+
+app = FastAPI(title="PropPulse API", version="1.0.0", lifespan=lifespan)
+app.router.route_class = metrics.TimedRoute
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(metrics.MetricsMiddleware)
 
-# Redis
-try:
-    r = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379"))
-    r.ping()
-    print("DEBUG: Redis OK")
-except Exception as e:
-    print(f"WARN: Redis fallback: {e}")
-    r = None
-
-ODDS_API_KEY = os.getenv("ODDS_API_KEY")
-X_BEARER_TOKEN = os.getenv("X_BEARER_TOKEN")
-BASE_URL = "https://api.the-odds-api.com/v4"
-
-class Prop(BaseModel):
-    player: str
-    prop: str
-    line: float
-    odds: Dict[str, float]
-    adjusted_prob: float
-    risk_score: float
-    tweets: List[Dict]
-
-sentiment_pipeline = None
-def get_sentiment_pipeline():
-    global sentiment_pipeline
-    if sentiment_pipeline is None:
-        try:
-            sentiment_pipeline = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
-            print("DEBUG: ML pipeline loaded (2-5s cold)")
-        except Exception as e:
-            print(f"ERROR: ML fallback (using dummy sentiment): {e}")
-            sentiment_pipeline = lambda text: [{'label': 'NEUTRAL', 'score': 0.5}]  # No-crash dummy
-    return sentiment_pipeline
-
-def fetch_odds(sport_key: str) -> Optional[List[Dict]]:
-    cache_key = f"odds:{sport_key}"
-    if r and r.exists(cache_key):
-        return json.loads(r.get(cache_key))
-    try:
-        url = f"{BASE_URL}/sports/{sport_key}/odds/"
-        params = {"apiKey": ODDS_API_KEY, "regions": "us", "markets": "player_points,player_rebounds,player_assists", "oddsFormat": "decimal"}
-        resp = requests.get(url, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        if r: r.setex(cache_key, 300, json.dumps(data))
-        return data
-    except Exception as e:
-        print(f"ERROR: Odds fetch: {e}")
-        return None
-
-def get_injury_tweets(player: str) -> Dict:
-    if not X_BEARER_TOKEN:
-        return {"risk_score": 0, "tweets": []}
-    try:
-        headers = {"Authorization": f"Bearer {X_BEARER_TOKEN}"}
-        url = "https://api.twitter.com/2/tweets/search/recent"
-        params = {
-            "query": f'({player} (injury OR practice OR questionable OR load OR rest)) (from:wojespn OR from:ShamsCharania OR from:AdrianDorr OR from:MarcJSpears) -is:retweet',
-            "max_results": 5,
-            "tweet.fields": "text,created_at"
-        }
-        resp = requests.get(url, headers=headers, params=params, timeout=10)
-        resp.raise_for_status()
-        tweets = resp.json().get('data', [])
-        pipeline = get_sentiment_pipeline()
-        sentiments = []
-        for t in tweets:
-            score = pipeline(t['text'])[0]
-            neg_score = score['score'] if score['label'] == 'NEGATIVE' else 0
-            sentiments.append({'text': t['text'][:100], 'score': neg_score})
-        risk = sum(s['score'] for s in sentiments) / max(1, len(sentiments))
-        return {'risk_score': round(risk * 100, 1), 'tweets': sentiments}
-    except Exception as e:
-        print(f"ERROR: Tweets for {player}: {e}")
-        return {"risk_score": 0, "tweets": []}
-
-def detect_prop_arb(props: List[Dict]) -> List[Dict]:
-    arbs = []
-    for prop in props:
-        odds = prop.get('odds', {})
-        over_odds = [o_types.get('over', 1) for o_types in odds.values() if isinstance(o_types, dict)]
-        under_odds = [o_types.get('under', 1) for o_types in odds.values() if isinstance(o_types, dict)]
-        if over_odds and under_odds:
-            best_over = max(over_odds)
-            best_under = max(under_odds)
-            vig = 1/best_over + 1/best_under
-            if vig < 0.98:
-                margin = round((1 - vig) * 100, 2)
-                arbs.append({'prop': prop['player'], 'margin': margin, 'vig': round(vig * 100, 1)})
-    return sorted(arbs, key=lambda x: x['margin'], reverse=True)[:3]
+# Scrape-time views of state the app already tracks
+metrics.Collected("pp_cache_events_total", "Cache lookups by outcome", "counter", ("cache", "event"),
+                  lambda: [((name, k), v) for name, c in (("main", cache), ("scores", score_cache)) for k, v in c.stats.items()])
+metrics.Collected("pp_odds_credits_remaining", "Odds API credits left, per the last response header", "gauge", (),
+                  lambda: [((), ledger.remaining)])
+metrics.Collected("pp_snapshot_version", "Latest published snapshot version per sport", "gauge", ("sport",),
+                  lambda: [((s,), snap["version"]) for s, snap in ingestor.store.cached().items()])
 
 @app.get("/")
 async def root():
     print("DEBUG: Root hit")
     return {"message": "PropPulse MVP Live!", "version": "1.0.0"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health():
     print("DEBUG: Health check")
     return {
         "status": "healthy",
         "redis": r is not None,
+        "odds_credits_remaining": ledger.remaining,
         "timestamp": datetime.utcnow().isoformat()
     }
 
-@app.get("/nba/props", response_model=List[Prop])
-async def get_nba_props():
-    print("DEBUG: NBA props request")
-    odds_data = fetch_odds("basketball_nba")
-    if not odds_data:
+async def serve_snapshot(sport: str, request: Request, limit: int, cursor: Optional[str], fields: Optional[str]) -> Response:
+    # Pages come pre-encoded per snapshot; the props were validated as Prop when the snapshot was built
+    snap = await ingestor.latest(sport)
+    if not snap:
         raise HTTPException(500, "Odds fetch failed")
-    props = []
-    seen_players = set()
-    for event in odds_data[:5]:
-        for bookmaker in event.get('bookmakers', []):
-            for market in bookmaker.get('markets', []):
-                if 'player' in market['key'] and len(market['outcomes']) >= 2:
-                    player_name = market['outcomes'][0]['name'].split(' - ')[0]
-                    if player_name in seen_players: continue
-                    seen_players.add(player_name)
-                    line = float(market['outcomes'][0]['point'])
-                    odds = {bookmaker['title']: {o['name'].lower(): o['price'] for o in market['outcomes']}}
-                    tweets = get_injury_tweets(player_name)
-                    base_prob = 50
-                    adjusted = max(0, base_prob - tweets['risk_score'])
-                    props.append(Prop(
-                        player=player_name, prop=market['key'], line=line, odds=odds,
-                        adjusted_prob=round(adjusted, 1), risk_score=tweets['risk_score'], tweets=tweets['tweets']
-                    ))
-    if r: r.setex("nba_props", 300, json.dumps([p.dict() for p in props]))
-    return props[:10]
-
-# Similar for /ncaab/props (copy from previous)
-@app.get("/ncaab/props", response_model=List[Prop])
-async def get_ncaab_props():
-    print("DEBUG: NCAAB props request")
-    odds_data = fetch_odds("basketball_ncaab")
-    if not odds_data:
+    try:
+        page = prop_pages.page(snap, parse_fields(fields), parse_cursor(cursor), limit)
+    except StaleCursor as e:
+        raise HTTPException(409, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    headers = {"ETag": page.etag, "Cache-Control": "no-cache", "X-Snapshot-Version": str(snap["version"]),
+               "X-Total-Count": str(page.total)}
+    if page.next_cursor is not None:
+        headers["X-Next-Cursor"] = page.next_cursor
+    if snap["missed"]:
+        headers["X-Partial-Results"] = str(snap["missed"])
+    if not_modified(request.headers.get("if-none-match"), page.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(page.body, media_type="application/json", headers=headers)
+
+@app.get("/{sport}/props", response_model=List[Prop])
+async def get_props(sport: str, request: Request, limit: int = Query(10, ge=1, le=PROPS_PAGE_MAX),
+                    cursor: Optional[str] = None, fields: Optional[str] = None):
+    # fields=player,prop,line,... trims each prop (event/player/prop always included); X-Next-Cursor pages on
+    print(f"DEBUG: {sport.upper()} props request")
+    if sport not in SPORTS:
+        raise HTTPException(404, f"Unknown sport: {sport}")
+    return await serve_snapshot(sport, request, limit, cursor, fields)
+
+@app.get("/arbs")
+async def get_arbs(sport: str = "nba", limit: int = Query(10, ge=1, le=ARBS_TOP_K)):
+    print("DEBUG: Arbs request")
+    if sport not in SPORTS:
+        raise HTTPException(404, f"Unknown sport: {sport}")
+    snap = await ingestor.latest(sport)
+    if not snap:
         raise HTTPException(500, "Odds fetch failed")
-    # ... (mirror NBA logic, replace sport_key)
-    props = []  # Implement as above
-    return props[:10]
-
-@app.post("/alert")
+    opps = snap.get("arbs") or {"arbs": [], "middles": [], "outcomes": 0}
+    return {"sport": sport, "version": snap["version"], "outcomes": opps["outcomes"],
+            "arbs": opps["arbs"][:limit], "middles": opps["middles"][:limit]}
+
+@app.get("/props/changes")
+async def get_prop_changes(since: int = 0, sport: str = "nba"):
+    # Price moves published after snapshot version `since`; reset=True means resync from /{sport}/props
+    if sport not in SPORTS:
+        raise HTTPException(404, f"Unknown sport: {sport}")
+    snap = await ingestor.store.latest(sport)
+    version = snap["version"] if snap else 0
+    changes = await changes_since(sport, since)
+    if since >= version:
+        changes = []
+    return {"sport": sport, "since": since, "version": version, "reset": changes is None, "changes": changes or []}
+
+def _when(value: Optional[str]) -> Optional[float]:
+    # Epoch seconds or ISO-8601 (naive means UTC)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        when = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(400, f"Bad time: {value}")
+    return (when if when.tzinfo else when.replace(tzinfo=timezone.utc)).timestamp()
+
+@app.get("/history")
+async def get_history(sport: str = "nba", kind: str = "prices", player: Optional[str] = None, market: Optional[str] = None,
+                      book: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+                      limit: int = Query(1000, ge=1, le=10000)):
+    # kind: prices (every move), props (adjusted_prob/risk_score), closing (last pre-tip price per book + first in window)
+    if sport not in SPORTS:
+        raise HTTPException(404, f"Unknown sport: {sport}")
+    filters = {"player": player, "market": market}
+    if kind != "props":
+        filters["book"] = book
+    try:
+        if kind == "closing":
+            cols = await asyncio.to_thread(history.closing, sport, _when(start), _when(end), **filters)
+            total = len(cols["ts"])
+        else:
+            cols, total = await asyncio.to_thread(history.query_page, sport, kind, _when(start), _when(end), limit, **filters)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return Response(orjson.dumps({"sport": sport, "kind": kind, "total": total, "rows": to_rows(cols, limit)}),
+                    media_type="application/json")
+
+@app.get("/stream")
+async def stream_updates(request: Request, sport: str = "nba"):
+    # SSE: one `delta` event per ingest with changed/removed props and new arbs
+    if sport not in SPORTS:
+        raise HTTPException(404, f"Unknown sport: {sport}")
+    snap = await ingestor.store.latest(sport)
+    return StreamingResponse(sse_events(request, sport, snap["version"] if snap else 0), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/ws")
+async def ws_updates(websocket: WebSocket, sport: str = "nba"):
+    if sport not in SPORTS:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    snap = await ingestor.store.latest(sport)
+    await ws_events(websocket, sport, snap["version"] if snap else 0)
+
+@app.post("/alert", status_code=202)
 async def send_alert(data: Dict):
+    # Queued for the batched dispatcher; a (player, prop, line) already alerted within ALERT_DEDUP_TTL is skipped
     print("DEBUG: Alert post")
-    webhook = os.getenv("DISCORD_WEBHOOK")
-    if not webhook:
+    if not dispatcher.enabled:
         raise HTTPException(400, "No webhook")
     try:
-        resp = requests.post(webhook, json={"content": f"Alert: {data.get('player')} {data.get('prop')} @ {data.get('line')} (Risk: {data.get('risk_score'):.1f}%)"})
-        resp.raise_for_status()
-        return {"status": "Sent"}
-    except Exception as e:
-        print(f"ERROR: Alert: {e}")
-        raise HTTPException(500, "Alert failed")
-
-# Vercel handler
-handler = Mangum(app)
+        alert = {"kind": "manual", "player": str(data["player"]), "prop": str(data["prop"]),
+                 "line": float(data["line"]), "risk_score": float(data.get("risk_score") or 0)}
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(400, "Alert needs player, prop, line and a numeric risk_score")
+    queued = await dispatcher.submit([alert])
+    return {"status": "Queued" if queued else "Duplicate"}
+
+# Serverless: Vercel's Python runtime picks up `handler`, AWS Lambda points at `lambda_handler`.
+# Both share one adapter, so a container starts the app once and reuses it across invocations.
+lambda_handler = ServerlessAdapter(app)
+handler = make_http_handler(lambda_handler)
 
 if __name__ == "__main__":
     import uvicorn
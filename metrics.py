@@ -0,0 +1,205 @@
+import bisect
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from fastapi.routing import APIRoute
+from settings import METRICS_ENABLED, PROFILE_TOKEN
+
+# Minimal in-process metrics with Prometheus text output, plus per-request stage
+# profiling. span("stage") times a block into pp_stage_seconds; when the request
+# opted in with `X-Profile`, the same timings come back in a Server-Timing header.
+# With METRICS_ENABLED=0 and no profiling a span is a shared no-op object.
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY: List["_Metric"] = []
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def lines(self) -> Iterable[str]:
+        return []
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def lines(self):
+        for labels, v in list(self.values.items()):
+            yield f"{self.name}{_fmt_labels(self.labels, labels)} {v}"
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        self.values: Dict[Tuple, List[float]] = {}  # labels -> per-bucket counts..., +Inf count, sum
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [0.0] * (len(self.buckets) + 2)
+            state[i] += 1
+            state[-1] += value
+
+    def lines(self):
+        for labels, state in list(self.values.items()):
+            running = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                running += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labels, labels, le)} {running}"
+            yield f"{self.name}_sum{_fmt_labels(self.labels, labels)} {state[-1]}"
+            yield f"{self.name}_count{_fmt_labels(self.labels, labels)} {running}"
+
+class Collected(_Metric):
+    # Read at scrape time from state the app already keeps (cache stats, ledger); free on the hot path
+    def __init__(self, name: str, help: str, kind: str, labels: Tuple[str, ...], collect: Callable[[], Iterable[Tuple[Tuple, float]]]):
+        super().__init__(name, help, labels)
+        self.kind, self.collect = kind, collect
+
+    def lines(self):
+        for labels, v in self.collect():
+            if v is not None:
+                yield f"{self.name}{_fmt_labels(self.labels, labels)} {v}"
+
+def render() -> str:
+    out = []
+    for m in REGISTRY:
+        body = list(m.lines())
+        if body:
+            out.append(f"# HELP {m.name} {m.help}")
+            out.append(f"# TYPE {m.name} {m.kind}")
+            out.extend(body)
+    return "\n".join(out) + "\n"
+
+STAGE_SECONDS = Histogram("pp_stage_seconds", "Time spent per pipeline stage", ("stage",))
+UPSTREAM_SECONDS = Histogram("pp_upstream_seconds", "Upstream API call latency", ("api", "status"))
+UPSTREAM_ERRORS = Counter("pp_upstream_errors_total", "Upstream calls that failed or timed out", ("api",))
+REQUEST_SECONDS = Histogram("pp_request_seconds", "Time to response start per route", ("route",))
+REQUESTS = Counter("pp_requests_total", "Requests per route and status", ("route", "status"))
+TWEETS_SCORED = Counter("pp_tweets_scored_total", "Tweets run through a sentiment backend", ("backend",))
+ALERTS = Counter("pp_alerts_total", "Alerts by outcome (queued, duplicate, sent, dropped, rate_limited)", ("event",))
+
+# -- profiling --
+_profile: ContextVar[Optional[Dict[str, float]]] = ContextVar("pp_profile", default=None)
+
+class _Span:
+    __slots__ = ("stage", "prof", "t0")
+
+    def __init__(self, stage: str, prof: Optional[Dict[str, float]]):
+        self.stage, self.prof = stage, prof
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.t0, self.prof)
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NOOP = _NoopSpan()
+
+def record(stage: str, seconds: float, prof: Optional[Dict[str, float]] = None):
+    if METRICS_ENABLED:
+        STAGE_SECONDS.observe(seconds, stage)
+    prof = prof if prof is not None else _profile.get()
+    if prof is not None:
+        prof[stage] = prof.get(stage, 0.0) + seconds
+
+def span(stage: str):
+    prof = _profile.get()
+    if not METRICS_ENABLED and prof is None:
+        return _NOOP
+    return _Span(stage, prof)
+
+def upstream_call(api: str, status: int, seconds: float):
+    if METRICS_ENABLED:
+        UPSTREAM_SECONDS.observe(seconds, api, status)
+    prof = _profile.get()
+    if prof is not None:
+        prof[f"{api}_api"] = prof.get(f"{api}_api", 0.0) + seconds
+
+def _timed_endpoint(endpoint):
+    # FastAPI reads the signature through __wrapped__, so params still resolve
+    @functools.wraps(endpoint)
+    async def timed(*args, **kwargs):
+        with span("endpoint"):
+            return await endpoint(*args, **kwargs)
+    return timed
+
+class TimedRoute(APIRoute):
+    # Endpoint time as its own stage; what's left of the request is validation + serialization
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        prof = None
+        for k, v in scope["headers"]:
+            if k == b"x-profile":
+                if v.decode("latin-1") == (PROFILE_TOKEN or "1"):
+                    prof = {}
+                break
+        if not METRICS_ENABLED and prof is None:
+            return await self.app(scope, receive, send)
+        token = _profile.set(prof) if prof is not None else None
+        t0 = time.perf_counter()
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - t0
+                route = scope.get("route")
+                path = getattr(route, "path", "unmatched")
+                if METRICS_ENABLED:
+                    REQUEST_SECONDS.observe(total, path)
+                    REQUESTS.inc(path, message["status"])
+                if prof is not None:
+                    if "endpoint" in prof:
+                        prof["serialize"] = max(0.0, total - prof["endpoint"])
+                    prof["total"] = total
+                    timing = ", ".join(f"{k};dur={v * 1000:.1f}" for k, v in prof.items())
+                    message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", timing.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            if token is not None:
+                _profile.reset(token)
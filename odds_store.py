@@ -0,0 +1,375 @@
+import asyncio
+import heapq
+from collections import deque
+from itertools import repeat
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from odds_table import OutcomeTable, Outcome, iter_outcomes, OVER, UNDER
+from cache import r, encode, decode
+import arbs
+import pricing
+
+# Incremental odds state per sport. Each new Odds API payload is diffed against
+# the last one into new/changed/removed prices, only the props those touch get
+# their arb/middle checks redone, and every move lands in a bounded per-prop
+# ring buffer that /props/changes?since=<version> reads from. No-vig pricing is
+# redone the same way, for touched props only.
+
+MOVES_PER_PROP = 20
+CHANGELOG_VERSIONS = 500  # versions kept in Redis for readers in other processes
+OPPS_PER_PROP = 3  # best arbs (and middles) kept per prop between rescans
+
+PriceKey = Tuple[str, str, str, str]  # (event, player, market, book)
+PropKey = Tuple[str, str, str]  # (event, player, market)
+
+class PriceRecord:
+    __slots__ = ("line", "over", "under", "version")
+
+    def __init__(self, line: float, over: Optional[float], under: Optional[float], version: int = 0):
+        self.line, self.over, self.under, self.version = line, over, under, version
+
+    def same(self, other: "PriceRecord") -> bool:
+        return self.line == other.line and self.over == other.over and self.under == other.under
+
+class Delta:
+    __slots__ = ("new", "changed", "removed")
+
+    def __init__(self):
+        # key -> (old, new); old is None for new prices, new is None for removed ones
+        self.new: Dict[PriceKey, Tuple[None, PriceRecord]] = {}
+        self.changed: Dict[PriceKey, Tuple[PriceRecord, PriceRecord]] = {}
+        self.removed: Dict[PriceKey, Tuple[PriceRecord, None]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.new or self.changed or self.removed)
+
+    def items(self) -> Iterable[Tuple[PriceKey, Tuple[Optional[PriceRecord], Optional[PriceRecord]]]]:
+        yield from self.new.items()
+        yield from self.changed.items()
+        yield from self.removed.items()
+
+    def props(self) -> Set[PropKey]:
+        return {k[:3] for k, _ in self.items()}
+
+    def counts(self) -> Dict[str, int]:
+        return {"new": len(self.new), "changed": len(self.changed), "removed": len(self.removed)}
+
+def _move(version: int, key: PriceKey, old: Optional[PriceRecord], new: Optional[PriceRecord]) -> Dict:
+    event, player, market, book = key
+    return {
+        "version": version, "event": event, "player": player, "market": market, "book": book,
+        "line": new.line if new else None, "over": new.over if new else None, "under": new.under if new else None,
+        "prev": {"line": old.line, "over": old.over, "under": old.under} if old else None,
+    }
+
+class Quotes:
+    # Columnar copy of the price records for pricing: one slot per (event, player, market, book),
+    # updated in place by OddsStore.apply. Slots and prop ids of prices that left the board are reused.
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self.slot: Dict[PriceKey, int] = {}
+        self.free: List[int] = []
+        self.prop_ids: Dict[PropKey, int] = {}
+        self.props: List[Optional[PropKey]] = []
+        self.free_props: List[int] = []
+        self.book_ids: Dict[str, int] = {}
+        self.books: List[str] = []
+        self.prop = np.full(capacity, -1, np.int64)  # -1: empty slot
+        self.book = np.zeros(capacity, np.int32)
+        self.line = np.zeros(capacity)
+        self.over = np.full(capacity, np.nan)
+        self.under = np.full(capacity, np.nan)
+
+    def set(self, key: PriceKey, rec: PriceRecord):
+        i = self.slot.get(key)
+        if i is None:
+            i = self.slot[key] = self.free.pop() if self.free else self._grow()
+            self.prop[i] = self._prop_id(key[:3])
+            book = self.book_ids.get(key[3])
+            if book is None:
+                book = self.book_ids[key[3]] = len(self.books)
+                self.books.append(key[3])
+            self.book[i] = book
+        self.line[i] = rec.line
+        self.over[i] = np.nan if rec.over is None else rec.over
+        self.under[i] = np.nan if rec.under is None else rec.under
+
+    def remove(self, key: PriceKey):
+        i = self.slot.pop(key, None)
+        if i is not None:
+            self.prop[i] = -1
+            self.over[i] = self.under[i] = np.nan
+            self.free.append(i)
+
+    def forget(self, prop: PropKey):
+        # Called once the prop has no prices left
+        pid = self.prop_ids.pop(prop, None)
+        if pid is not None:
+            self.props[pid] = None
+            self.free_props.append(pid)
+
+    def select(self, props: Iterable[PropKey]) -> np.ndarray:
+        # Slots holding a price of any of these props
+        ids = [self.prop_ids[p] for p in props if p in self.prop_ids]
+        return np.flatnonzero(np.isin(self.prop[:self.size], ids))
+
+    def table(self, sel: np.ndarray) -> OutcomeTable:
+        # Outcome rows (one per quoted side) of these slots for arbs.scan, straight off the columns;
+        # names are interned once per prop rather than once per outcome
+        pids, inverse = np.unique(self.prop[sel], return_inverse=True)
+        ids: Tuple[Dict[str, int], ...] = ({}, {}, {})  # events, players, markets
+        codes = np.array([[d.setdefault(v, len(d)) for d, v in zip(ids, self.props[p])] for p in pids.tolist()],
+                         np.int64).reshape(-1, 3)[inverse]
+        over, under = self.over[sel], self.under[sel]
+        has_over, has_under = np.flatnonzero(~np.isnan(over)), np.flatnonzero(~np.isnan(under))
+        rows = np.concatenate([has_over, has_under])
+        side = np.concatenate([np.full(len(has_over), OVER, np.int8), np.full(len(has_under), UNDER, np.int8)])
+        return OutcomeTable(
+            codes[rows, 0].astype(np.int32), codes[rows, 1].astype(np.int32), codes[rows, 2].astype(np.int16),
+            self.book[sel][rows].astype(np.int16), self.line[sel][rows].astype(np.float32), side,
+            np.concatenate([over[has_over], under[has_under]]), *[list(d) for d in ids], list(self.books),
+        )
+
+    def _prop_id(self, prop: PropKey) -> int:
+        pid = self.prop_ids.get(prop)
+        if pid is None:
+            if self.free_props:
+                pid = self.free_props.pop()
+                self.props[pid] = prop
+            else:
+                pid = len(self.props)
+                self.props.append(prop)
+            self.prop_ids[prop] = pid
+        return pid
+
+    def _grow(self) -> int:
+        if self.size == len(self.prop):
+            extra = max(1024, self.size)
+            self.prop = np.concatenate([self.prop, np.full(extra, -1, np.int64)])
+            self.book = np.concatenate([self.book, np.zeros(extra, np.int32)])
+            self.line = np.concatenate([self.line, np.zeros(extra)])
+            self.over = np.concatenate([self.over, np.full(extra, np.nan)])
+            self.under = np.concatenate([self.under, np.full(extra, np.nan)])
+        self.size += 1
+        return self.size - 1
+
+class OddsStore:
+    def __init__(self, sport: str, redis_client=None, moves_per_prop: int = MOVES_PER_PROP):
+        self.sport = sport
+        self.r = redis_client
+        self.moves_per_prop = moves_per_prop
+        self.records: Dict[PriceKey, PriceRecord] = {}
+        self.books_by_prop: Dict[PropKey, Set[str]] = {}
+        self.moves: Dict[PropKey, Deque[Dict]] = {}
+        self.prop_version: Dict[PropKey, int] = {}
+        self.opps: Dict[PropKey, Dict[str, List[Dict]]] = {}
+        self.quotes = Quotes()
+        self.fair: Dict[PropKey, Tuple[pricing.Summary, int, int]] = {}  # prop -> (summary, its pairs in it)
+        self.version = 0
+        self.floor = 0  # every move newer than this is still in the ring buffers
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def diff(self, odds_data: Optional[List[Dict]]) -> Delta:
+        incoming: Dict[PriceKey, PriceRecord] = {}
+        for event, book, market, player, line, side, price in iter_outcomes(odds_data):
+            rec = incoming.get((event, player, market, book))
+            if rec is None:
+                rec = incoming[(event, player, market, book)] = PriceRecord(line, None, None)
+            rec.line = line
+            if side == OVER:
+                rec.over = price
+            else:
+                rec.under = price
+        delta = Delta()
+        for key, rec in incoming.items():
+            old = self.records.get(key)
+            if old is None:
+                delta.new[key] = (None, rec)
+            elif not old.same(rec):
+                delta.changed[key] = (old, rec)
+        for key, old in self.records.items():
+            if key not in incoming:
+                delta.removed[key] = (old, None)
+        return delta
+
+    def apply(self, delta: Delta):
+        for key, (_, new) in delta.items():
+            prop = key[:3]
+            if new is None:
+                self.records.pop(key, None)
+                self.quotes.remove(key)
+                books = self.books_by_prop.get(prop)
+                if books is not None:
+                    books.discard(key[3])
+                    if not books:
+                        del self.books_by_prop[prop]
+                        self.quotes.forget(prop)
+            else:
+                self.records[key] = new
+                self.quotes.set(key, new)
+                self.books_by_prop.setdefault(prop, set()).add(key[3])
+
+    def update(self, odds_data: Optional[List[Dict]]) -> Delta:
+        delta = self.diff(odds_data)
+        self.apply(delta)
+        return delta
+
+    def rows(self, props: Iterable[PropKey]) -> Iterable[Outcome]:
+        for prop in props:
+            event, player, market = prop
+            for book in self.books_by_prop.get(prop, ()):
+                rec = self.records[(event, player, market, book)]
+                if rec.over is not None:
+                    yield event, book, market, player, rec.line, 0, rec.over
+                if rec.under is not None:
+                    yield event, book, market, player, rec.line, 1, rec.under
+
+    def rescan(self, props: Set[PropKey], top_k: int) -> Dict:
+        # Arb/middle checks for the touched props only; everything else keeps its last result
+        for prop in props:
+            self.opps.pop(prop, None)
+        live = [p for p in props if p in self.books_by_prop]
+        q = self.quotes
+        found = arbs.scan(q.table(q.select(live)), top_k=len(live) * OPPS_PER_PROP, per_prop=OPPS_PER_PROP)
+        for kind in ("arbs", "middles"):
+            for opp in found[kind]:
+                self.opps.setdefault((opp["event"], opp["player"], opp["market"]), {"arbs": [], "middles": []})[kind].append(opp)
+        all_arbs = [a for o in self.opps.values() for a in o["arbs"]]
+        all_middles = [m for o in self.opps.values() for m in o["middles"]]
+        return {
+            "arbs": heapq.nsmallest(top_k, all_arbs, key=lambda a: a["hold"]),
+            "middles": heapq.nsmallest(top_k, all_middles, key=lambda m: m["hold"]),
+            "outcomes": int(np.count_nonzero(~np.isnan(q.over[:q.size])) + np.count_nonzero(~np.isnan(q.under[:q.size]))),
+        }
+
+    def reprice(self, props: Set[PropKey]):
+        # Fair probability / EV for the touched props only, straight off the quote columns; everything
+        # else keeps its last result. Read back per line with fair_entry()
+        for prop in props:
+            self.fair.pop(prop, None)
+        q = self.quotes
+        sel = q.select(props)
+        summary = pricing.Summary(pricing.price(q.prop[sel], q.line[sel], q.over[sel], q.under[sel]), q.book[sel], q.books)
+        pids, first, end = summary.prop_ranges()
+        self.fair.update(zip([q.props[p] for p in pids.tolist()], zip(repeat(summary), first.tolist(), end.tolist())))
+
+    def fair_entry(self, prop: PropKey, line: float) -> Optional[Dict]:
+        # {"fair_prob", "ev"} for one prop at one line; None if no book quotes both sides there
+        found = self.fair.get(prop)
+        if found is None:
+            return None
+        summary, first, end = found
+        for i in range(first, end):
+            if summary.line[i] == line:
+                return summary.entry(i)
+        return None
+
+    async def log(self, delta: Delta, version: int):
+        # Ring-buffer every move under the snapshot version that published it
+        if self.version != version - 1:
+            await self._reset(delta, version)
+            return
+        moves = []
+        for key, (old, new) in delta.items():
+            move = _move(version, key, old, new)
+            moves.append(move)
+            if new is not None:
+                new.version = version
+            prop = key[:3]
+            buf = self.moves.get(prop)
+            if buf is None:
+                buf = self.moves[prop] = deque(maxlen=self.moves_per_prop)
+            if len(buf) == buf.maxlen:
+                self.floor = max(self.floor, buf[0]["version"])
+            buf.append(move)
+            self.prop_version[prop] = version
+        for prop in [p for p in self.moves if p not in self.books_by_prop and self.prop_version[p] < version]:
+            # Prop is off the board and its removal was logged earlier; its history can go
+            self.floor = max(self.floor, self.prop_version[prop])
+            del self.moves[prop], self.prop_version[prop]
+        self.version = version
+        if self.r is not None and moves:
+            key = f"pp:changes:{self.sport}"
+            def write():
+                pipe = self.r.pipeline(transaction=False)
+                pipe.zadd(key, {encode(moves, 0, 0, 0): version})
+                pipe.zremrangebyrank(key, 0, -CHANGELOG_VERSIONS - 1)
+                pipe.execute()
+            try:
+                await asyncio.to_thread(write)
+            except Exception as e:
+                print(f"WARN: Changelog write failed: {e!r}")
+
+    async def _reset(self, delta: Delta, version: int):
+        # Our last payload isn't the snapshot before this one (restart, or another process published in
+        # between), so the delta isn't the change since version - 1: the log starts over at `version`
+        for _, (_, new) in delta.items():
+            if new is not None:
+                new.version = version
+        self.moves.clear()
+        self.prop_version.clear()
+        self.floor = self.version = version
+        if self.r is not None:
+            key = f"pp:changes:{self.sport}"
+            def write():
+                pipe = self.r.pipeline(transaction=True)
+                pipe.delete(key)
+                pipe.set(key + ":floor", version)
+                pipe.execute()
+            try:
+                await asyncio.to_thread(write)
+            except Exception as e:
+                print(f"WARN: Changelog reset failed: {e!r}")
+
+    def changes_since(self, since: int) -> Optional[List[Dict]]:
+        # None when the ring buffers no longer reach back that far (client should refetch)
+        if since < self.floor:
+            return None
+        out = []
+        for prop, buf in self.moves.items():
+            if self.prop_version.get(prop, 0) <= since:
+                continue
+            out.extend(m for m in buf if m["version"] > since)
+        out.sort(key=lambda m: m["version"])
+        return out
+
+async def changes_since(sport: str, since: int) -> Optional[List[Dict]]:
+    # With Redis, every process that ingests writes the shared changelog, so it is the
+    # complete one even after this process has done an on-demand ingest of its own
+    if r is not None:
+        return await remote_changes_since(sport, since)
+    return get_store(sport).changes_since(since)
+
+async def remote_changes_since(sport: str, since: int) -> Optional[List[Dict]]:
+    # Changelog published by an ingestion worker in another process
+    if r is None:
+        return None
+    key = f"pp:changes:{sport}"
+    def head():
+        pipe = r.pipeline(transaction=False)
+        pipe.get(key + ":floor")
+        pipe.zrange(key, 0, 0, withscores=True)
+        return pipe.execute()
+    try:
+        floor, oldest = await asyncio.to_thread(head)
+        if floor is not None and since < int(floor):
+            return None
+        if not oldest:
+            return []
+        if since < oldest[0][1] - 1:
+            return None
+        blobs = await asyncio.to_thread(r.zrangebyscore, key, f"({since}", "+inf")
+    except Exception as e:
+        print(f"WARN: Changelog read failed: {e!r}")
+        return None
+    return [m for blob in blobs for m in decode(blob)[0]]
+
+stores: Dict[str, OddsStore] = {}
+
+def get_store(sport: str) -> OddsStore:
+    store = stores.get(sport)
+    if store is None:
+        store = stores[sport] = OddsStore(sport, r)
+    return store
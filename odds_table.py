@@ -0,0 +1,78 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+# Columnar view of an Odds API payload: one row per (event, book, market, player,
+# line, side) outcome, strings interned to small ints so the slate can be scanned
+# with array operations instead of nested dict loops.
+
+OVER, UNDER = 0, 1
+SIDES = {"over": OVER, "under": UNDER}
+
+def parse_outcome(outcome: Dict) -> Tuple[Optional[str], Optional[int]]:
+    # Odds API player props: name="Over", description="Player". Older payloads: name="Player - Over"
+    name = outcome.get('name', '')
+    player = outcome.get('description')
+    if not player and ' - ' in name:
+        player, name = name.rsplit(' - ', 1)
+    return player, SIDES.get(name.strip().lower())
+
+# (event id, book, market, player, line, side, price)
+Outcome = Tuple[str, str, str, str, float, int, float]
+
+def iter_outcomes(odds_data: Optional[List[Dict]]) -> Iterator[Outcome]:
+    for event in odds_data or []:
+        event_id = event.get('id')
+        for bookmaker in event.get('bookmakers', []):
+            book = bookmaker.get('title') or bookmaker.get('key')
+            for market in bookmaker.get('markets', []):
+                if 'player' not in market.get('key', ''):
+                    continue
+                for o in market.get('outcomes', []):
+                    player, side = parse_outcome(o)
+                    if player is None or side is None or o.get('point') is None or not o.get('price'):
+                        continue
+                    yield event_id, book, market['key'], player, float(o['point']), side, float(o['price'])
+
+class OutcomeTable:
+    __slots__ = ("event", "player", "market", "book", "line", "side", "price", "events", "players", "markets", "books")
+
+    def __init__(self, event, player, market, book, line, side, price, events, players, markets, books):
+        self.event, self.player, self.market, self.book = event, player, market, book
+        self.line, self.side, self.price = line, side, price
+        self.events, self.players, self.markets, self.books = events, players, markets, books
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Outcome]) -> "OutcomeTable":
+        ids: Tuple[Dict[str, int], ...] = ({}, {}, {}, {})  # events, players, markets, books
+        cols: Tuple[List, ...] = ([], [], [], [], [], [], [])
+        ev_c, pl_c, mk_c, bk_c, ln_c, sd_c, pr_c = cols
+        events, players, markets, books = ids
+        for event_id, book, market, player, line, side, price in rows:
+            ev_c.append(events.setdefault(event_id, len(events)))
+            bk_c.append(books.setdefault(book, len(books)))
+            mk_c.append(markets.setdefault(market, len(markets)))
+            pl_c.append(players.setdefault(player, len(players)))
+            ln_c.append(line); sd_c.append(side); pr_c.append(price)
+        names = [list(d) for d in ids]
+        return cls(
+            np.asarray(ev_c, np.int32), np.asarray(pl_c, np.int32), np.asarray(mk_c, np.int16), np.asarray(bk_c, np.int16),
+            np.asarray(ln_c, np.float32), np.asarray(sd_c, np.int8), np.asarray(pr_c, np.float64), *names,
+        )
+
+    @classmethod
+    def from_odds(cls, odds_data: Optional[List[Dict]]) -> "OutcomeTable":
+        return cls.from_rows(iter_outcomes(odds_data))
+
+    def group_key(self) -> np.ndarray:
+        # One int64 per (event, player, market)
+        return (self.event.astype(np.int64) * max(1, len(self.players)) + self.player) * max(1, len(self.markets)) + self.market
+
+    def describe(self, row: int) -> Dict:
+        return {
+            "event": self.events[self.event[row]],
+            "player": self.players[self.player[row]],
+            "market": self.markets[self.market[row]],
+        }
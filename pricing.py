@@ -0,0 +1,111 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from settings import DEVIG_METHOD, RISK_WEIGHT
+
+# No-vig pricing over flat per-quote arrays (OddsStore keeps them as columns). Each
+# book's two-way market is de-vigged elementwise (multiplicative, power or Shin), the
+# books quoting one (event, player, market, line) are averaged into a consensus fair
+# P(over) with a bincount, and every quoted price gets its EV against that consensus.
+# Results stay in arrays (Summary) until a Prop asks for its line. Injury risk is then
+# applied to the whole slate at once.
+
+METHODS = ("multiplicative", "power", "shin")
+POWER_ITERATIONS = 12
+SHIN_ITERATIONS = 40
+
+def devig(q_over: np.ndarray, q_under: np.ndarray, method: str = DEVIG_METHOD) -> np.ndarray:
+    # Implied probabilities (1/price) in, fair P(over) out; NaN wherever a side is missing
+    total = q_over + q_under
+    if method == "multiplicative":
+        return q_over / total
+    if method == "power":
+        # q_over**k + q_under**k = 1, Newton from k = 1
+        lo, lu = np.log(q_over), np.log(q_under)
+        k = np.ones_like(q_over)
+        for _ in range(POWER_ITERATIONS):
+            po, pu = np.exp(k * lo), np.exp(k * lu)
+            step = (po + pu - 1) / (po * lo + pu * lu)
+            k = np.clip(k - np.nan_to_num(step), 0.05, 20.0)
+        po, pu = np.exp(k * lo), np.exp(k * lu)
+        return po / (po + pu)
+    if method == "shin":
+        # Shin's insider share z: p_i = (sqrt(z^2 + 4(1-z) q_i^2 / S) - z) / (2(1-z)), sum p_i = 1; bisect on z
+        def shin_p(q, z):
+            return (np.sqrt(z * z + 4 * (1 - z) * q * q / total) - z) / (2 * (1 - z))
+        lo_z, hi_z = np.zeros_like(total), np.full_like(total, 0.5)
+        for _ in range(SHIN_ITERATIONS):
+            z = (lo_z + hi_z) / 2
+            over = shin_p(q_over, z) + shin_p(q_under, z) > 1
+            lo_z, hi_z = np.where(over, z, lo_z), np.where(over, hi_z, z)
+        z = np.where(total > 1, (lo_z + hi_z) / 2, 0.0)
+        po, pu = shin_p(q_over, z), shin_p(q_under, z)
+        return po / (po + pu)
+    raise ValueError(f"Unknown de-vig method: {method} (pick from {', '.join(METHODS)})")
+
+def price(prop: np.ndarray, line: np.ndarray, over: np.ndarray, under: np.ndarray, method: str = DEVIG_METHOD) -> Dict[str, np.ndarray]:
+    # One entry per quote (a book's over/under on one prop at one line, NaN for a side it doesn't quote).
+    # Per quote: its (prop, line) pair and EV of each side; per pair: consensus fair P(over) and books quoting both sides
+    if len(prop) == 0:
+        empty = np.empty(0)
+        return {"pair": np.empty(0, np.int64), "prop": np.empty(0, np.int64), "line": empty, "fair_over": empty,
+                "books": np.empty(0, np.int64), "ev_over": empty, "ev_under": empty}
+    order = np.lexsort((line, prop))
+    p, l = prop[order], line[order]
+    new_pair = np.empty(len(order), bool)
+    new_pair[0] = True
+    new_pair[1:] = (p[1:] != p[:-1]) | (l[1:] != l[:-1])
+    pair = np.empty(len(order), np.int64)
+    pair[order] = np.cumsum(new_pair) - 1
+    n_pairs = int(new_pair.sum())
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fair = devig(1.0 / over, 1.0 / under, method)
+        quoted = ~np.isnan(fair)
+        books = np.bincount(pair, weights=quoted, minlength=n_pairs).astype(np.int64)
+        consensus = np.bincount(pair, weights=np.where(quoted, fair, 0.0), minlength=n_pairs) / books
+    return {
+        "pair": pair, "prop": p[new_pair], "line": l[new_pair], "fair_over": consensus, "books": books,
+        "ev_over": consensus[pair] * over - 1, "ev_under": (1 - consensus[pair]) * under - 1,
+    }
+
+class Summary:
+    # One price() call kept as arrays and flat lists. entry() builds the Prop fields for a single pair on
+    # demand: fair P(over) in percent and each book's EV in percent. A reprice then only pays for dicts on
+    # the lines that get rendered, one per prop of the several each prop is quoted at.
+    # book: each quote's index into books.
+    __slots__ = ("prop", "line", "fair", "books", "quote_start", "book", "ev_over", "ev_under")
+
+    def __init__(self, priced: Dict[str, np.ndarray], book: np.ndarray, books: List[str]):
+        order = np.argsort(priced["pair"], kind="stable")  # quotes grouped by pair
+        n_pairs = len(priced["prop"])
+        self.prop = priced["prop"]
+        self.line = priced["line"].tolist()
+        self.fair = np.round(priced["fair_over"] * 100, 1).tolist()
+        self.books = priced["books"].tolist()
+        self.quote_start = np.searchsorted(priced["pair"][order], np.arange(n_pairs + 1)).tolist()
+        self.book = np.asarray(books, dtype=object)[book[order]].tolist() if len(order) else []
+        self.ev_over = np.round(priced["ev_over"][order] * 100, 2).tolist()
+        self.ev_under = np.round(priced["ev_under"][order] * 100, 2).tolist()
+
+    def prop_ranges(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # (prop, first pair, end pair) per prop: pairs are sorted by (prop, line), so each prop's lines are one run
+        props, first = np.unique(self.prop, return_index=True)
+        return props, first, np.append(first[1:], len(self.prop))
+
+    def entry(self, i: int) -> Optional[Dict]:
+        # None when no book quotes both sides of the pair
+        if not self.books[i]:
+            return None
+        ev = {}
+        for j in range(self.quote_start[i], self.quote_start[i + 1]):
+            # NaN (v != v): the book doesn't quote that side
+            o, u = self.ev_over[j], self.ev_under[j]
+            if o == o:
+                ev[self.book[j]] = {"over": o, "under": u} if u == u else {"over": o}
+            elif u == u:
+                ev[self.book[j]] = {"under": u}
+        return {"fair_prob": self.fair[i], "ev": ev}
+
+def adjust(fair_prob: np.ndarray, risk_score: np.ndarray, weight: float = RISK_WEIGHT) -> np.ndarray:
+    # Injury news scales P(over) down: risk_score 40 at weight 1 keeps 60% of the fair probability
+    return np.round(np.clip(fair_prob * (1 - weight * risk_score / 100), 0, 100), 1)
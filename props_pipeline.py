@@ -0,0 +1,164 @@
+import asyncio
+from functools import partial
+from typing import Callable, List, Dict, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel
+from settings import X_BEARER_TOKEN, X_TIMEOUT, X_MAX_PAGES, ODDS_TTL, TWEETS_TTL, SENTIMENT_BACKEND, SENTIMENT_COLD_TTL, PROP_SPORTS
+from cache import cache
+from budget import odds_budget
+from odds_table import SIDES, iter_outcomes
+from odds_store import OddsStore
+import pricing
+import metrics
+import sentiment
+import upstream
+import xsearch
+
+# Odds + X + sentiment -> Prop list for any sport. Shared by the API routes and the ingestion worker.
+
+SIDE_NAMES = {v: k for k, v in SIDES.items()}
+
+class Prop(BaseModel):
+    event: str  # Odds API event id; a player with two games on the board has a Prop for each
+    player: str
+    prop: str
+    line: float
+    odds: Dict[str, Dict[str, float]]  # book -> {'over': price, 'under': price}
+    adjusted_prob: float  # P(over) in percent: no-vig consensus, scaled down by injury risk
+    risk_score: float
+    tweets: List[Dict]
+    fair_prob: float = 50.0  # no-vig consensus P(over) in percent
+    ev: Dict[str, Dict[str, float]] = {}  # book -> {'over': EV %, 'under': EV %} against fair_prob
+
+async def fetch_odds(sport_key: str, refresh: bool = False) -> Optional[List[Dict]]:
+    cache_key = f"odds:{sport_key}"
+    async def load():
+        # Only due (event, market) pairs are re-fetched; the budget keeps the last prices of the rest
+        return await odds_budget.fetch_sport(sport_key)
+    try:
+        with metrics.span("odds_fetch"):
+            if refresh:
+                # Scheduler path: always plan a fetch, then share the result with readers
+                data = await load()
+                await cache.set(cache_key, data, ttl=ODDS_TTL, stale_ttl=ODDS_TTL)
+                return data
+            # Stale odds are served for one more TTL while a single refresh runs
+            return await cache.get_or_load(cache_key, load, ttl=ODDS_TTL, stale_ttl=ODDS_TTL)
+    except Exception as e:
+        print(f"ERROR: Odds fetch: {e!r}")
+        return None
+
+def summarize(tweets: List[Dict], probs: List[float], scorer: str) -> Dict:
+    # Only tweets that read negative count toward risk
+    sentiments = [{'text': t['text'][:100], 'score': p if p > 0.5 else 0} for t, p in zip(tweets, probs)]
+    risk = sum(s['score'] for s in sentiments) / max(1, len(sentiments))
+    return {'risk_score': round(risk * 100, 1), 'tweets': sentiments, 'scorer': scorer}
+
+async def score_tweets_many(tweets_by_player: Dict[str, List[Dict]]) -> Dict[str, Dict]:
+    # Whole slate in one call so the backend (or the shared worker) sees one big batch
+    flat = [t for tweets in tweets_by_player.values() for t in tweets]
+    probs, scorer = await sentiment.score(flat)
+    out, i = {}, 0
+    for p, tweets in tweets_by_player.items():
+        out[p] = summarize(tweets, probs[i:i + len(tweets)], scorer)
+        i += len(tweets)
+    return out
+
+def no_injury_news() -> Dict:
+    return {"risk_score": 0, "tweets": []}
+
+async def get_injury_tweets_many(players: List[str]):
+    with metrics.span("tweets"):
+        return await _injury_tweets_many(players)
+
+async def _injury_tweets_many(players: List[str]):
+    # Players are packed into as few X queries as fit, batches run concurrently,
+    # and tweets are attributed back per player. Failed/slow batches fall back to no news.
+    players = list(dict.fromkeys(players))
+    if not X_BEARER_TOKEN or not players:
+        return {p: no_injury_news() for p in players}, []
+    cached = await cache.get_many(f"tweets:{p}" for p in players)
+    news = {p: cached[f"tweets:{p}"] for p in players if f"tweets:{p}" in cached}
+    players = [p for p in players if p not in news]
+    if not players:
+        return news, []
+    matcher = xsearch.PlayerMatcher(players)
+    batches = xsearch.plan_batches(players)
+    found, missed_batches = await upstream.fan_out(
+        range(len(batches)), lambda i: xsearch.search_batch(batches[i], matcher),
+        default=lambda i: {}, call_timeout=X_TIMEOUT * X_MAX_PAGES,
+    )
+    tweets_by_player = {p: [] for p in players}
+    for batch in found.values():
+        for p, tweets in batch.items():
+            tweets_by_player[p] = tweets
+    missed = [p for i in missed_batches for p in batches[i]]
+    try:
+        scored = await score_tweets_many(tweets_by_player)
+    except Exception as e:
+        print(f"ERROR: Tweet scoring: {e!r}")
+        return {**news, **{p: no_injury_news() for p in players}}, players
+    keep = {f"tweets:{p}": v for p, v in scored.items() if p not in missed}
+    # Cold-backend scores only live until the real model has had a chance to load
+    await cache.set_many({k: v for k, v in keep.items() if v['scorer'] == SENTIMENT_BACKEND}, ttl=TWEETS_TTL)
+    await cache.set_many({k: v for k, v in keep.items() if v['scorer'] != SENTIMENT_BACKEND}, ttl=SENTIMENT_COLD_TTL)
+    news.update(scored)
+    return news, missed
+
+def normalize(odds_data: Optional[List[Dict]]) -> List[Tuple[str, str, str, float, Dict[str, Dict[str, float]]]]:
+    # One row per (event, player, market) across every book: the line most books quote,
+    # with each of those books' over/under prices. Books missing a side are skipped.
+    quotes: Dict[Tuple[str, str, str], Dict[float, Dict[str, Dict[str, float]]]] = {}
+    for event, book, market, player, line, side, price in iter_outcomes(odds_data):
+        quotes.setdefault((event, player, market), {}).setdefault(line, {}).setdefault(book, {})[SIDE_NAMES[side]] = price
+    rows = []
+    for (event, player, market), by_line in quotes.items():
+        books = {line: {b: sides for b, sides in quoted.items() if len(sides) == 2} for line, quoted in by_line.items()}
+        line = max(books, key=lambda l: len(books[l]))  # ties keep the first line seen
+        if books[line]:
+            rows.append((event, player, market, line, books[line]))
+    return rows
+
+FairLookup = Callable[[Tuple[str, str, str], float], Optional[Dict]]
+
+def _normalize_and_price(odds_data: List[Dict], fair: Optional[FairLookup]):
+    if fair is None:
+        store = OddsStore("adhoc")
+        store.reprice(store.update(odds_data).props())
+        fair = store.fair_entry
+    return normalize(odds_data), fair
+
+async def build_props(sport_key: str, odds_data: Optional[List[Dict]] = None, reuse: Optional[Dict[Tuple[str, str, str], Dict]] = None,
+                      fair: Optional[FairLookup] = None) -> Optional[Dict]:
+    # reuse: (event, player, prop) -> Prop dict from the previous snapshot; kept as-is when its odds didn't move
+    # fair: ((event, player, market), line) -> {"fair_prob", "ev"} (OddsStore.fair_entry); priced here when not given
+    odds_data = odds_data if odds_data is not None else await fetch_odds(sport_key)
+    if not odds_data:
+        return None
+    # Whole slate, off the event loop: a college night is dozens of games
+    rows, fair = await asyncio.to_thread(_normalize_and_price, odds_data, fair)
+    reuse = reuse or {}
+    unchanged = {row[:3] for row in rows if _same_prop(reuse.get(row[:3]), row)}
+    fresh = [row for row in rows if row[:3] not in unchanged]
+    news, missed = await get_injury_tweets_many([row[1] for row in fresh])
+    if missed:
+        print(f"WARN: Partial {sport_key} props, no tweet data for {len(missed)} players")
+    priced = [fair(row[:3], row[3]) or {"fair_prob": 50.0, "ev": {}} for row in fresh]
+    adjusted = pricing.adjust(np.array([p["fair_prob"] for p in priced]),
+                              np.array([news[row[1]]['risk_score'] for row in fresh], dtype=float)).tolist()
+    built = {}
+    for (event, player_name, market_key, line, odds), p, adj in zip(fresh, priced, adjusted):
+        tweets = news[player_name]
+        built[(event, player_name, market_key)] = Prop(
+            event=event, player=player_name, prop=market_key, line=line, odds=odds, adjusted_prob=adj, risk_score=tweets['risk_score'],
+            tweets=tweets['tweets'], fair_prob=p["fair_prob"], ev=p["ev"],
+        ).model_dump()
+    props = [reuse[row[:3]] if row[:3] in unchanged else built[row[:3]] for row in rows]
+    return {"props": props, "missed": len(missed)}
+
+def _same_prop(prev: Optional[Dict], row) -> bool:
+    _, _, _, line, odds = row
+    return prev is not None and prev['line'] == line and prev['odds'] == odds
+
+# route name -> (Odds API sport key, builder); PROP_SPORTS adds more, e.g. wnba=basketball_wnba
+SPORTS = {name: (sport_key, partial(build_props, sport_key)) for name, sport_key in PROP_SPORTS.items()}
@@ -0,0 +1,100 @@
+import base64
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import orjson
+from props_pipeline import Prop
+from settings import PROPS_PAGE_CACHE
+
+# Pre-serialized /{sport}/props pages. A snapshot's props are encoded once per field
+# projection and pages are joined from those bytes, each with a content-hash ETag.
+# Hot requests are a dict lookup (or a 304) with no model validation or JSON encoding.
+
+FIELDS = tuple(Prop.model_fields)
+KEY_FIELDS = ("event", "player", "prop")  # always sent; clients index on them
+
+class Page:
+    __slots__ = ("body", "etag", "next_cursor", "total")
+
+    def __init__(self, body: bytes, next_cursor: Optional[str], total: int):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.next_cursor = next_cursor
+        self.total = total
+
+def parse_fields(spec: Optional[str]) -> Tuple[str, ...]:
+    if not spec:
+        return FIELDS
+    wanted = {f.strip() for f in spec.split(",") if f.strip()}
+    unknown = wanted - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(f for f in FIELDS if f in wanted or f in KEY_FIELDS)
+
+class StaleCursor(ValueError):
+    # The cursor pages a snapshot that has since been replaced; paging restarts from the top
+    pass
+
+def make_cursor(version: int, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode().rstrip("=")
+
+def parse_cursor(cursor: Optional[str]) -> Tuple[Optional[int], int]:
+    # Opaque to clients: the snapshot version being paged and the offset of the next prop in it
+    if not cursor:
+        return None, 0
+    try:
+        version, offset = map(int, base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(":"))
+    except ValueError:
+        raise ValueError(f"Bad cursor: {cursor}")
+    if offset < 0:
+        raise ValueError(f"Bad cursor: {cursor}")
+    return version, offset
+
+def not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Weak comparison (RFC 9110 13.1.2): W/"x" matches "x"
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+class PropPages:
+    def __init__(self, max_pages: int = PROPS_PAGE_CACHE):
+        self.max_pages = max_pages
+        self._encoded: Dict[Tuple[str, int, Tuple[str, ...]], List[bytes]] = {}
+        self._pages: "OrderedDict[Tuple, Page]" = OrderedDict()
+
+    def page(self, snap: Dict, fields: Tuple[str, ...], cursor: Tuple[Optional[int], int], limit: int) -> Page:
+        # Only the snapshot a cursor was issued for can be paged on; there is one snapshot per sport
+        version, offset = cursor
+        if version is not None and version != snap["version"]:
+            raise StaleCursor(f"Snapshot v{version} was replaced by v{snap['version']}; restart without a cursor")
+        key = (snap["sport"], snap["version"], fields, offset, limit)
+        page = self._pages.get(key)
+        if page is not None:
+            self._pages.move_to_end(key)
+            return page
+        items = self._items(snap, fields)
+        end = offset + limit
+        page = Page(b"[" + b",".join(items[offset:end]) + b"]", make_cursor(snap["version"], end) if end < len(items) else None, len(items))
+        self._pages[key] = page
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return page
+
+    def _items(self, snap: Dict, fields: Tuple[str, ...]) -> List[bytes]:
+        sport, version = snap["sport"], snap["version"]
+        key = (sport, version, fields)
+        items = self._encoded.get(key)
+        if items is None:
+            # Only the latest version of a sport is worth keeping
+            for old in [k for k in self._encoded if k[0] == sport and k[1] != version]:
+                del self._encoded[old]
+            props = snap["props"]
+            if fields == FIELDS:
+                items = [orjson.dumps(p) for p in props]
+            else:
+                items = [orjson.dumps({f: p.get(f) for f in fields}) for p in props]  # older snapshots lack newer fields
+            self._encoded[key] = items
+        return items
+
+prop_pages = PropPages()
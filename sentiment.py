@@ -0,0 +1,272 @@
+import asyncio
+import hashlib
+import math
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from settings import SENTIMENT_BACKEND, SENTIMENT_COLD_BACKEND, SENTIMENT_MODEL, SENTIMENT_ONNX_DIR, SENTIMENT_WORKER, SENTIMENT_SCORE_TTL, SENTIMENT_SCORE_LRU
+from cache import TwoTierCache, r
+import metrics
+
+# Pluggable tweet sentiment. Every backend maps texts -> P(negative). Heavy
+# libraries (transformers/torch, onnxruntime) are imported in load(), never at
+# module import, so the API process starts without them. Until the configured
+# backend has loaded, scorer() hands out the cold backend (lexicon by default)
+# and loads the real one on a background thread. Scores are cached per tweet, so
+# a tweet is only ever run through a model once.
+
+MAX_TOKENS = 128  # tweets are short; truncating keeps the batches small
+BATCH_SIZE = 32
+RETRY_LOAD = 60.0  # a backend that failed to load (or a worker that went away) is retried after this
+
+# Own L1 so a slate's worth of tweet scores doesn't evict odds/tweet entries; L2 is shared via Redis
+score_cache = TwoTierCache(r, max_items=SENTIMENT_SCORE_LRU)
+
+class Backend:
+    name = "base"
+    cacheable = True  # worth a cache round trip per tweet
+
+    def __init__(self):
+        self.loaded = False
+
+    def load(self):
+        self.loaded = True
+
+    def score(self, texts: List[str]) -> List[float]:
+        raise NotImplementedError
+
+    async def ascore(self, texts: List[str]) -> List[float]:
+        # Inference is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(self.score, texts)
+
+class HFBackend(Backend):
+    # transformers pipeline (PyTorch), the original scorer
+    name = "hf"
+
+    def __init__(self, model: str = SENTIMENT_MODEL):
+        super().__init__()
+        self.model = model
+        self._pipe = None
+
+    def load(self):
+        if self._pipe is None:
+            from transformers import pipeline
+            self._pipe = pipeline("sentiment-analysis", model=self.model)
+        self.loaded = True
+
+    def score(self, texts: List[str]) -> List[float]:
+        self.load()
+        out = self._pipe(list(texts), truncation=True, max_length=MAX_TOKENS, batch_size=BATCH_SIZE)
+        return [o['score'] if o['label'] == 'NEGATIVE' else 1.0 - o['score'] for o in out]
+
+class OnnxBackend(Backend):
+    # Same model exported to ONNX (int8-quantized when available) on onnxruntime's CPU provider;
+    # needs only onnxruntime + tokenizers, no torch. Build the model dir with `python sentiment.py export DIR`.
+    name = "onnx"
+
+    def __init__(self, model_dir: str = SENTIMENT_ONNX_DIR):
+        super().__init__()
+        self.model_dir = model_dir
+        self._session = None
+
+    def load(self):
+        if self._session is not None:
+            return
+        import json
+        import numpy as np
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        path = os.path.join(self.model_dir, "model_quantized.onnx")
+        if not os.path.exists(path):
+            path = os.path.join(self.model_dir, "model.onnx")
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self._session.get_inputs()}
+        self._tok = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+        self._tok.enable_truncation(MAX_TOKENS)
+        self._tok.enable_padding()
+        with open(os.path.join(self.model_dir, "config.json")) as f:
+            labels = json.load(f).get("id2label", {"0": "NEGATIVE", "1": "POSITIVE"})
+        self._neg = next(int(i) for i, label in labels.items() if label.upper() == "NEGATIVE")
+        self._np = np
+        self.loaded = True
+
+    def score(self, texts: List[str]) -> List[float]:
+        self.load()
+        np = self._np
+        out: List[float] = []
+        for start in range(0, len(texts), BATCH_SIZE):
+            enc = self._tok.encode_batch(list(texts[start:start + BATCH_SIZE]))
+            feeds = {
+                "input_ids": np.array([e.ids for e in enc], np.int64),
+                "attention_mask": np.array([e.attention_mask for e in enc], np.int64),
+                "token_type_ids": np.array([e.type_ids for e in enc], np.int64),
+            }
+            logits = self._session.run(None, {k: v for k, v in feeds.items() if k in self._inputs})[0]
+            logits = logits - logits.max(axis=1, keepdims=True)
+            probs = np.exp(logits)
+            out.extend((probs[:, self._neg] / probs.sum(axis=1)).tolist())
+        return out
+
+# Availability language from beat writers. Weight > 0 reads as bad news, < 0 as good news.
+LEXICON: Dict[str, float] = {
+    "ruled out": 2.0, "out for": 2.0, "will not play": 2.0, "won't play": 2.0, "will miss": 2.0, "is out": 2.0,
+    "season-ending": 2.5, "torn": 2.5, "tear": 1.5, "fracture": 2.0, "surgery": 2.0, "concussion": 2.0,
+    "sidelined": 1.5, "doubtful": 1.5, "dnp": 1.5, "setback": 1.5, "mri": 1.0, "sprain": 1.0, "sprained": 1.0,
+    "strain": 1.0, "injury": 1.0, "injured": 1.0, "soreness": 0.8, "sore": 0.8, "illness": 1.0, "questionable": 0.8,
+    "day-to-day": 0.8, "game-time decision": 0.8, "limited": 0.5, "rest": 0.5, "load management": 0.8, "miss": 1.0,
+    "cleared": -1.5, "will play": -2.0, "expected to play": -1.5, "available": -1.0, "probable": -1.0,
+    "upgraded": -1.0, "good to go": -1.5, "returns": -1.0, "return": -0.5, "full practice": -1.5, "no limitations": -1.5,
+}
+
+class LexiconBackend(Backend):
+    # Zero-dependency keyword scorer; microseconds per tweet, used while a model loads
+    name = "lexicon"
+    cacheable = False
+
+    def __init__(self, lexicon: Dict[str, float] = LEXICON):
+        super().__init__()
+        self.lexicon = lexicon
+        terms = sorted(lexicon, key=len, reverse=True)  # longest phrase wins
+        self._pattern = re.compile(r"(?<![\w-])(?:" + "|".join(re.escape(t) for t in terms) + r")(?![\w-])", re.IGNORECASE)
+        self.loaded = True
+
+    def score(self, texts: List[str]) -> List[float]:
+        out = []
+        for text in texts:
+            total = sum(self.lexicon[m.lower()] for m in self._pattern.findall(text))
+            out.append(1.0 / (1.0 + math.exp(-1.5 * (total - 0.5))))  # no terms -> ~0.32, one strong term -> ~0.9
+        return out
+
+class RemoteBackend(Backend):
+    # Shared inference worker (`python inference.py serve`): one model for every API
+    # process, with texts from concurrent requests micro-batched together
+    name = "remote"
+
+    def __init__(self, address: str = SENTIMENT_WORKER):
+        super().__init__()
+        self.address = address
+        self._client = None
+
+    def load(self):
+        import inference
+        client = inference.WorkerClient(self.address)
+        client.ping()
+        self._client = client
+        self.loaded = True
+
+    def score(self, texts: List[str]) -> List[float]:
+        self.load()
+        return self._client.score_blocking(texts)
+
+    async def ascore(self, texts: List[str]) -> List[float]:
+        return await self._client.score(texts)
+
+BACKENDS = {"hf": HFBackend, "onnx": OnnxBackend, "lexicon": LexiconBackend, "remote": RemoteBackend}
+
+_instances: Dict[str, Backend] = {}
+_failed: Dict[str, float] = {}  # name -> when it failed
+_loading: Dict[str, threading.Thread] = {}
+_lock = threading.Lock()
+
+def get_backend(name: str = SENTIMENT_BACKEND) -> Backend:
+    with _lock:
+        backend = _instances.get(name)
+        if backend is None:
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown sentiment backend: {name}")
+            backend = _instances[name] = BACKENDS[name]()
+        return backend
+
+def failed(name: str) -> bool:
+    return time.time() - _failed.get(name, -RETRY_LOAD) < RETRY_LOAD
+
+def _fail(name: str, e: Exception):
+    print(f"ERROR: Sentiment backend {name} failed, using lexicon: {e!r}")
+    get_backend(name).loaded = False
+    _failed[name] = time.time()
+
+def _load(name: str):
+    try:
+        get_backend(name).load()
+        _failed.pop(name, None)
+        print(f"DEBUG: Sentiment backend {name} loaded")
+    except Exception as e:
+        _fail(name, e)
+    finally:
+        _loading.pop(name, None)
+
+def warm(name: str = SENTIMENT_BACKEND):
+    # Start loading in the background; safe to call repeatedly
+    if get_backend(name).loaded or failed(name):
+        return
+    with _lock:
+        if name in _loading:
+            return
+        thread = _loading[name] = threading.Thread(target=_load, args=(name,), daemon=True)
+    thread.start()
+
+def preload(name: str = SENTIMENT_BACKEND):
+    # Blocking load, for one-shot jobs that would otherwise only ever see the cold scorer
+    if not get_backend(name).loaded and not failed(name):
+        _load(name)
+
+def scorer(name: str = SENTIMENT_BACKEND, cold: Optional[str] = SENTIMENT_COLD_BACKEND) -> Backend:
+    if failed(name):
+        return get_backend("lexicon")
+    backend = get_backend(name)
+    if backend.loaded:
+        return backend
+    if cold and cold != name:
+        warm(name)
+        return get_backend(cold)
+    _load(name)  # no cold fallback configured: load inline
+    return get_backend("lexicon") if failed(name) else backend
+
+def tweet_key(tweet: Dict) -> str:
+    return tweet.get('id') or hashlib.blake2b(tweet['text'].encode(), digest_size=12).hexdigest()
+
+async def _infer(backend: Backend, texts: List[str]) -> List[float]:
+    with metrics.span("inference"):
+        probs = await backend.ascore(texts)
+    metrics.TWEETS_SCORED.inc(backend.name, amount=len(texts))
+    return probs
+
+async def score(tweets: List[Dict]) -> Tuple[List[float], str]:
+    # P(negative) per tweet and the backend that produced it; cached scores are never recomputed
+    backend = scorer()
+    if not tweets:
+        return [], backend.name
+    if not backend.cacheable:
+        return await _infer(backend, [t['text'] for t in tweets]), backend.name
+    keys = [f"sent:{backend.name}:{tweet_key(t)}" for t in tweets]
+    known = await score_cache.get_many(keys)
+    todo = {k: t['text'] for k, t in zip(keys, tweets) if k not in known}
+    if todo:
+        try:
+            fresh = dict(zip(todo, await _infer(backend, list(todo.values()))))
+        except Exception as e:
+            _fail(backend.name, e)
+            return await _infer(get_backend("lexicon"), [t['text'] for t in tweets]), "lexicon"
+        await score_cache.set_many(fresh, ttl=SENTIMENT_SCORE_TTL)
+        known.update(fresh)
+    return [known[k] for k in keys], backend.name
+
+def export_onnx(out_dir: str, model: str = SENTIMENT_MODEL):
+    # One-off, off the request path: needs optimum[onnxruntime]
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoTokenizer
+    ORTModelForSequenceClassification.from_pretrained(model, export=True).save_pretrained(out_dir)
+    AutoTokenizer.from_pretrained(model).save_pretrained(out_dir)
+    quantize_dynamic(os.path.join(out_dir, "model.onnx"), os.path.join(out_dir, "model_quantized.onnx"), weight_type=QuantType.QInt8)
+    print(f"DEBUG: Exported {model} to {out_dir}")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "export":
+        sys.exit("usage: python sentiment.py export OUT_DIR")
+    export_onnx(sys.argv[2])
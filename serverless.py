@@ -0,0 +1,229 @@
+import asyncio
+import base64
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+# Serverless entry points that call the ASGI app directly. One event loop per
+# container runs on a background thread and the app's lifespan starts on it once,
+# so HTTP pools, the Redis client, the sentiment model and snapshots survive across
+# warm invocations. Response bodies are handed on chunk by chunk as the app sends them.
+#   make_http_handler(adapter)  BaseHTTPRequestHandler class (Vercel Python runtime), streams
+#   adapter(event, context)     API Gateway v1/v2 proxy event -> proxy response dict
+
+TEXT_TYPES = ("text/", "application/json", "application/javascript", "application/xml")
+_END = object()
+
+class ServerlessAdapter:
+    def __init__(self, app):
+        self.app = app
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        if self._loop is not None:
+            return self._loop
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="asgi-loop", daemon=True).start()
+                asyncio.run_coroutine_threadsafe(self._lifespan_startup(), loop).result()
+                self._loop = loop
+        return self._loop
+
+    async def _lifespan_startup(self):
+        # Startup only: a container is frozen or killed, never shut down cleanly
+        started = asyncio.get_running_loop().create_future()
+        sent_startup = False
+
+        async def receive():
+            nonlocal sent_startup
+            if not sent_startup:
+                sent_startup = True
+                return {"type": "lifespan.startup"}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "lifespan.startup.complete" and not started.done():
+                started.set_result(None)
+            elif message["type"] == "lifespan.startup.failed" and not started.done():
+                started.set_exception(RuntimeError(message.get("message", "lifespan startup failed")))
+
+        async def run():
+            try:
+                await self.app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, receive, send)
+            except Exception as e:
+                if not started.done():
+                    print(f"WARN: App has no lifespan support: {e!r}")
+                    started.set_result(None)
+
+        self._lifespan = asyncio.create_task(run())
+        await started
+
+    def stream(self, scope: Dict, body: bytes) -> Tuple[int, List[Tuple[bytes, bytes]], Iterator[bytes], Callable[[], None]]:
+        # Runs the request on the container loop; returns status, headers, a chunk iterator
+        # and an abort() to call if the client goes away so the app stops producing.
+        loop = self._ensure_started()
+        chunks: "queue.Queue" = queue.Queue()
+        gone = threading.Event()
+        disconnected = asyncio.Event()
+
+        async def receive():
+            nonlocal body
+            if body is not None:
+                msg, body = {"type": "http.request", "body": body, "more_body": False}, None
+                return msg
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if gone.is_set():
+                disconnected.set()
+                raise ConnectionError("client disconnected")
+            if message["type"] == "http.response.start":
+                chunks.put((message["status"], message.get("headers", [])))
+            elif message["type"] == "http.response.body":
+                if message.get("body"):
+                    chunks.put(message["body"])
+                if not message.get("more_body"):
+                    chunks.put(_END)
+
+        async def run():
+            try:
+                await self.app(scope, receive, send)
+            except Exception as e:
+                print(f"ERROR: ASGI app raised: {e!r}")
+                chunks.put((500, [(b"content-type", b"text/plain")]))
+                chunks.put(b"Internal Server Error")
+            finally:
+                chunks.put(_END)
+
+        def abort():
+            gone.set()
+            loop.call_soon_threadsafe(disconnected.set)
+
+        asyncio.run_coroutine_threadsafe(run(), loop)
+        start = chunks.get()
+        while isinstance(start, bytes):  # body before start (broken app); drop it
+            start = chunks.get()
+        if start is _END:
+            start = (500, [])
+
+        def body_iter():
+            while True:
+                chunk = chunks.get()
+                if chunk is _END:
+                    return
+                if isinstance(chunk, bytes):
+                    yield chunk
+
+        return start[0], start[1], body_iter(), abort
+
+    # -- API Gateway / Lambda --
+    async def _buffered(self, scope: Dict, body: bytes) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+        # The proxy integration needs the whole body anyway: collect it on the loop, one thread hop per call
+        start: List = [500, []]
+        parts: List[bytes] = []
+
+        async def receive():
+            nonlocal body
+            if body is not None:
+                msg, body = {"type": "http.request", "body": body, "more_body": False}, None
+                return msg
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                start[0], start[1] = message["status"], message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                parts.append(message.get("body", b""))
+
+        try:
+            await self.app(scope, receive, send)
+        except Exception as e:
+            print(f"ERROR: ASGI app raised: {e!r}")
+            return 500, [(b"content-type", b"text/plain")], b"Internal Server Error"
+        return start[0], start[1], b"".join(parts)
+
+    def __call__(self, event: Dict, context=None) -> Dict:
+        scope, body = scope_from_event(event)
+        status, headers, data = asyncio.run_coroutine_threadsafe(self._buffered(scope, body), self._ensure_started()).result()
+        out: Dict[str, List[str]] = {}
+        for k, v in headers:
+            out.setdefault(k.decode("latin-1").lower(), []).append(v.decode("latin-1"))
+        ctype = out.get("content-type", [""])[0]
+        binary = bool(data) and not ctype.startswith(TEXT_TYPES)
+        return {
+            "statusCode": status,
+            "headers": {k: ", ".join(v) for k, v in out.items() if k != "set-cookie"},
+            "multiValueHeaders": {"set-cookie": out["set-cookie"]} if "set-cookie" in out else {},
+            "body": base64.b64encode(data).decode() if binary else data.decode("utf-8", "replace"),
+            "isBase64Encoded": binary,
+        }
+
+def _scope(method: str, path: str, query: bytes, headers: List[Tuple[bytes, bytes]], client: Tuple[str, int]) -> Dict:
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method.upper(), "scheme": "https", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": query, "headers": headers,
+        "client": client, "server": ("serverless", 443),
+    }
+
+def scope_from_event(event: Dict) -> Tuple[Dict, bytes]:
+    ctx = event.get("requestContext") or {}
+    if "http" in ctx:  # API Gateway v2 / function URLs
+        method, path = ctx["http"]["method"], event.get("rawPath", "/")
+        query = (event.get("rawQueryString") or "").encode()
+        source = ctx["http"].get("sourceIp", "")
+    else:  # v1 REST proxy
+        method, path = event.get("httpMethod", "GET"), event.get("path", "/")
+        multi = event.get("multiValueQueryStringParameters")
+        query = urlencode(multi or event.get("queryStringParameters") or {}, doseq=bool(multi)).encode()
+        source = (ctx.get("identity") or {}).get("sourceIp", "")
+    headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (event.get("headers") or {}).items()]
+    if event.get("cookies"):
+        headers.append((b"cookie", "; ".join(event["cookies"]).encode("latin-1")))
+    body = event.get("body") or b""
+    if isinstance(body, str):
+        body = base64.b64decode(body) if event.get("isBase64Encoded") else body.encode()
+    return _scope(method, path, query, headers, (source, 0)), body
+
+def make_http_handler(adapter: ServerlessAdapter):
+    class handler(BaseHTTPRequestHandler):
+        # Keep-alive HTTP/1.1; bodies without a content-length go out chunked, as the app produces them
+        protocol_version = "HTTP/1.1"
+
+        def _dispatch(self):
+            path, _, query = self.path.partition("?")
+            length = int(self.headers.get("content-length") or 0)
+            body = self.rfile.read(length) if length else b""
+            headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in self.headers.items()]
+            scope = _scope(self.command, path, query.encode(), headers, self.client_address[:2])
+            status, resp_headers, chunks, abort = adapter.stream(scope, body)
+            self.send_response(status)
+            sized = False
+            for k, v in resp_headers:
+                sized = sized or k.lower() == b"content-length"
+                self.send_header(k.decode("latin-1"), v.decode("latin-1"))
+            chunked = not sized and self.command != "HEAD" and status not in (204, 304)
+            if chunked:
+                self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for chunk in chunks:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk) if chunked else chunk)
+                    self.wfile.flush()
+                if chunked:
+                    self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                abort()
+                self.close_connection = True
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = do_OPTIONS = _dispatch
+
+        def log_message(self, *args):
+            pass
+
+    return handler
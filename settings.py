@@ -0,0 +1,85 @@
+import os
+from dotenv import load_dotenv
+
+# Shared env config (main.py, workers and benchmarks all read from here)
+load_dotenv()
+
+ODDS_API_KEY = os.getenv("ODDS_API_KEY")
+X_BEARER_TOKEN = os.getenv("X_BEARER_TOKEN")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+BASE_URL = os.getenv("ODDS_API_URL", "https://api.the-odds-api.com/v4")
+X_API_URL = os.getenv("X_API_URL", "https://api.twitter.com/2")
+
+# Upstream HTTP tuning (seconds / counts)
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3))
+ODDS_TIMEOUT = float(os.getenv("ODDS_TIMEOUT", 10))
+X_TIMEOUT = float(os.getenv("X_TIMEOUT", 4))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+HTTP_KEEPALIVE = int(os.getenv("HTTP_KEEPALIVE", 10))
+TWEET_CONCURRENCY = int(os.getenv("TWEET_CONCURRENCY", 8))
+REQUEST_BUDGET = float(os.getenv("REQUEST_BUDGET", 8))
+X_QUERY_MAX_LEN = int(os.getenv("X_QUERY_MAX_LEN", 512))
+X_MAX_PAGES = int(os.getenv("X_MAX_PAGES", 3))
+
+# Cache tuning
+CACHE_MAX_ITEMS = int(os.getenv("CACHE_MAX_ITEMS", 512))
+ODDS_TTL = int(os.getenv("ODDS_TTL", 300))
+TWEETS_TTL = int(os.getenv("TWEETS_TTL", 600))
+PROPS_TTL = int(os.getenv("PROPS_TTL", 120))
+PROPS_PAGE_MAX = int(os.getenv("PROPS_PAGE_MAX", 500))  # largest `limit` on /{sport}/props
+PROPS_PAGE_CACHE = int(os.getenv("PROPS_PAGE_CACHE", 256))  # pre-serialized pages kept
+
+# Sports served at /{sport}/props: route name=Odds API sport key
+PROP_SPORTS = dict(p.split("=", 1) for p in os.getenv("PROP_SPORTS", "nba=basketball_nba,ncaab=basketball_ncaab").split(",") if "=" in p)
+
+# Ingestion worker
+INGEST_ENABLED = os.getenv("INGEST_ENABLED", "1") == "1"
+INGEST_SPORTS = [s for s in os.getenv("INGEST_SPORTS", "nba,ncaab").split(",") if s]
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv("SNAPSHOT_CHECK_INTERVAL", 1))
+
+# Pricing (pricing.py): de-vig method (multiplicative, power, shin) and how hard injury risk cuts P(over)
+DEVIG_METHOD = os.getenv("DEVIG_METHOD", "multiplicative")
+RISK_WEIGHT = float(os.getenv("RISK_WEIGHT", 1))
+
+# Odds history (history.py): append-only segments under HISTORY_DIR, flushed every interval or N rows
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "1") == "1"
+HISTORY_DIR = os.getenv("HISTORY_DIR", "data/history")
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", 300))
+HISTORY_FLUSH_ROWS = int(os.getenv("HISTORY_FLUSH_ROWS", 50000))
+
+# Odds API credit budget
+ODDS_REGIONS = os.getenv("ODDS_REGIONS", "us")
+ODDS_MARKETS = [m for m in os.getenv("ODDS_MARKETS", "player_points,player_rebounds,player_assists").split(",") if m]
+ODDS_MONTHLY_CREDITS = int(os.getenv("ODDS_MONTHLY_CREDITS", 20000))
+ODDS_CREDIT_RESERVE = int(os.getenv("ODDS_CREDIT_RESERVE", 200))
+
+# Tweet sentiment: hf (transformers), onnx (onnxruntime, see sentiment.py export) or lexicon.
+# The cold backend answers while the configured one loads; "" makes the first request wait instead.
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "hf")
+SENTIMENT_COLD_BACKEND = os.getenv("SENTIMENT_COLD_BACKEND", "lexicon")
+SENTIMENT_MODEL = os.getenv("SENTIMENT_MODEL", "distilbert-base-uncased-finetuned-sst-2-english")
+SENTIMENT_ONNX_DIR = os.getenv("SENTIMENT_ONNX_DIR", "models/sentiment-onnx")
+SENTIMENT_COLD_TTL = int(os.getenv("SENTIMENT_COLD_TTL", 60))  # cache lifetime for cold-scored tweets
+SENTIMENT_SCORE_TTL = int(os.getenv("SENTIMENT_SCORE_TTL", 86400))  # per-tweet scores; a tweet's text never changes
+SENTIMENT_SCORE_LRU = int(os.getenv("SENTIMENT_SCORE_LRU", 20000))
+
+# Shared inference worker (SENTIMENT_BACKEND=remote): unix:/path or host:port
+SENTIMENT_WORKER = os.getenv("SENTIMENT_WORKER", "unix:/tmp/proppulse-sentiment.sock")
+SENTIMENT_WORKER_BACKEND = os.getenv("SENTIMENT_WORKER_BACKEND", "hf")
+SENTIMENT_MAX_BATCH = int(os.getenv("SENTIMENT_MAX_BATCH", 32))
+SENTIMENT_MAX_WAIT_MS = float(os.getenv("SENTIMENT_MAX_WAIT_MS", 10))
+SENTIMENT_TIMEOUT = float(os.getenv("SENTIMENT_TIMEOUT", 5))
+
+# Alerts (alerts.py): batched Discord webhook delivery and snapshot rules
+DISCORD_WEBHOOK = os.getenv("DISCORD_WEBHOOK")
+ALERT_WINDOW = float(os.getenv("ALERT_WINDOW", 2))  # seconds to coalesce a burst into one message
+ALERT_POLL = float(os.getenv("ALERT_POLL", 5))  # how often the Redis queue is checked when idle
+ALERT_BATCH_MAX = int(os.getenv("ALERT_BATCH_MAX", 25))
+ALERT_DEDUP_TTL = int(os.getenv("ALERT_DEDUP_TTL", 3600))  # same (player, prop, line) is sent once per TTL
+ALERT_MAX_RETRIES = int(os.getenv("ALERT_MAX_RETRIES", 4))
+ALERT_RISK_JUMP = float(os.getenv("ALERT_RISK_JUMP", 15))  # risk_score points between snapshots
+ALERT_LINE_MOVE = float(os.getenv("ALERT_LINE_MOVE", 1))
+
+# Observability: /metrics (Prometheus text) and `X-Profile: <PROFILE_TOKEN or 1>` -> Server-Timing header
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
@@ -0,0 +1,185 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Dict, Optional, Set
+import orjson
+from fastapi import Request, WebSocket, WebSocketDisconnect
+from cache import r
+
+# Server push for dashboards. Each ingest publishes one delta (changed props,
+# removed props, new arbs/middles); it is encoded once and the same bytes are
+# handed to every subscriber queue. With Redis the delta goes through pub/sub so
+# API processes that don't ingest still see it.
+
+QUEUE_SIZE = 32  # a subscriber this far behind is dropped and resyncs on reconnect
+HEARTBEAT = 15.0
+PING = b": ping\n\n"
+
+class Message:
+    __slots__ = ("sport", "version", "json", "sse")
+
+    def __init__(self, sport: str, version: int, body: bytes, kind: str = "delta"):
+        self.sport, self.version, self.json = sport, version, body
+        self.sse = b"event: " + kind.encode() + b"\nid: " + str(version).encode() + b"\ndata: " + body + b"\n\n"
+
+def _prop_key(p: Dict):
+    return (p.get("event"), p["player"], p["prop"])
+
+def _opp_key(o: Dict):
+    return (o["event"], o["player"], o["market"], o.get("line"), orjson.dumps(o["over"]), orjson.dumps(o["under"]))
+
+def snapshot_delta(prev: Optional[Dict], snap: Dict) -> Dict:
+    # What a dashboard holding `prev` needs to become `snap`. Sent even when nothing it shows changed, so
+    # versions reach clients without gaps and a delta whose prev_version isn't theirs means one was missed
+    old_props = {_prop_key(p): p for p in (prev or {}).get("props", [])}
+    new_props = {_prop_key(p): p for p in snap.get("props", [])}
+    changed = [p for k, p in new_props.items() if old_props.get(k) != p]
+    removed = [list(k) for k in old_props if k not in new_props]
+    old_opps = (prev or {}).get("arbs") or {}
+    new_opps = snap.get("arbs") or {}
+    fresh = {}
+    for kind in ("arbs", "middles"):
+        seen = {_opp_key(o) for o in old_opps.get(kind, [])}
+        fresh[kind] = [o for o in new_opps.get(kind, []) if _opp_key(o) not in seen]
+    return {
+        "sport": snap["sport"], "version": snap["version"], "prev_version": (prev or {}).get("version", 0),
+        "props": changed, "removed": removed, "arbs": fresh["arbs"], "middles": fresh["middles"],
+    }
+
+def resync_marker(prev: Optional[Dict], snap: Dict) -> Dict:
+    # Sent instead of a delta when `prev` isn't the snapshot right before `snap` (first publish of this
+    # process, or another process published in between): a diff against it would be wrong, clients refetch
+    return {
+        "sport": snap["sport"], "version": snap["version"], "prev_version": (prev or {}).get("version", 0), "resync": True,
+        "props": [], "removed": [], "arbs": [], "middles": [],
+    }
+
+class Broadcaster:
+    def __init__(self, redis_client):
+        self.r = redis_client
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pubsub = None
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, sport: str) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.subscribers.setdefault(sport, set()).add(q)
+        return q
+
+    def unsubscribe(self, sport: str, q: asyncio.Queue):
+        self.subscribers.get(sport, set()).discard(q)
+
+    def _deliver(self, msg: Message):
+        for q in list(self.subscribers.get(msg.sport, ())):
+            try:
+                q.put_nowait(msg)
+            except asyncio.QueueFull:
+                # Too slow: cut it loose rather than buffer unboundedly; the client resyncs
+                self.unsubscribe(msg.sport, q)
+                q.get_nowait()
+                q.put_nowait(None)  # tells its stream loop to close
+
+    async def publish(self, delta: Dict):
+        body = orjson.dumps(delta)
+        if self.r is not None:
+            # Always through Redis: a standalone ingest worker has no relay but API processes listen
+            try:
+                await asyncio.to_thread(self.r.publish, f"pp:stream:{delta['sport']}", body)
+                if self._thread is not None:
+                    return  # our own listener delivers it, same as every other process
+            except Exception as e:
+                print(f"WARN: Stream publish via Redis failed, local only: {e!r}")
+        self._deliver(Message(delta["sport"], delta["version"], body))
+
+    def start(self):
+        # Relay Redis pub/sub into this process's event loop
+        if self.r is None or self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        try:
+            self._pubsub = self.r.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.psubscribe("pp:stream:*")
+        except Exception as e:
+            print(f"WARN: Stream relay disabled: {e!r}")
+            self._pubsub = None
+            return
+        self._thread = threading.Thread(target=self._relay, daemon=True)
+        self._thread.start()
+
+    def _relay(self):
+        while self._pubsub is not None:
+            try:
+                item = self._pubsub.get_message(timeout=1.0)
+            except Exception as e:
+                print(f"WARN: Stream relay error: {e!r}")
+                item = None
+            if not item or item.get("type") != "pmessage":
+                continue
+            sport = item["channel"].decode().rsplit(":", 1)[-1]
+            body = item["data"]
+            try:
+                version = orjson.loads(body)["version"]
+            except Exception:
+                continue
+            self._loop.call_soon_threadsafe(self._deliver, Message(sport, version, body))
+
+    def stop(self):
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+        self._thread = None
+
+broadcaster = Broadcaster(r)
+
+async def sse_events(request: Request, sport: str, version: int) -> AsyncIterator[bytes]:
+    q = broadcaster.subscribe(sport)
+    try:
+        yield b"event: hello\ndata: " + orjson.dumps({"sport": sport, "version": version}) + b"\n\n"
+        while True:
+            try:
+                msg = await asyncio.wait_for(q.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield PING
+                continue
+            if msg is None:
+                break
+            yield msg.sse
+    finally:
+        broadcaster.unsubscribe(sport, q)
+
+async def ws_events(websocket: WebSocket, sport: str, version: int):
+    q = broadcaster.subscribe(sport)
+
+    async def send():
+        await websocket.send_bytes(orjson.dumps({"event": "hello", "sport": sport, "version": version}))
+        while True:
+            msg = await q.get()
+            if msg is None:
+                return
+            await websocket.send_bytes(msg.json)
+
+    async def receive():
+        # Reading is what notices a closed socket while nothing is being published (the SSE heartbeat's job)
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in tasks:
+            t.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for e in results:
+            if isinstance(e, Exception) and not isinstance(e, WebSocketDisconnect):
+                print(f"WARN: WebSocket stream {sport}: {e!r}")
+        broadcaster.unsubscribe(sport, q)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
@@ -0,0 +1,161 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+import orjson
+import pandas as pd
+import requests
+
+# Dashboard side of /stream: one background thread per (backend, sport) holds the
+# prop table and applies each pushed delta in place, so a rerun just reads the
+# current frame instead of refetching the whole list.
+
+KEY = ["event", "player", "prop"]
+RECONNECT_DELAY = 3.0
+ARBS_KEPT = 50
+PAGE_SIZE = 500
+RESYNC_ATTEMPTS = 3
+
+class PropStream:
+    def __init__(self, backend_url: str, sport: str):
+        self.base = backend_url.rstrip("/")
+        self.sport = sport
+        self.version = 0
+        self.connected = False
+        self.error: Optional[str] = None
+        self._df = pd.DataFrame(columns=KEY).set_index(KEY)
+        self._arbs: List[Dict] = []
+        self._middles: List[Dict] = []
+        self._lock = threading.Lock()
+        self._pages: List[tuple] = []  # (etag, props) per page from the last resync
+        # resync runs on the Streamlit thread (Refresh) and this one; requests.Session isn't thread-safe,
+        # so resyncs take turns on their own session and the push stream has another
+        self._sync = threading.Lock()
+        self._session = requests.Session()
+        self._stream_session = requests.Session()
+        self._ready = threading.Event()  # set once the first resync finished or failed
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def frame(self) -> pd.DataFrame:
+        with self._lock:
+            return self._df.reset_index()
+
+    def props(self) -> List[Dict]:
+        return self.frame().to_dict("records")
+
+    def arbs(self) -> Dict[str, List[Dict]]:
+        with self._lock:
+            return {"arbs": list(self._arbs), "middles": list(self._middles)}
+
+    def wait(self, timeout: float) -> bool:
+        # True once the table holds a snapshot; the first resync runs on the stream thread
+        self._ready.wait(timeout)
+        return self.version > 0
+
+    def close(self):
+        self._stop.set()
+        self._session.close()
+        self._stream_session.close()
+
+    def resync(self):
+        # Walks every page with If-None-Match; pages the server answers 304 for are not re-downloaded,
+        # and the frame is only rebuilt when one of them changed. Cursors are tied to one snapshot:
+        # a 409 means a newer one was published mid-walk, so the walk starts over on that one.
+        with self._sync:
+            self._resync()
+
+    def _resync(self):
+        for _ in range(RESYNC_ATTEMPTS):
+            walked = self._walk()
+            if walked is not None:
+                break
+        else:
+            raise RuntimeError(f"Snapshot kept changing during {RESYNC_ATTEMPTS} resyncs")
+        pages, version = walked
+        changed = len(pages) != len(self._pages) or any(p is not old for p, old in zip(pages, self._pages))
+        self._pages = pages
+        with self._lock:
+            if changed:
+                props = [p for _, rows in pages for p in rows]
+                df = pd.DataFrame(props) if props else pd.DataFrame(columns=KEY)
+                self._df = df.set_index(KEY)
+            self.version = version
+        self._ready.set()
+
+    def _walk(self) -> Optional[Tuple[List[tuple], int]]:
+        # (etag, props) per page of one snapshot and its version; None when it was replaced mid-walk
+        pages, cursor, version = [], "", 0
+        while cursor is not None:
+            cached = self._pages[len(pages)] if len(pages) < len(self._pages) else None
+            headers = {"If-None-Match": cached[0]} if cached else {}
+            resp = self._session.get(f"{self.base}/{self.sport}/props", params={"limit": PAGE_SIZE, "cursor": cursor},
+                                     headers=headers, timeout=10)
+            if resp.status_code == 409:
+                return None
+            if resp.status_code == 304 and cached:
+                pages.append(cached)
+            else:
+                resp.raise_for_status()
+                pages.append((resp.headers.get("ETag"), orjson.loads(resp.content)))
+            version = int(resp.headers.get("X-Snapshot-Version", 0))
+            cursor = resp.headers.get("X-Next-Cursor")
+        return pages, version
+
+    def _apply(self, delta: Dict):
+        # Under _sync so a Refresh resync on the Streamlit thread can't interleave with it
+        with self._sync:
+            if delta["version"] <= self.version:
+                return  # already in the snapshot we resynced from
+            if delta.get("resync") or delta.get("prev_version") != self.version:
+                self._resync()  # missed one in between, or the server had no delta to send
+                return
+            self._merge(delta)
+
+    def _merge(self, delta: Dict):
+        with self._lock:
+            df = self._df
+            if delta["removed"]:
+                gone = pd.MultiIndex.from_tuples([tuple(k) for k in delta["removed"]], names=KEY)
+                df = df.drop(gone.intersection(df.index))
+            if delta["props"]:
+                upd = pd.DataFrame(delta["props"]).set_index(KEY)
+                df = pd.concat([df.drop(upd.index.intersection(df.index)), upd])
+            self._df = df
+            self._arbs = (delta["arbs"] + self._arbs)[:ARBS_KEPT]
+            self._middles = (delta["middles"] + self._middles)[:ARBS_KEPT]
+            self.version = delta["version"]
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.resync()
+                with self._stream_session.get(f"{self.base}/stream", params={"sport": self.sport}, stream=True, timeout=(10, 60)) as resp:
+                    resp.raise_for_status()
+                    self.connected, self.error = True, None
+                    event, data = None, []
+                    for line in resp.iter_lines():
+                        if self._stop.is_set():
+                            return
+                        if line.startswith(b":"):
+                            continue  # heartbeat
+                        if line.startswith(b"event:"):
+                            event = line[6:].strip()
+                        elif line.startswith(b"data:"):
+                            data.append(line[5:].strip())
+                        elif not line:
+                            if event == b"hello" and data:
+                                # Pushes are ordered and lossless from here on; catch up on anything
+                                # published between the initial fetch and the subscribe
+                                if orjson.loads(b"".join(data))["version"] != self.version:
+                                    self.resync()
+                            elif event == b"delta" and data:
+                                self._apply(orjson.loads(b"".join(data)))
+                            event, data = None, []
+            except Exception as e:
+                if self._stop.is_set():
+                    return
+                self.error = repr(e)
+                self._ready.set()
+                print(f"WARN: Prop stream {self.sport} dropped: {e!r}")
+            self.connected = False
+            self._stop.wait(RECONNECT_DELAY)
@@ -0,0 +1,35 @@
+import asyncio
+import pytest
+from alerts import AlertDispatcher, AlertQueue, OWNER_KEY, fingerprint
+
+fakeredis = pytest.importorskip("fakeredis")
+
+ALERT = {"kind": "manual", "player": "A. Player", "prop": "points", "line": 20.5, "risk_score": 10.0}
+
+def test_recover_leaves_live_owners_alone():
+    async def go():
+        client = fakeredis.FakeRedis()
+        a, b = AlertQueue(client), AlertQueue(client)
+        await a.heartbeat()
+        await a.push([ALERT])
+        assert await a.pop(10) == [ALERT]
+        # a is alive and mid-send: b must not hand its alert out again
+        assert await b.recover() == 0
+        client.delete(OWNER_KEY.format(owner=a.owner))
+        assert await b.recover() == 1
+        assert await b.pop(10) == [ALERT]
+    asyncio.run(go())
+
+def test_dropped_alert_releases_fingerprint(monkeypatch):
+    async def go():
+        queue = AlertQueue(fakeredis.FakeRedis())
+        d = AlertDispatcher(queue, webhook="http://discord.invalid/hook")
+        async def undeliverable(content):
+            return False
+        monkeypatch.setattr(d, "_deliver", undeliverable)
+        assert await d.submit([ALERT]) == 1
+        assert await d.submit([ALERT]) == 0
+        await d.drain()
+        assert not queue.r.exists(f"pp:alerts:fp:{fingerprint(ALERT)}")
+        assert await d.submit([ALERT]) == 1
+    asyncio.run(go())
@@ -0,0 +1,66 @@
+import arbs
+from odds_store import OddsStore
+from odds_table import OutcomeTable
+
+def market(book: str, player: str, line: float, over: float, under: float, event: str = "e1", key: str = "player_points"):
+    outcomes = [{"name": "Over", "description": player, "price": over, "point": line},
+                {"name": "Under", "description": player, "price": under, "point": line}]
+    return {"key": book.lower(), "title": book, "markets": [{"key": key, "outcomes": outcomes}], "_event": event}
+
+def slate(*books):
+    events = {}
+    for b in books:
+        event = b.pop("_event")
+        events.setdefault(event, {"id": event, "bookmakers": []})["bookmakers"].append(b)
+    return list(events.values())
+
+def test_arb_across_books():
+    odds = slate(market("FanDuel", "A", 20.5, 2.10, 1.75), market("DraftKings", "A", 20.5, 1.75, 2.10))
+    found = arbs.scan(OutcomeTable.from_odds(odds))
+    assert len(found["arbs"]) == 1
+    arb = found["arbs"][0]
+    assert (arb["player"], arb["line"]) == ("A", 20.5)
+    assert arb["over"] == {"book": "FanDuel", "price": 2.10} and arb["under"] == {"book": "DraftKings", "price": 2.10}
+    assert arb["margin"] == round((1 - 2 / 2.10) * 100, 2)
+
+def test_no_arb_when_same_book_best_both_sides_is_still_vig():
+    odds = slate(market("FanDuel", "A", 20.5, 1.91, 1.91), market("DraftKings", "A", 20.5, 1.87, 1.95))
+    assert arbs.scan(OutcomeTable.from_odds(odds))["arbs"] == []
+
+def test_middle_between_lines():
+    odds = slate(market("FanDuel", "A", 20.5, 1.95, 1.85), market("DraftKings", "A", 22.5, 2.05, 1.95))
+    middles = arbs.scan(OutcomeTable.from_odds(odds))["middles"]
+    assert len(middles) == 1
+    m = middles[0]
+    assert m["over"] == {"book": "FanDuel", "price": 1.95, "line": 20.5}
+    assert m["under"] == {"book": "DraftKings", "price": 1.95, "line": 22.5}
+    assert m["gap"] == 2.0
+
+def test_no_middle_across_props():
+    # Over on one player and under on another never make a middle
+    odds = slate(market("FanDuel", "A", 20.5, 1.95, 1.85), market("DraftKings", "B", 22.5, 2.05, 1.95))
+    assert arbs.scan(OutcomeTable.from_odds(odds))["middles"] == []
+
+def test_top_k_and_per_prop():
+    books = []
+    for i, player in enumerate("ABC"):
+        for line in (20.5, 21.5):
+            books.append(market("FanDuel", player, line, 2.10 + i / 10, 1.75))
+            books.append(market("DraftKings", player, line, 1.75, 2.10))
+    table = OutcomeTable.from_odds(slate(*books))
+    everything = arbs.scan(table, top_k=100)
+    assert len(everything["arbs"]) == 6
+    top = arbs.scan(table, top_k=2)["arbs"]
+    assert [a["player"] for a in top] == ["C", "C"]  # best margins first
+    one_each = arbs.scan(table, top_k=100, per_prop=1)["arbs"]
+    assert sorted(a["player"] for a in one_each) == ["A", "B", "C"]
+
+def test_store_quote_table_matches_payload_table():
+    odds = slate(market("FanDuel", "A", 20.5, 2.10, 1.75), market("DraftKings", "A", 20.5, 1.75, 2.10),
+                 market("FanDuel", "B", 8.5, 1.95, 1.85, event="e2"), market("DraftKings", "B", 10.5, 2.05, 1.95, event="e2"))
+    store = OddsStore("nba")
+    store.update(odds)
+    q = store.quotes
+    from_store = arbs.scan(q.table(q.select(store.books_by_prop)))
+    from_payload = arbs.scan(OutcomeTable.from_odds(odds))
+    assert from_store == from_payload
@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from datetime import datetime, timezone
+import budget
+from budget import CreditLedger, OddsBudget, IDLE_INTERVAL, MAX_SLOWDOWN, PLAN_TTL
+
+T0 = 1_700_000_000.0
+MARKETS = ["player_points", "player_rebounds"]
+
+def event(eid: str, starts_in: float):
+    commence = datetime.fromtimestamp(T0 + starts_in, timezone.utc).isoformat().replace("+00:00", "Z")
+    return {"id": eid, "sport_key": "nba", "commence_time": commence}
+
+def odds(eid: str, markets, price: float = 1.9):
+    outcomes = [{"name": "Over", "description": "A. Player", "price": price, "point": 20.5},
+                {"name": "Under", "description": "A. Player", "price": price, "point": 20.5}]
+    return {"id": eid, "bookmakers": [{"key": "fd", "title": "FanDuel", "markets": [{"key": m, "outcomes": outcomes} for m in markets]}]}
+
+def run_fetch(monkeypatch, b: OddsBudget, events, now: float, calls: list):
+    async def fetch_events(sport_key):
+        return events
+    async def fetch_event_odds(sport_key, eid, markets):
+        calls.append((eid, tuple(markets)))
+        return odds(eid, markets), {"x-requests-last": str(len(markets))}
+    monkeypatch.setattr(budget.upstream, "fetch_events", fetch_events)
+    monkeypatch.setattr(budget.upstream, "fetch_event_odds", fetch_event_odds)
+    monkeypatch.setattr(budget.time, "time", lambda: now)
+    return asyncio.run(b.fetch_sport("nba"))
+
+def test_backed_off_markets_keep_lines_past_cache_ttl(monkeypatch):
+    b = OddsBudget(CreditLedger(None), markets=MARKETS)
+    events = [event("e1", 2 * 86400)]  # idle cadence
+    calls = []
+    t = T0
+    # Unchanged prices back the market off to 2**MAX_BACKOFF x IDLE_INTERVAL
+    for _ in range(4):
+        merged = run_fetch(monkeypatch, b, events, t, calls)
+        t += IDLE_INTERVAL * 8
+    assert len(calls) == 4
+    # Well past the odds cache TTL and still not due: lines come from the budget's own copy
+    t = T0 + IDLE_INTERVAL * 8 * 3 + IDLE_INTERVAL * 4
+    merged = run_fetch(monkeypatch, b, events, t, calls)
+    assert len(calls) == 4
+    assert [m["key"] for m in merged[0]["bookmakers"][0]["markets"]] == MARKETS
+    assert PLAN_TTL > IDLE_INTERVAL * 8
+
+def test_first_plan_does_not_max_out_slowdown(monkeypatch):
+    b = OddsBudget(CreditLedger(None), markets=MARKETS)
+    events = [event(f"e{i}", 4 * 3600) for i in range(5)]  # 180s cadence
+    monkeypatch.setattr(budget.time, "time", lambda: T0 + 1)
+    plan = b.plan("nba", events, T0 + 1)
+    assert len(plan) == 5
+    assert abs(b._demand["nba"] - 5 * len(MARKETS) / 180) < 1e-9
+    assert b.interval_multiplier() < MAX_SLOWDOWN
+
+def test_demand_is_per_sport():
+    b = OddsBudget(CreditLedger(None), markets=MARKETS)
+    b.plan("nba", [event("e1", 4 * 3600)], T0)
+    b.plan("ncaab", [event("e2", 4 * 3600)], T0 + 5)
+    # The second sport's first sample is seeded from its own cadence, not the 5s since the other plan
+    assert abs(b._demand["ncaab"] - len(MARKETS) / 180) < 1e-9
+    assert set(b._state) == {"nba", "ncaab"}
+
+def test_state_round_trips_through_redis(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+    events = [event("e1", 2 * 86400)]
+    first = OddsBudget(CreditLedger(client), markets=MARKETS)
+    run_fetch(monkeypatch, first, events, T0, [])
+    # A fresh process (new lease holder) resumes the backoff and base payload instead of refetching
+    second = OddsBudget(CreditLedger(client), markets=MARKETS)
+    calls = []
+    merged = run_fetch(monkeypatch, second, events, T0 + 60, calls)
+    assert calls == []
+    assert merged[0]["bookmakers"]
+    # The bucket carried over and only refilled for the 60s in between
+    assert abs(second.tokens - (first.tokens + second.rate(T0 + 60) * 60)) < 1e-6
+    assert 0 < client.ttl("pp:odds:plan:nba") <= PLAN_TTL
+
+def test_restore_keeps_newer_local_bucket(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+    b = OddsBudget(CreditLedger(client), markets=MARKETS)
+    run_fetch(monkeypatch, b, [event("e1", 2 * 86400)], T0, [])
+    # Another sport of the same process spends after the save; reloading must not hand those credits back
+    b.plan("ncaab", [event("e2", 2 * 86400)], T0 + 10)
+    spent = b.tokens
+    asyncio.run(b._restore("nba"))
+    assert b.tokens == spent
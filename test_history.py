@@ -0,0 +1,38 @@
+import numpy as np
+from history import History
+
+DAY = 86400.0
+T0 = 1_700_000_000.0
+
+def props_rows(ts: float, n: int, player: str = "A"):
+    return [(ts + i, 1, 20.5, 50.0, 5.0, player, "points") for i in range(n)]
+
+def history_with_segments(tmp_path) -> History:
+    h = History(root=str(tmp_path), enabled=True)
+    # Three segments over two days, two players
+    h._write({("props", "nba"): props_rows(T0, 5) + props_rows(T0 + 100, 3, "B")})
+    h._write({("props", "nba"): props_rows(T0 + 200, 4)})
+    h._write({("props", "nba"): props_rows(T0 + DAY, 6)})
+    return h
+
+def test_query_page_limits_rows_but_counts_all(tmp_path):
+    h = history_with_segments(tmp_path)
+    cols, total = h.query_page("nba", "props", T0 - 1, T0 + 2 * DAY, 7)
+    assert total == 18
+    assert len(cols["ts"]) == 7
+    full = h.query("nba", "props", T0 - 1, T0 + 2 * DAY)
+    assert np.array_equal(cols["ts"], full["ts"][:7])
+
+def test_query_page_with_filter(tmp_path):
+    h = history_with_segments(tmp_path)
+    cols, total = h.query_page("nba", "props", T0 - 1, T0 + 2 * DAY, 6, player="A")
+    assert total == 15
+    assert list(cols["player"]) == ["A"] * 6
+    cols, total = h.query_page("nba", "props", T0 - 1, T0 + 2 * DAY, 10, player="B")
+    assert total == 3 and len(cols["ts"]) == 3
+
+def test_query_page_limit_reached_in_first_segment(tmp_path):
+    h = history_with_segments(tmp_path)
+    cols, total = h.query_page("nba", "props", T0 - 1, T0 + 2 * DAY, 2)
+    assert total == 18
+    assert cols["ts"].tolist() == [T0, T0 + 1]
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from odds_store import OddsStore, remote_changes_since
+import odds_store
+
+def slate(over: float, under: float = 1.9, line: float = 20.5, books=("FanDuel", "DraftKings")):
+    outcomes = [{"name": "Over", "description": "A. Player", "price": over, "point": line},
+                {"name": "Under", "description": "A. Player", "price": under, "point": line}]
+    return [{"id": "e1", "bookmakers": [{"key": b.lower(), "title": b, "markets": [{"key": "player_points", "outcomes": outcomes}]}
+                                        for b in books]}]
+
+def test_diff_new_changed_removed():
+    store = OddsStore("nba")
+    delta = store.update(slate(1.9))
+    assert delta.counts() == {"new": 2, "changed": 0, "removed": 0}
+    assert not store.update(slate(1.9))
+    delta = store.update(slate(2.0, books=("FanDuel",)))
+    assert delta.counts() == {"new": 0, "changed": 1, "removed": 1}
+    assert store.books_by_prop == {("e1", "A. Player", "player_points"): {"FanDuel"}}
+
+def test_changelog_contiguous_versions():
+    store = OddsStore("nba")
+    asyncio.run(store.log(store.update(slate(1.9)), 1))
+    asyncio.run(store.log(store.update(slate(2.0)), 2))
+    moves = store.changes_since(1)
+    assert sorted((m["version"], m["book"], m["over"]) for m in moves) == [(2, "DraftKings", 2.0), (2, "FanDuel", 2.0)]
+    assert len(store.changes_since(0)) == 4
+    assert store.changes_since(2) == []
+
+def test_changelog_resets_on_version_gap():
+    store = OddsStore("nba")
+    asyncio.run(store.log(store.update(slate(1.9)), 1))
+    # Versions 2-4 were published by another process: this diff is not the change since 4
+    asyncio.run(store.log(store.update(slate(2.0)), 5))
+    assert store.floor == 5
+    assert store.changes_since(4) is None
+    assert store.changes_since(5) == []
+    asyncio.run(store.log(store.update(slate(2.1)), 6))
+    assert {m["over"] for m in store.changes_since(5)} == {2.1}
+
+def test_remote_changelog_resets_on_version_gap(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(odds_store, "r", client)
+    store = OddsStore("nba", client)
+    asyncio.run(store.log(store.update(slate(1.9)), 1))
+    asyncio.run(store.log(store.update(slate(2.0)), 2))
+    assert len(asyncio.run(remote_changes_since("nba", 1))) == 2
+    asyncio.run(store.log(store.update(slate(2.1)), 7))
+    assert asyncio.run(remote_changes_since("nba", 2)) is None
+    assert asyncio.run(remote_changes_since("nba", 7)) == []
+
+def test_reprice_touched_props_only():
+    store = OddsStore("nba")
+    two = slate(1.9) + [{**slate(1.9)[0], "id": "e2"}]
+    store.reprice(store.update(two).props())
+    first = store.fair_entry(("e1", "A. Player", "player_points"), 20.5)
+    assert first["fair_prob"] == 50.0 and set(first["ev"]) == {"FanDuel", "DraftKings"}
+    moved = [slate(1.8, 2.0)[0], two[1]]
+    delta = store.update(moved)
+    assert delta.props() == {("e1", "A. Player", "player_points")}
+    store.reprice(delta.props())
+    assert store.fair_entry(("e1", "A. Player", "player_points"), 20.5)["fair_prob"] > 50.0
+    assert store.fair_entry(("e2", "A. Player", "player_points"), 20.5)["fair_prob"] == 50.0
+    assert store.fair_entry(("e1", "A. Player", "player_points"), 99.5) is None
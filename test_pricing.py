@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import pricing
+from pricing import METHODS, devig
+
+# Decimal prices with 4-9% overround, including a lopsided favourite
+OVER = np.array([1.91, 1.80, 1.50, 2.50, 1.20])
+UNDER = np.array([1.91, 2.00, 2.50, 1.55, 4.20])
+
+@pytest.mark.parametrize("method", METHODS)
+def test_devig_sums_to_one(method):
+    q_over, q_under = 1 / OVER, 1 / UNDER
+    p_over, p_under = devig(q_over, q_under, method), devig(q_under, q_over, method)
+    assert np.allclose(p_over + p_under, 1.0)
+    assert np.all((p_over > 0) & (p_over < 1))
+
+@pytest.mark.parametrize("method", METHODS)
+def test_devig_even_market_is_even(method):
+    assert np.allclose(devig(np.array([1 / 1.91]), np.array([1 / 1.91]), method), 0.5)
+
+def test_devig_multiplicative_is_proportional():
+    q_over, q_under = 1 / OVER, 1 / UNDER
+    assert np.allclose(devig(q_over, q_under, "multiplicative"), q_over / (q_over + q_under))
+
+def test_devig_power_solves_for_k():
+    q_over, q_under = 1 / OVER, 1 / UNDER
+    p = devig(q_over, q_under, "power")
+    # p_over = q_over**k and p_under = q_under**k for one k per market
+    k = np.log(p) / np.log(q_over)
+    assert np.allclose(q_under ** k, 1 - p, atol=1e-6)
+
+def test_devig_shin_and_power_shade_the_longshot():
+    # Both move probability from the longshot to the favourite compared to multiplicative
+    q_over, q_under = np.array([1 / 1.20]), np.array([1 / 4.20])
+    mult = devig(q_over, q_under, "multiplicative")[0]
+    assert devig(q_over, q_under, "shin")[0] > mult
+    assert devig(q_over, q_under, "power")[0] > mult
+
+def test_devig_missing_side_is_nan():
+    assert np.isnan(devig(np.array([1 / 1.9]), np.array([np.nan]), "multiplicative"))[0]
+
+def test_devig_unknown_method():
+    with pytest.raises(ValueError):
+        devig(np.array([0.5]), np.array([0.5]), "nope")
+
+def test_price_consensus_and_summary_entries():
+    # prop 0 at line 20.5 from two books, prop 0 at 21.5 one-sided only, prop 1 from one book
+    prop = np.array([0, 0, 0, 1])
+    line = np.array([20.5, 20.5, 21.5, 5.5])
+    over = np.array([1.91, 2.00, 1.80, 1.50])
+    under = np.array([1.91, 1.80, np.nan, 2.50])
+    book = np.array([0, 1, 0, 1])
+    priced = pricing.price(prop, line, over, under, "multiplicative")
+    summary = pricing.Summary(priced, book, ["FanDuel", "DraftKings"])
+    expected = (0.5 + (1 / 2.0) / (1 / 2.0 + 1 / 1.8)) / 2
+    entry = summary.entry(0)
+    assert entry["fair_prob"] == round(expected * 100, 1)
+    assert set(entry["ev"]) == {"FanDuel", "DraftKings"}
+    assert entry["ev"]["FanDuel"]["over"] == round((expected * 1.91 - 1) * 100, 2)
+    assert summary.entry(1) is None  # nobody quotes both sides at 21.5
+    props, first, end = summary.prop_ranges()
+    assert props.tolist() == [0, 1] and first.tolist() == [0, 2] and end.tolist() == [2, 3]
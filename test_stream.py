@@ -0,0 +1,82 @@
+import asyncio
+import orjson
+from stream import broadcaster, resync_marker, snapshot_delta, ws_events
+from stream_client import PropStream
+
+def prop(player: str, line: float, event: str = "e1"):
+    return {"event": event, "player": player, "prop": "Points", "line": line, "risk_score": 10.0}
+
+def snap(version: int, props, arbs=None):
+    return {"sport": "nba", "version": version, "props": props, "arbs": {"arbs": arbs or [], "middles": []}}
+
+def test_snapshot_delta_changed_and_removed():
+    prev = snap(1, [prop("A", 20.5), prop("B", 10.5)])
+    pushed = snapshot_delta(prev, snap(2, [prop("A", 21.5), prop("C", 5.5)]))
+    assert pushed["version"] == 2 and pushed["prev_version"] == 1
+    assert sorted(p["player"] for p in pushed["props"]) == ["A", "C"]
+    assert pushed["removed"] == [["e1", "B", "Points"]]
+
+def test_snapshot_delta_keys_on_event():
+    # Same player and prop in two games are two props
+    pushed = snapshot_delta(snap(1, [prop("A", 20.5, "e1")]), snap(2, [prop("A", 20.5, "e1"), prop("A", 20.5, "e2")]))
+    assert [p["event"] for p in pushed["props"]] == ["e2"]
+
+def test_snapshot_delta_without_changes_still_advances_version():
+    pushed = snapshot_delta(snap(1, [prop("A", 20.5)]), snap(2, [prop("A", 20.5)]))
+    assert pushed["version"] == 2 and pushed["prev_version"] == 1
+    assert pushed["props"] == [] and pushed["removed"] == []
+
+def client(monkeypatch):
+    monkeypatch.setattr(PropStream, "_run", lambda self: None)
+    stream = PropStream("http://backend.invalid", "nba")
+    resyncs = []
+    monkeypatch.setattr(stream, "_resync", lambda: resyncs.append(stream.version))
+    return stream, resyncs
+
+def test_client_applies_contiguous_delta(monkeypatch):
+    stream, resyncs = client(monkeypatch)
+    stream._apply(snapshot_delta(None, snap(1, [prop("A", 20.5)])))
+    stream._apply(snapshot_delta(snap(1, [prop("A", 20.5)]), snap(2, [prop("A", 21.5)])))
+    assert resyncs == []
+    assert stream.version == 2
+    assert stream.props()[0]["line"] == 21.5
+
+def test_client_resyncs_on_prev_version_gap(monkeypatch):
+    stream, resyncs = client(monkeypatch)
+    stream._apply(snapshot_delta(None, snap(1, [prop("A", 20.5)])))
+    # Version 2 never arrived: 3 is a diff against a table this client doesn't hold
+    stream._apply(snapshot_delta(snap(2, [prop("A", 20.5), prop("B", 9.5)]), snap(3, [prop("A", 22.5)])))
+    assert resyncs == [1]
+    assert stream.version == 1
+    assert stream.props()[0]["line"] == 20.5
+
+def test_client_resyncs_on_marker(monkeypatch):
+    stream, resyncs = client(monkeypatch)
+    stream._apply(snapshot_delta(None, snap(1, [prop("A", 20.5)])))
+    stream._apply(resync_marker(snap(1, []), snap(2, [prop("A", 21.5)])))
+    assert resyncs == [1]
+
+class FakeSocket:
+    # Just enough of starlette's WebSocket: the client says hello back, then goes away
+    def __init__(self):
+        self.sent, self.closed = [], False
+        self.inbox = asyncio.Queue()
+
+    async def send_bytes(self, data: bytes):
+        self.sent.append(orjson.loads(data))
+        await self.inbox.put({"type": "websocket.receive", "text": "hi"})
+        await self.inbox.put({"type": "websocket.disconnect", "code": 1000})
+
+    async def receive(self):
+        return await self.inbox.get()
+
+    async def close(self):
+        self.closed = True
+
+def test_ws_ends_when_client_leaves_without_traffic():
+    sock = FakeSocket()
+    # Nothing is ever published: only the reader can notice the close, and the sender must be cancelled with it
+    asyncio.run(asyncio.wait_for(ws_events(sock, "nba", 7), 2))
+    assert sock.sent == [{"event": "hello", "sport": "nba", "version": 7}]
+    assert sock.closed
+    assert not broadcaster.subscribers["nba"]
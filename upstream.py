@@ -0,0 +1,117 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+import httpx
+from settings import (
+    BASE_URL, X_API_URL, ODDS_API_KEY, X_BEARER_TOKEN, HTTP_CONNECT_TIMEOUT, ODDS_TIMEOUT, X_TIMEOUT,
+    HTTP_MAX_CONNECTIONS, HTTP_KEEPALIVE, TWEET_CONCURRENCY, REQUEST_BUDGET, ODDS_REGIONS, ODDS_MARKETS,
+)
+import metrics
+
+# Pooled keep-alive clients, one per upstream. httpx pools are bound to the loop
+# that opened them, so a new loop (CLI run, test, serverless re-init) gets fresh ones.
+_clients: Dict[str, httpx.AsyncClient] = {}
+_client_loops: Dict[str, asyncio.AbstractEventLoop] = {}
+
+INJURY_TERMS = "(injury OR practice OR questionable OR load OR rest)"
+BEAT_WRITERS = "(from:wojespn OR from:ShamsCharania OR from:AdrianDorr OR from:MarcJSpears)"
+
+def _timing_hooks(name: str) -> Dict[str, List]:
+    # Every call on the client lands in pp_upstream_seconds{api=name} (and the request's profile)
+    async def on_request(request: httpx.Request):
+        request.extensions["pp_t0"] = time.perf_counter()
+    async def on_response(response: httpx.Response):
+        t0 = response.request.extensions.get("pp_t0")
+        if t0 is not None:
+            metrics.upstream_call(name, response.status_code, time.perf_counter() - t0)
+    return {"request": [on_request], "response": [on_response]}
+
+def _new_client(name: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_KEEPALIVE, keepalive_expiry=30)
+    hooks = _timing_hooks(name)
+    if name == "odds":
+        return httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=httpx.Timeout(ODDS_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT), event_hooks=hooks)
+    if name == "x":
+        headers = {"Authorization": f"Bearer {X_BEARER_TOKEN}"} if X_BEARER_TOKEN else {}
+        return httpx.AsyncClient(base_url=X_API_URL, limits=limits, headers=headers, timeout=httpx.Timeout(X_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT), event_hooks=hooks)
+    return httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(ODDS_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT), event_hooks=hooks)
+
+def get_client(name: str) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(name)
+    if client is None or client.is_closed or _client_loops.get(name) is not loop:
+        client = _new_client(name)
+        _clients[name] = client
+        _client_loops[name] = loop
+    return client
+
+async def aclose_clients():
+    loop = asyncio.get_running_loop()
+    for name, client in list(_clients.items()):
+        if _client_loops.get(name) is loop:
+            await client.aclose()
+        _clients.pop(name, None)
+        _client_loops.pop(name, None)
+
+async def fetch_odds_raw(sport_key: str) -> List[Dict]:
+    params = {"apiKey": ODDS_API_KEY, "regions": ODDS_REGIONS, "markets": ",".join(ODDS_MARKETS), "oddsFormat": "decimal"}
+    resp = await get_client("odds").get(f"/sports/{sport_key}/odds/", params=params)
+    resp.raise_for_status()
+    return resp.json()
+
+async def fetch_events(sport_key: str) -> List[Dict]:
+    # Event list is free (0 credits); used to plan the per-event odds calls
+    resp = await get_client("odds").get(f"/sports/{sport_key}/events", params={"apiKey": ODDS_API_KEY})
+    resp.raise_for_status()
+    return resp.json()
+
+async def fetch_event_odds(sport_key: str, event_id: str, markets: List[str]) -> Tuple[Dict, httpx.Headers]:
+    # Player props are only served per event; cost = markets returned x regions
+    params = {"apiKey": ODDS_API_KEY, "regions": ODDS_REGIONS, "markets": ",".join(markets), "oddsFormat": "decimal"}
+    resp = await get_client("odds").get(f"/sports/{sport_key}/events/{event_id}/odds", params=params)
+    resp.raise_for_status()
+    return resp.json(), resp.headers
+
+async def search_recent(query: str, max_results: int = 10, next_token: Optional[str] = None) -> Dict:
+    params = {"query": query, "max_results": max_results, "tweet.fields": "text,created_at"}
+    if next_token:
+        params["next_token"] = next_token
+    resp = await get_client("x").get("/tweets/search/recent", params=params)
+    resp.raise_for_status()
+    return resp.json()
+
+async def fan_out(
+    keys: Iterable[Hashable],
+    fn: Callable[[Any], Awaitable[Any]],
+    default: Callable[[Any], Any],
+    limit: int = TWEET_CONCURRENCY,
+    call_timeout: float = X_TIMEOUT,
+    budget: float = REQUEST_BUDGET,
+    api: str = "x",
+) -> Tuple[Dict[Hashable, Any], List[Hashable]]:
+    # Run fn(key) for every key, at most `limit` in flight, each capped at call_timeout
+    # and all of them at `budget`. Keys that time out or fail get default(key) and are
+    # reported back so the caller can flag a partial response.
+    sem = asyncio.Semaphore(limit)
+    async def one(key):
+        async with sem:
+            return await asyncio.wait_for(fn(key), call_timeout)
+    tasks = {key: asyncio.create_task(one(key)) for key in dict.fromkeys(keys)}
+    if not tasks:
+        return {}, []
+    done, pending = await asyncio.wait(tasks.values(), timeout=budget)
+    for t in pending:
+        t.cancel()
+    results, missed = {}, []
+    for key, t in tasks.items():
+        if t in done and not t.cancelled() and t.exception() is None:
+            results[key] = t.result()
+        else:
+            if t in done and not t.cancelled():
+                print(f"ERROR: fan-out {key}: {t.exception()!r}")
+            results[key] = default(key)
+            missed.append(key)
+            metrics.UPSTREAM_ERRORS.inc(api)
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    return results, missed
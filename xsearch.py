@@ -0,0 +1,89 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+import upstream
+from settings import X_QUERY_MAX_LEN, X_MAX_PAGES
+
+# Packs many players into one recent-search query and attributes the returned
+# tweets back to players, so a refresh costs ~N/k X calls instead of N.
+
+X_PAGE_SIZE = 100  # API max per page
+TWEETS_PER_PLAYER = 5
+SUFFIXES = {"jr", "sr", "ii", "iii", "iv", "v"}
+QUERY_TAIL = f" {upstream.INJURY_TERMS} {upstream.BEAT_WRITERS} -is:retweet"
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.sub(r"[.'’]", "", text)
+
+def _phrase(player: str) -> str:
+    return '"' + player.replace('"', '') + '"'
+
+def build_query(players: List[str]) -> str:
+    return "(" + " OR ".join(_phrase(p) for p in players) + ")" + QUERY_TAIL
+
+def plan_batches(players: Iterable[str], max_len: int = X_QUERY_MAX_LEN) -> List[List[str]]:
+    # Greedy first-fit in slate order; a name that can't fit anywhere still gets its own query
+    batches, current = [], []
+    for p in dict.fromkeys(players):
+        if current and len(build_query(current + [p])) > max_len:
+            batches.append(current)
+            current = []
+        current.append(p)
+    if current:
+        batches.append(current)
+    return batches
+
+class PlayerMatcher:
+    # One precompiled alternation over every alias; longest aliases first so
+    # "Jaren Jackson Jr" wins over "Jackson".
+    def __init__(self, players: Iterable[str], aliases: Optional[Dict[str, List[str]]] = None):
+        players = list(dict.fromkeys(players))
+        self.lookup: Dict[str, set] = {}
+        last_names: Dict[str, List[str]] = {}
+        first_names = set()
+        for p in players:
+            parts = [w for w in normalize(p).split() if w not in SUFFIXES]
+            self._add(normalize(p), p)
+            self._add(" ".join(parts), p)
+            if len(parts) > 1:
+                first_names.add(parts[0])
+                last_names.setdefault(parts[-1], []).append(p)
+            for alias in (aliases or {}).get(p, []):
+                self._add(normalize(alias), p)
+        # Bare last names only when they are unambiguous on this slate
+        for last, owners in last_names.items():
+            if len(owners) == 1 and len(last) > 3 and last not in first_names and last not in self.lookup:
+                self._add(last, owners[0])
+        alternation = "|".join(re.escape(a) for a in sorted(self.lookup, key=len, reverse=True))
+        self.pattern = re.compile(rf"\b(?:{alternation})\b") if alternation else None
+
+    def _add(self, alias: str, player: str):
+        if alias:
+            self.lookup.setdefault(alias, set()).add(player)
+
+    def match(self, text: str) -> List[str]:
+        if self.pattern is None:
+            return []
+        found = {}
+        for m in self.pattern.finditer(normalize(text)):
+            for p in self.lookup[m.group(0)]:
+                found[p] = True
+        return list(found)
+
+async def search_batch(players: List[str], matcher: PlayerMatcher) -> Dict[str, List[Dict]]:
+    # Newest-first pages; stop once every player has enough tweets or pages run out
+    query = build_query(players)
+    found: Dict[str, List[Dict]] = {p: [] for p in players}
+    token = None
+    for _ in range(X_MAX_PAGES):
+        page = await upstream.search_recent(query, max_results=X_PAGE_SIZE, next_token=token)
+        for t in page.get("data", []):
+            for p in matcher.match(t["text"]):
+                if p in found and len(found[p]) < TWEETS_PER_PLAYER:
+                    found[p].append(t)
+        token = page.get("meta", {}).get("next_token")
+        if not token or all(len(v) >= TWEETS_PER_PLAYER for v in found.values()):
+            break
+    return found